@@ -3,11 +3,11 @@ from django.contrib import admin
 # Register your models here.
 # admin.py
 from django.contrib import admin
-from .models import Turma, Aluno, Material, Atividade, Entrega, Nota, Aviso
+from .models import Turma, Aluno, Material, Atividade, Entrega, Nota, Aviso, ResumoNotas, ArquivoArmazenado, Tarefa, TurmaArquivada
 
 @admin.register(Turma)
 class TurmaAdmin(admin.ModelAdmin):
-    list_display = ['nome', 'ano', 'professor', 'criado_em']
+    list_display = ['nome', 'ano', 'professor', 'total_alunos', 'total_atividades', 'criado_em']
     list_filter = ['ano', 'professor']
     search_fields = ['nome', 'descricao']
     date_hierarchy = 'criado_em'
@@ -65,4 +65,38 @@ class AvisoAdmin(admin.ModelAdmin):
     list_display = ['titulo', 'turma', 'importante', 'criado_em']
     list_filter = ['importante', 'turma']
     search_fields = ['titulo', 'conteudo']
-    date_hierarchy = 'criado_em'
\ No newline at end of file
+    date_hierarchy = 'criado_em'
+
+
+@admin.register(ResumoNotas)
+class ResumoNotasAdmin(admin.ModelAdmin):
+    list_display = ['aluno', 'turma', 'total_notas', 'media', 'ultima_avaliacao']
+    list_filter = ['turma']
+    search_fields = ['aluno__nome', 'aluno__matricula']
+    list_select_related = ['aluno', 'turma']
+
+
+@admin.register(ArquivoArmazenado)
+class ArquivoArmazenadoAdmin(admin.ModelAdmin):
+    list_display = ['digest', 'tamanho', 'referencias', 'criado_em']
+    search_fields = ['digest']
+    readonly_fields = ['digest', 'tamanho', 'referencias', 'criado_em']
+
+
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'professor', 'status', 'progresso', 'tentativas', 'criado_em', 'concluida_em']
+    list_filter = ['status', 'tipo']
+    search_fields = ['tipo', 'professor__username', 'mensagem']
+    date_hierarchy = 'criado_em'
+    list_select_related = ['professor']
+    readonly_fields = ['trabalhador', 'expira_em', 'iniciada_em', 'concluida_em', 'erro']
+
+
+@admin.register(TurmaArquivada)
+class TurmaArquivadaAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'ano', 'professor', 'total_alunos', 'total_atividades', 'tamanho', 'arquivada_em']
+    list_filter = ['ano', 'professor']
+    search_fields = ['nome']
+    list_select_related = ['professor']
+    readonly_fields = ['id_original', 'arquivo', 'tamanho', 'arquivos', 'arquivada_em']
@@ -0,0 +1,190 @@
+# api.py
+"""API JSON somente leitura (turmas, materiais, atividades, avisos e notas).
+
+Todos os recursos aceitam ``?campos=id,titulo`` (só essas colunas saem do
+banco) e ``?ids=1,2,3`` (vários objetos de uma vez). O ETag junta a versão
+em cache da seção (ver ``cache.py``) com a contagem e as datas mais recentes
+das linhas, obtidas numa consulta agregada. Não há ``Last-Modified``: nem
+todo modelo tem data de atualização e uma linha apagada não deixa data, então
+só o ETag (que muda com a versão a cada edição ou exclusão) valida a cópia do
+cliente. Se o cliente já tem a versão atual, a resposta é 304 e os objetos
+nem são buscados.
+"""
+import hashlib
+from dataclasses import dataclass
+
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Max
+from django.http import Http404, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from .cache import versao_professor, versoes_secao, versoes_turma
+from .escopo import escopo_professor
+from .models import Atividade, Aviso, Material, Nota, Turma
+
+LIMITE_IDS = 100
+
+
+@dataclass(frozen=True)
+class Recurso:
+    campos: dict  # nome na API -> caminho no ORM
+    padrao: tuple  # campos enviados quando ``?campos=`` não vem
+    datas: tuple  # colunas que entram no ETag
+
+
+TURMAS = Recurso(
+    campos={
+        'id': 'pk', 'nome': 'nome', 'ano': 'ano', 'descricao': 'descricao',
+        'total_alunos': 'total_alunos', 'total_atividades': 'total_atividades',
+        'criado_em': 'criado_em',
+    },
+    padrao=('id', 'nome', 'ano', 'total_alunos', 'total_atividades'),
+    datas=('criado_em',),
+)
+MATERIAIS = Recurso(
+    campos={
+        'id': 'pk', 'titulo': 'titulo', 'descricao': 'descricao', 'tipo': 'tipo',
+        'link': 'link', 'turma': 'turma_id', 'criado_em': 'criado_em',
+        'atualizado_em': 'atualizado_em',
+    },
+    padrao=('id', 'titulo', 'tipo', 'link', 'atualizado_em'),
+    datas=('criado_em', 'atualizado_em'),
+)
+ATIVIDADES = Recurso(
+    campos={
+        'id': 'pk', 'titulo': 'titulo', 'descricao': 'descricao', 'turma': 'turma_id',
+        'data_entrega': 'data_entrega', 'valor_pontos': 'valor_pontos',
+        'criado_em': 'criado_em',
+    },
+    padrao=('id', 'titulo', 'data_entrega', 'valor_pontos'),
+    datas=('criado_em',),
+)
+AVISOS = Recurso(
+    campos={
+        'id': 'pk', 'titulo': 'titulo', 'conteudo': 'conteudo', 'turma': 'turma_id',
+        'importante': 'importante', 'criado_em': 'criado_em',
+    },
+    padrao=('id', 'titulo', 'conteudo', 'importante', 'criado_em'),
+    datas=('criado_em',),
+)
+NOTAS = Recurso(
+    campos={
+        'id': 'pk', 'valor': 'valor', 'comentario': 'comentario_professor',
+        'atividade': 'entrega__atividade_id', 'atividade_titulo': 'entrega__atividade__titulo',
+        'turma': 'entrega__atividade__turma_id', 'data_avaliacao': 'data_avaliacao',
+    },
+    padrao=('id', 'atividade', 'atividade_titulo', 'valor', 'data_avaliacao'),
+    datas=('data_avaliacao',),
+)
+
+
+class ParametroInvalido(ValueError):
+    pass
+
+
+def _campos(request, recurso):
+    pedidos = request.GET.get('campos')
+    if not pedidos:
+        return recurso.padrao
+    nomes = tuple(dict.fromkeys(nome.strip() for nome in pedidos.split(',') if nome.strip()))
+    desconhecidos = [nome for nome in nomes if nome not in recurso.campos]
+    if desconhecidos:
+        raise ParametroInvalido(
+            f'Campos desconhecidos: {", ".join(desconhecidos)}. '
+            f'Disponíveis: {", ".join(recurso.campos)}.'
+        )
+    return nomes or recurso.padrao
+
+
+def _ids(request):
+    pedidos = request.GET.get('ids')
+    if pedidos is None:
+        return None
+    try:
+        ids = {int(valor) for valor in pedidos.split(',') if valor.strip()}
+    except ValueError:
+        raise ParametroInvalido('ids deve ser uma lista de números separados por vírgula.')
+    if len(ids) > LIMITE_IDS:
+        raise ParametroInvalido(f'No máximo {LIMITE_IDS} ids por requisição.')
+    return ids
+
+
+def _validadores(consulta, recurso, versao):
+    """ETag de ``consulta`` com uma consulta agregada."""
+    agregado = consulta.order_by().aggregate(
+        total=Count('pk'), **{coluna: Max(coluna) for coluna in recurso.datas}
+    )
+    datas = [agregado[coluna] for coluna in recurso.datas if agregado[coluna]]
+    assinatura = ':'.join(
+        [str(versao), str(agregado['total'])] + [data.isoformat() for data in datas]
+    )
+    return quote_etag(hashlib.md5(assinatura.encode()).hexdigest())
+
+
+def _responder(request, recurso, consulta, versao):
+    try:
+        campos = _campos(request, recurso)
+        ids = _ids(request)
+    except ParametroInvalido as erro:
+        return JsonResponse({'erro': str(erro)}, status=400)
+    if ids is not None:
+        consulta = consulta.filter(pk__in=ids)
+
+    etag = _validadores(consulta, recurso, versao)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        caminhos = [recurso.campos[nome] for nome in campos]
+        resultados = [
+            {nome: linha[caminho] for nome, caminho in zip(campos, caminhos)}
+            for linha in consulta.values(*caminhos)
+        ]
+        response = JsonResponse({'resultados': resultados})
+    response['ETag'] = etag
+    # Dados do professor: só o cliente guarda, e revalida a cada uso (304 é barato)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _turma_do_professor(request, turma_id):
+    if turma_id not in escopo_professor(request.user.pk).turmas:
+        raise Http404('Turma não encontrada.')
+
+
+@login_required
+def turmas(request):
+    consulta = Turma.objects.filter(professor_id=request.user.pk)
+    return _responder(request, TURMAS, consulta, versao_professor(request.user.pk))
+
+
+@login_required
+def materiais(request, turma_id):
+    _turma_do_professor(request, turma_id)
+    consulta = Material.objects.filter(turma_id=turma_id)
+    return _responder(request, MATERIAIS, consulta, versoes_turma(turma_id)['materiais'])
+
+
+@login_required
+def atividades(request, turma_id):
+    _turma_do_professor(request, turma_id)
+    consulta = Atividade.objects.filter(turma_id=turma_id)
+    return _responder(request, ATIVIDADES, consulta, versoes_turma(turma_id)['atividades'])
+
+
+@login_required
+def avisos(request, turma_id):
+    _turma_do_professor(request, turma_id)
+    consulta = Aviso.objects.filter(turma_id=turma_id)
+    return _responder(request, AVISOS, consulta, versoes_turma(turma_id)['avisos'])
+
+
+@login_required
+def notas_aluno(request, aluno_id):
+    escopo = escopo_professor(request.user.pk)
+    if aluno_id not in escopo.alunos:
+        raise Http404('Aluno não encontrado.')
+    consulta = Nota.objects.filter(
+        entrega__aluno_id=aluno_id, entrega__atividade__turma_id__in=escopo.turmas
+    ).order_by('entrega__atividade__data_entrega', 'pk')
+    versoes = versoes_secao(sorted(escopo.turmas), 'notas')
+    return _responder(request, NOTAS, consulta, sorted(versoes.items()))
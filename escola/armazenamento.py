@@ -0,0 +1,263 @@
+# armazenamento.py
+"""Armazenamento de arquivos endereçado pelo conteúdo (deduplicado).
+
+O upload é copiado para um arquivo temporário calculando o SHA-256 ao mesmo
+tempo, pedaço por pedaço, e então vai para ``arquivos/ab/<digest>/<nome>``.
+Conteúdo repetido não ocupa espaço de novo: se o digest já existe, o
+temporário é descartado e, se o nome for diferente, o novo nome vira um
+hard link (ou reflink, ou cópia, conforme ``ESCOLA_ARMAZENAMENTO_COPIA``)
+do arquivo existente. ``ArquivoArmazenado`` conta as referências de cada
+digest; a pasta só é apagada quando a última referência é liberada.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+PREFIXO = 'arquivos'
+PASTA_TEMPORARIA = 'tmp'
+TAMANHO_DIGEST = 64
+TAMANHO_MAXIMO_NOME = 100
+# Ordem de tentativa; cada modo cai para os seguintes se o sistema de arquivos recusar
+MODOS_COPIA = ('hardlink', 'reflink', 'copia')
+# ioctl do Linux que clona um arquivo compartilhando os blocos (btrfs, XFS)
+FICLONE = 0x40049409
+# Pastas mais novas que isso podem ser de um upload ainda sem registro no banco
+IDADE_MINIMA_ORFAO = 60 * 60
+
+
+def digest_do_nome(nome):
+    """Digest contido em ``nome``, ou ``None`` se não for um nome deduplicado."""
+    partes = (nome or '').split('/')
+    if len(partes) == 4 and partes[0] == PREFIXO and len(partes[2]) == TAMANHO_DIGEST:
+        return partes[2]
+    return None
+
+
+def _reflink(origem, destino):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError('reflink indisponível nesta plataforma')
+    with open(origem, 'rb') as entrada, open(destino, 'xb') as saida:
+        try:
+            fcntl.ioctl(saida.fileno(), FICLONE, entrada.fileno())
+        except OSError:
+            saida.close()
+            os.remove(destino)
+            raise
+
+
+@deconstructible
+class ArmazenamentoDeduplicado(FileSystemStorage):
+    def __init__(self, modo_copia=None, **kwargs):
+        super().__init__(**kwargs)
+        self.modo_copia = modo_copia
+
+    @property
+    def modo(self):
+        modo = self.modo_copia or getattr(settings, 'ESCOLA_ARMAZENAMENTO_COPIA', 'hardlink')
+        if modo not in MODOS_COPIA:
+            raise ValueError(f'Modo de cópia inválido: {modo!r} (use {", ".join(MODOS_COPIA)}).')
+        return modo
+
+    def _nome(self, digest, nome):
+        base = self.get_valid_name(os.path.basename(nome)) or digest
+        raiz, extensao = os.path.splitext(base)
+        base = raiz[:TAMANHO_MAXIMO_NOME - len(extensao)] + extensao
+        return f'{PREFIXO}/{digest[:2]}/{digest}/{base}'
+
+    def _save(self, name, content):
+        pasta_temporaria = self.path(f'{PREFIXO}/{PASTA_TEMPORARIA}')
+        os.makedirs(pasta_temporaria, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=pasta_temporaria)
+        try:
+            resumo = hashlib.sha256()
+            tamanho = 0
+            with os.fdopen(descritor, 'wb') as saida:
+                for pedaco in content.chunks():
+                    if isinstance(pedaco, str):
+                        pedaco = pedaco.encode()
+                    resumo.update(pedaco)
+                    saida.write(pedaco)
+                    tamanho += len(pedaco)
+            os.chmod(temporario, self.file_permissions_mode or 0o644)
+            digest = resumo.hexdigest()
+            nome = self._nome(digest, name)
+            # Referência antes do arquivo: uma liberação paralela não apaga a pasta
+            self._referenciar(digest, tamanho)
+            self._guardar(temporario, nome)
+        finally:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+        return nome
+
+    def _guardar(self, temporario, nome):
+        destino = self.path(nome)
+        if os.path.exists(destino):
+            return
+        pasta = os.path.dirname(destino)
+        os.makedirs(pasta, exist_ok=True)
+        existentes = os.listdir(pasta)
+        if existentes:
+            self._copiar(os.path.join(pasta, existentes[0]), destino)
+        else:
+            os.replace(temporario, destino)
+
+    def _copiar(self, origem, destino):
+        """Cria ``destino`` com o conteúdo de ``origem`` sem duplicar bytes, se possível."""
+        modos = MODOS_COPIA[MODOS_COPIA.index(self.modo):]
+        for modo in modos:
+            try:
+                if modo == 'hardlink':
+                    os.link(origem, destino)
+                elif modo == 'reflink':
+                    _reflink(origem, destino)
+                else:
+                    shutil.copyfile(origem, destino)
+                return modo
+            except OSError:
+                if modo == modos[-1]:
+                    raise
+
+    def _referenciar(self, digest, tamanho):
+        from .models import ArquivoArmazenado
+
+        with transaction.atomic():
+            atualizados = ArquivoArmazenado.objects.filter(digest=digest).update(
+                referencias=F('referencias') + 1
+            )
+            if atualizados:
+                return
+            try:
+                with transaction.atomic():
+                    ArquivoArmazenado.objects.create(digest=digest, tamanho=tamanho, referencias=1)
+            except IntegrityError:
+                # Criado por outro upload entre o UPDATE e o INSERT
+                ArquivoArmazenado.objects.filter(digest=digest).update(
+                    referencias=F('referencias') + 1
+                )
+
+    def _liberar(self, digest):
+        """Tira uma referência; retorna ``True`` se era a última."""
+        from .models import ArquivoArmazenado
+
+        with transaction.atomic():
+            ArquivoArmazenado.objects.filter(digest=digest, referencias__gt=0).update(
+                referencias=F('referencias') - 1
+            )
+            apagados, _ = ArquivoArmazenado.objects.filter(digest=digest, referencias=0).delete()
+        return bool(apagados)
+
+    def delete(self, name):
+        digest = digest_do_nome(name)
+        if digest is None:
+            return super().delete(name)
+        if self._liberar(digest):
+            shutil.rmtree(self.path(os.path.dirname(name)), ignore_errors=True)
+
+    def clonar(self, name, novo_nome=None):
+        """Mais uma referência ao conteúdo de ``name``, sem copiar os bytes.
+
+        Retorna o nome a gravar no campo do novo objeto. Com ``novo_nome`` o
+        conteúdo ganha outro nome na mesma pasta (hard link, reflink ou cópia).
+        """
+        digest = digest_do_nome(name)
+        if digest is None:
+            # Arquivo anterior à deduplicação: entra no armazenamento como upload novo
+            with self.open(name) as arquivo:
+                return self.save(novo_nome or name, arquivo)
+        self._referenciar(digest, self.size(name))
+        if novo_nome is None:
+            return name
+        destino = self._nome(digest, novo_nome)
+        if not self.exists(destino):
+            self._copiar(self.path(name), self.path(destino))
+        return destino
+
+
+armazenamento = ArmazenamentoDeduplicado()
+
+
+def armazenamento_arquivos():
+    return armazenamento
+
+
+def _nomes_em_uso():
+    from .models import Atividade, Entrega, Material, Tarefa, TurmaArquivada
+
+    campos = (
+        (Material, 'arquivo'), (Atividade, 'arquivo_anexo'), (Entrega, 'arquivo'), (Tarefa, 'arquivo'),
+    )
+    por_digest = defaultdict(list)
+    for modelo, campo in campos:
+        nomes = (
+            modelo.objects.filter(**{f'{campo}__startswith': f'{PREFIXO}/'})
+            .values_list(campo, flat=True).order_by()
+        )
+        for nome in nomes.iterator():
+            digest = digest_do_nome(nome)
+            if digest:
+                por_digest[digest].append(nome)
+    # Anexos das turmas arquivadas (arquivamento.py), uma referência por ocorrência
+    for nomes in TurmaArquivada.objects.values_list('arquivos', flat=True).iterator():
+        for nome in nomes:
+            digest = digest_do_nome(nome)
+            if digest:
+                por_digest[digest].append(nome)
+    return por_digest
+
+
+def _antigo(caminho, agora):
+    return agora - os.path.getmtime(caminho) > IDADE_MINIMA_ORFAO
+
+
+def reconciliar_arquivos(armazenamento=armazenamento):
+    """Recalcula as referências a partir dos campos de arquivo dos modelos.
+
+    Corrige contagens divergentes e apaga conteúdo e nomes sem nenhuma
+    referência (além de temporários de uploads interrompidos). Retorna
+    ``(corrigidos, removidos)``.
+    """
+    from .models import ArquivoArmazenado
+
+    por_digest = _nomes_em_uso()
+    corrigidos = 0
+    for registro in ArquivoArmazenado.objects.all().iterator():
+        referencias = len(por_digest.get(registro.digest, ()))
+        if registro.referencias != referencias:
+            ArquivoArmazenado.objects.filter(pk=registro.pk).update(referencias=referencias)
+            corrigidos += 1
+    ArquivoArmazenado.objects.filter(referencias=0).delete()
+
+    removidos = 0
+    agora = time.time()
+    raiz = armazenamento.path(PREFIXO)
+    if not os.path.isdir(raiz):
+        return corrigidos, removidos
+    for grupo in os.listdir(raiz):
+        pasta_grupo = os.path.join(raiz, grupo)
+        for entrada in os.listdir(pasta_grupo):
+            caminho = os.path.join(pasta_grupo, entrada)
+            if not _antigo(caminho, agora):
+                continue
+            if grupo == PASTA_TEMPORARIA:
+                os.remove(caminho)
+                removidos += 1
+            elif entrada not in por_digest:
+                shutil.rmtree(caminho, ignore_errors=True)
+                removidos += 1
+            else:
+                em_uso = {os.path.basename(nome) for nome in por_digest[entrada]}
+                for arquivo in set(os.listdir(caminho)) - em_uso:
+                    os.remove(os.path.join(caminho, arquivo))
+                    removidos += 1
+    return corrigidos, removidos
@@ -0,0 +1,257 @@
+# arquivamento.py
+"""Arquivamento dos anos letivos encerrados.
+
+``arquivar_ano`` tira das tabelas as turmas de um ano e tudo o que pende
+delas (atividades, materiais, avisos, matrículas, entregas, notas e
+resumos). Cada turma vira um JSON compactado com gzip em
+``ESCOLA_ARQUIVO_DIR`` mais uma linha em ``TurmaArquivada``. O trabalho é
+feito em lotes de turmas, uma transação por lote: se algo falha, o lote
+continua no banco e os arquivos dele são apagados. Os anexos continuam no
+armazenamento deduplicado, porque o arquivo guarda uma referência a cada
+um. ``boletim`` lê o arquivo (somente leitura, com cache) e
+``restaurar_turma`` devolve a turma às tabelas com as mesmas chaves.
+"""
+import gzip
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+from itertools import chain
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import busca
+from .armazenamento import armazenamento
+from .boletim import matriz_de_dados
+from .cache import TEMPO_CACHE, invalidar_professor, invalidar_turmas
+from .contadores import atualizar_contadores
+from .models import (Aluno, Atividade, Aviso, Entrega, Material, Nota, ResumoNotas,
+                     Turma, TurmaArquivada)
+
+FORMATO = 1
+# Turmas por transação
+TAMANHO_LOTE = 20
+TAMANHO_INSERCAO = 1000
+
+# Seção do arquivo -> campo com o nome no armazenamento
+CAMPOS_ARQUIVO = {'materiais': 'arquivo', 'atividades': 'arquivo_anexo', 'entregas': 'arquivo'}
+
+
+class _Codificador(DjangoJSONEncoder):
+    # Datas com os microssegundos (o DjangoJSONEncoder corta em milissegundos)
+    def default(self, valor):
+        if isinstance(valor, datetime):
+            return valor.isoformat()
+        return super().default(valor)
+
+
+def _pasta():
+    return Path(settings.ESCOLA_ARQUIVO_DIR)
+
+
+def _linha(objeto):
+    return {campo.attname: getattr(objeto, campo.attname) for campo in objeto._meta.concrete_fields}
+
+
+def _linhas(consulta):
+    campos = [campo.attname for campo in consulta.model._meta.concrete_fields]
+    return list(consulta.order_by('pk').values(*campos))
+
+
+def _coletar(turma):
+    alunos = turma.alunos.order_by('nome', 'pk').values_list('pk', 'nome', 'matricula')
+    return {
+        'formato': FORMATO,
+        'turma': _linha(turma),
+        'alunos': [list(aluno) for aluno in alunos],
+        'atividades': _linhas(Atividade.objects.filter(turma=turma)),
+        'materiais': _linhas(Material.objects.filter(turma=turma)),
+        'avisos': _linhas(Aviso.objects.filter(turma=turma)),
+        'entregas': _linhas(Entrega.objects.filter(atividade__turma=turma)),
+        'notas': _linhas(Nota.objects.filter(entrega__atividade__turma=turma)),
+        'resumos': _linhas(ResumoNotas.objects.filter(turma=turma)),
+    }
+
+
+def _reter_anexos(dados):
+    """Uma referência a mais para cada anexo, que passa a ser do arquivo."""
+    nomes = []
+    for secao, campo in CAMPOS_ARQUIVO.items():
+        for linha in dados[secao]:
+            if not linha[campo]:
+                continue
+            try:
+                linha[campo] = armazenamento.clonar(linha[campo])
+            except FileNotFoundError:
+                continue  # Já sumiu do disco: fica só o nome
+            nomes.append(linha[campo])
+    return nomes
+
+
+def _gravar(dados, caminho):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_name(caminho.name + '.tmp')
+    with gzip.open(temporario, 'wt', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo, cls=_Codificador, separators=(',', ':'))
+    os.replace(temporario, caminho)
+    return caminho.stat().st_size
+
+
+def ler(arquivada):
+    """Conteúdo completo do arquivo de ``arquivada`` (dicionário do JSON)."""
+    with gzip.open(_pasta() / arquivada.arquivo, 'rt', encoding='utf-8') as arquivo:
+        return json.load(arquivo)
+
+
+def _arquivar_turma(turma):
+    dados = _coletar(turma)
+    anexos = _reter_anexos(dados)
+    relativo = f'{turma.ano}/turma_{turma.pk}.json.gz'
+    tamanho = _gravar(dados, _pasta() / relativo)
+    TurmaArquivada.objects.create(
+        id_original=turma.pk, nome=turma.nome, ano=turma.ano, professor_id=turma.professor_id,
+        arquivo=relativo, tamanho=tamanho, total_alunos=len(dados['alunos']),
+        total_atividades=len(dados['atividades']), total_entregas=len(dados['entregas']),
+        arquivos=anexos,
+    )
+    return _pasta() / relativo
+
+
+def arquivar_ano(ano, professor=None, tamanho_lote=TAMANHO_LOTE, agora=None):
+    """Arquiva as turmas de ``ano`` (só as de ``professor``, se dado); retorna quantas."""
+    if ano >= timezone.localdate(agora).year:
+        raise ValueError(f'O ano {ano} ainda não foi encerrado.')
+    turmas = Turma.objects.filter(ano=ano)
+    if professor is not None:
+        turmas = turmas.filter(professor=professor)
+    return arquivar_turmas(turmas.order_by('pk').values_list('pk', flat=True), tamanho_lote)
+
+
+def arquivar_turmas(turmas_ids, tamanho_lote=TAMANHO_LOTE):
+    """Arquiva as turmas de ``turmas_ids``, um lote por transação; retorna quantas."""
+    ids = list(turmas_ids)
+    for inicio in range(0, len(ids), tamanho_lote):
+        lote = ids[inicio:inicio + tamanho_lote]
+        gravados = []
+        try:
+            with transaction.atomic():
+                for turma in Turma.objects.filter(pk__in=lote):
+                    gravados.append(_arquivar_turma(turma))
+                # Em cascata: os sinais com origem em Turma não refazem resumos
+                # nem contadores, e a referência dos anexos fica com o arquivo
+                Turma.objects.filter(pk__in=lote).delete()
+        except BaseException:
+            for caminho in gravados:
+                caminho.unlink(missing_ok=True)
+            raise
+    return len(ids)
+
+
+def _recriar(modelo, linhas):
+    """``bulk_create`` das ``linhas`` do arquivo com as chaves e datas originais."""
+    campos = {campo.attname: campo for campo in modelo._meta.concrete_fields}
+    objetos = [
+        modelo(**{nome: campos[nome].to_python(valor) for nome, valor in linha.items()})
+        for linha in linhas
+    ]
+    # auto_now/auto_now_add trocariam as datas pelo instante da restauração
+    automaticas = [
+        nome for nome, campo in campos.items()
+        if getattr(campo, 'auto_now', False) or getattr(campo, 'auto_now_add', False)
+    ]
+    originais = [[getattr(objeto, nome) for nome in automaticas] for objeto in objetos]
+    modelo.objects.bulk_create(objetos, batch_size=TAMANHO_INSERCAO)
+    if automaticas and objetos:
+        for objeto, valores in zip(objetos, originais):
+            for nome, valor in zip(automaticas, valores):
+                setattr(objeto, nome, valor)
+        modelo.objects.bulk_update(objetos, automaticas, batch_size=TAMANHO_INSERCAO)
+    return objetos
+
+
+def restaurar_turma(arquivada):
+    """Devolve a turma arquivada às tabelas; retorna a ``Turma``.
+
+    Alunos apagados depois do arquivamento ficam de fora, com suas entregas,
+    notas e resumos.
+    """
+    dados = ler(arquivada)
+    turma_id = arquivada.id_original
+    with transaction.atomic():
+        if Turma.objects.filter(pk=turma_id).exists():
+            raise ValueError(f'Já existe uma turma com o id {turma_id}.')
+        existentes = set(Aluno.objects.filter(
+            pk__in=[aluno[0] for aluno in dados['alunos']]
+        ).values_list('pk', flat=True))
+        entregas = [linha for linha in dados['entregas'] if linha['aluno_id'] in existentes]
+        restauradas = {linha['id'] for linha in entregas}
+
+        turma, = _recriar(Turma, [dados['turma']])
+        conteudos = [_recriar(modelo, dados[secao]) for modelo, secao in (
+            (Atividade, 'atividades'), (Material, 'materiais'), (Aviso, 'avisos'),
+        )]
+        Aluno.turmas.through.objects.bulk_create([
+            Aluno.turmas.through(aluno_id=aluno_id, turma_id=turma_id) for aluno_id in sorted(existentes)
+        ])
+        _recriar(Entrega, entregas)
+        _recriar(Nota, [linha for linha in dados['notas'] if linha['entrega_id'] in restauradas])
+        _recriar(ResumoNotas, [linha for linha in dados['resumos'] if linha['aluno_id'] in existentes])
+        for objeto in chain(*conteudos):
+            busca.indexar(objeto)
+        atualizar_contadores([turma_id])
+
+        # As referências dos anexos voltam para as linhas; as que ficaram de fora são liberadas
+        usados = Counter(
+            linha[campo] for secao, campo in CAMPOS_ARQUIVO.items()
+            for linha in (entregas if secao == 'entregas' else dados[secao]) if linha[campo]
+        )
+        sobras = list((Counter(arquivada.arquivos) - usados).elements())
+        caminho = _pasta() / arquivada.arquivo
+        arquivada.delete()
+
+        def liberar():
+            for nome in sobras:
+                armazenamento.delete(nome)
+            caminho.unlink(missing_ok=True)
+        transaction.on_commit(liberar)
+    invalidar_professor(turma.professor_id)
+    invalidar_turmas([turma_id])
+    return turma
+
+
+def _dados_boletim(dados):
+    """Só o que o boletim usa, no formato guardado no cache."""
+    entregas = {linha['id']: (linha['aluno_id'], linha['atividade_id']) for linha in dados['entregas']}
+    atividades = sorted(dados['atividades'], key=lambda linha: (linha['data_entrega'], linha['id']))
+    return {
+        'alunos': [tuple(aluno) for aluno in dados['alunos']],
+        'atividades': [
+            (linha['id'], linha['titulo'], Decimal(linha['valor_pontos']),
+             parse_datetime(linha['data_entrega']))
+            for linha in atividades
+        ],
+        'notas': [(*entregas[linha['entrega_id']], Decimal(linha['valor'])) for linha in dados['notas']],
+    }
+
+
+def boletim(arquivada, ponderada=False):
+    """``MatrizNotas`` da turma arquivada, lida do arquivo uma vez e depois do cache."""
+    # O arquivo não muda: a chave só precisa do id, que some na restauração
+    chave = f'escola:arquivada:{arquivada.pk}:boletim'
+    dados = cache.get(chave)
+    if dados is None:
+        dados = _dados_boletim(ler(arquivada))
+        cache.set(chave, dados, TEMPO_CACHE)
+    alunos = [Aluno(pk=pk, nome=nome, matricula=matricula) for pk, nome, matricula in dados['alunos']]
+    atividades = [
+        Atividade(pk=pk, titulo=titulo, valor_pontos=valor_pontos, data_entrega=data_entrega)
+        for pk, titulo, valor_pontos, data_entrega in dados['atividades']
+    ]
+    return matriz_de_dados(arquivada, alunos, atividades, dados['notas'], ponderada)
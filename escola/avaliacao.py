@@ -0,0 +1,50 @@
+# avaliacao.py
+"""Avaliação em lote das entregas de uma atividade."""
+from django.db import transaction
+
+from .cache import invalidar_professor, invalidar_turmas
+from .models import Entrega, Nota
+from .resumos import atualizar_resumos
+
+
+def salvar_notas_em_lote(atividade, avaliacoes):
+    """Grava as notas de ``avaliacoes`` numa única transação.
+
+    ``avaliacoes`` é uma lista de ``(entrega, valor, comentario)`` de entregas
+    da ``atividade``. Notas novas entram com ``bulk_create``, as alteradas com
+    ``bulk_update`` e o status das entregas avaliadas muda com um só UPDATE.
+    Retorna quantas entregas foram avaliadas ou reavaliadas.
+    """
+    ids = [entrega.pk for entrega, _, _ in avaliacoes]
+    existentes = {nota.entrega_id: nota for nota in Nota.objects.filter(entrega_id__in=ids)}
+
+    novas, alteradas = [], []
+    for entrega, valor, comentario in avaliacoes:
+        nota = existentes.get(entrega.pk)
+        if nota is None:
+            novas.append(Nota(entrega=entrega, valor=valor, comentario_professor=comentario))
+        elif nota.valor != valor or nota.comentario_professor != comentario:
+            nota.valor = valor
+            nota.comentario_professor = comentario
+            alteradas.append(nota)
+    afetadas = {nota.entrega_id for nota in novas + alteradas}
+    if not afetadas:
+        return 0
+
+    with transaction.atomic():
+        Nota.objects.bulk_create(novas)
+        Nota.objects.bulk_update(alteradas, ['valor', 'comentario_professor'])
+        Entrega.objects.filter(pk__in=afetadas).exclude(status='AVALIADO').update(status='AVALIADO')
+        # Operações em lote não disparam sinais; o resumo é atualizado aqui
+        atualizar_resumos(
+            (entrega.aluno_id, atividade.turma_id)
+            for entrega, _, _ in avaliacoes if entrega.pk in afetadas
+        )
+
+        def invalidar():
+            invalidar_professor(atividade.turma.professor_id)
+            invalidar_turmas([atividade.turma_id], 'notas')
+        # Só depois do commit: antes dele, outra requisição recalcularia o
+        # cache com as notas antigas, sob a versão já nova
+        transaction.on_commit(invalidar)
+    return len(afetadas)
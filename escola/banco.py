@@ -0,0 +1,102 @@
+# banco.py
+"""Ajustes do SQLite para produção e a réplica de leitura.
+
+- ``configurar_conexao`` roda a cada conexão nova (sinal
+  ``connection_created``) e aplica os PRAGMAs de ``ESCOLA_SQLITE_PRAGMAS``
+  do alias: WAL, ``synchronous=NORMAL``, ``mmap_size``, ``busy_timeout``...
+- ``RoteadorReplica`` manda as leituras dos modelos do app para a réplica
+  enquanto ``leituras_na_replica`` estiver ativo (o
+  ``ReplicaLeituraMiddleware`` ativa em GET/HEAD). Escritas vão sempre para
+  o principal, e depois de uma escrita o resto da requisição também lê dele.
+  A réplica fica para trás do principal, então o que vai para o cache é lido
+  do principal (``leituras_na_replica(False)``, em ``cache.py`` e na tag
+  ``{% cache %}`` de ``templatetags/cache_principal.py``).
+- ``sincronizar_replica`` copia o banco principal por cima da réplica com a
+  API de backup do SQLite, que lê um retrato consistente mesmo com escritas
+  acontecendo (comando ``sincronizar_replica``).
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+APPS_NA_REPLICA = {'escola'}
+
+_ler_da_replica = ContextVar('escola_ler_da_replica', default=False)
+
+
+def alias_replica():
+    return getattr(settings, 'ESCOLA_BANCO_REPLICA', 'replica')
+
+
+def configurar_conexao(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'ESCOLA_SQLITE_PRAGMAS', {}).get(connection.alias, {})
+    with connection.cursor() as cursor:
+        for nome, valor in pragmas.items():
+            cursor.execute(f'PRAGMA {nome} = {valor}')
+
+
+@contextmanager
+def leituras_na_replica(ativo=True):
+    token = _ler_da_replica.set(ativo)
+    try:
+        yield
+    finally:
+        _ler_da_replica.reset(token)
+
+
+class RoteadorReplica:
+    def db_for_read(self, model, **hints):
+        if _ler_da_replica.get() and model._meta.app_label in APPS_NA_REPLICA:
+            return alias_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # A réplica ainda não tem o que acabou de ser gravado
+        _ler_da_replica.set(False)
+        # Explícito: senão o Django gravaria objetos lidos da réplica de volta nela
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, alias_replica()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica é uma cópia do principal, já migrado
+        if db == alias_replica():
+            return False
+        return None
+
+
+def copiar_banco(origem, destino, tempo_espera=30):
+    """Copia o arquivo SQLite ``origem`` sobre ``destino`` com a API de backup.
+
+    A cópia é feita num passo só: quem lê o destino vê o banco antigo ou o
+    novo, nunca uma mistura. Retorna a duração em segundos.
+    """
+    inicio = time.perf_counter()
+    fonte = sqlite3.connect(origem, timeout=tempo_espera)
+    try:
+        alvo = sqlite3.connect(destino, timeout=tempo_espera)
+        try:
+            fonte.backup(alvo)
+        finally:
+            alvo.close()
+    finally:
+        fonte.close()
+    return time.perf_counter() - inicio
+
+
+def sincronizar_replica(origem=DEFAULT_DB_ALIAS, destino=None):
+    destino = destino or alias_replica()
+    bancos = settings.DATABASES
+    if destino not in bancos:
+        raise ValueError(f'Banco {destino!r} não configurado em DATABASES.')
+    return copiar_banco(str(bancos[origem]['NAME']), str(bancos[destino]['NAME']))
@@ -0,0 +1,473 @@
+# benchmark.py
+"""Benchmark das rotas de ``escola.urls`` em bancos de tamanhos diferentes.
+
+Para cada tamanho, esvazia o banco, gera uma escola sintética
+(``sintetico.gerar_escola``) e faz ``repeticoes`` GETs em cada rota como um
+dos professores gerados, medindo a latência e o número de consultas. O
+resultado é um dicionário pronto para ``json.dump``, para comparar versões.
+
+``medir_vazao`` compara as views de leitura síncronas (``views``, servidas
+pelo ``WSGIHandler`` numa thread por cliente) com as assíncronas
+(``views_async``, servidas pelo ``ASGIHandler`` num laço de eventos) sob
+vários clientes simultâneos, chamando os handlers do Django diretamente,
+sem servidor HTTP no meio.
+"""
+import asyncio
+import logging
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from importlib import import_module
+from io import BytesIO
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from . import urls as escola_urls
+from . import views, views_async
+from .arquivamento import arquivar_turmas
+from .models import Atividade, Entrega, Material, Tarefa, Turma, TurmaArquivada
+from .sintetico import gerar_escola
+
+TAMANHOS = (10, 100, 500)
+REPETICOES = 5
+TAMANHO_ARQUIVO = 256 * 1024
+
+# Parâmetros de URL -> objeto de amostra; ``pk`` depende do prefixo da rota
+PREFIXOS_PK = {
+    'turmas': 'turma',
+    'alunos': 'aluno',
+    'materiais': 'material',
+    'atividades': 'atividade',
+    'tarefas': 'tarefa',
+    'arquivo': 'arquivada',
+}
+PARAMETROS = {
+    'turma_id': 'turma',
+    'aluno_id': 'aluno',
+    'entrega_id': 'entrega',
+}
+CONSULTAS = {
+    'buscar': 'q=lista',
+}
+# Rotas que apagam o objeto: cada requisição recebe um material novo
+DESTRUTIVAS = {'deletar_material'}
+
+# Rotas com versão assíncrona (views_async) e parâmetros de medir_vazao
+ROTAS_ASYNC = ('dashboard', 'detalhes_turma', 'detalhes_aluno', 'boletim_turma')
+CLIENTES = (1, 8, 32)
+REQUISICOES = 200
+
+
+def _com_arquivo(objeto, campo, nome):
+    # As rotas de download precisam de um arquivo de verdade para medir
+    if not getattr(objeto, campo):
+        getattr(objeto, campo).save(nome, ContentFile(b'0' * TAMANHO_ARQUIVO))
+    return objeto
+
+
+def _amostras(professor):
+    turma = Turma.objects.filter(professor=professor).order_by('pk').first()
+    atividade = Atividade.objects.filter(turma=turma).order_by('pk').first()
+    entrega = (
+        Entrega.objects.filter(atividade__turma=turma, nota__isnull=False).order_by('pk').first()
+        or Entrega.objects.filter(atividade=atividade).order_by('pk').first()
+    )
+    material = Material.objects.filter(turma=turma).order_by('pk').first()
+    tarefa = Tarefa.objects.create(
+        tipo='exportar_boletim', professor=professor, status='CONCLUIDA', progresso=100,
+        resultado={'arquivo': 'boletins.csv'}, concluida_em=timezone.now(),
+    )
+    return {
+        'turma': turma,
+        'arquivada': _arquivada(turma),
+        'aluno': turma.alunos.order_by('pk').first(),
+        'atividade': _com_arquivo(atividade, 'arquivo_anexo', 'enunciado.pdf'),
+        'entrega': _com_arquivo(entrega, 'arquivo', 'resposta.pdf'),
+        'material': _com_arquivo(material, 'arquivo', 'apostila.pdf'),
+        'tarefa': _com_arquivo(tarefa, 'arquivo', 'boletins.csv'),
+    }
+
+
+def _arquivada(turma):
+    # Uma turma arquivada do professor; sem nenhuma, arquiva uma cópia com os alunos da amostra
+    arquivada = TurmaArquivada.objects.filter(professor_id=turma.professor_id).order_by('pk').first()
+    if arquivada is None:
+        copia = Turma.objects.create(nome=f'{turma.nome} (arquivo)', ano=turma.ano - 1,
+                                     professor_id=turma.professor_id)
+        copia.alunos.set(turma.alunos.all())
+        arquivar_turmas([copia.pk])
+        arquivada = TurmaArquivada.objects.get(id_original=copia.pk)
+    return arquivada
+
+
+def _novo_material(turma):
+    return Material.objects.create(titulo='Material temporário', descricao='-', tipo='LINK', turma=turma)
+
+
+def url_da_rota(padrao, amostras):
+    """Monta a URL de ``padrao`` com os objetos de ``amostras``."""
+    parametros = {}
+    for nome in padrao.pattern.converters:
+        if nome == 'pk':
+            prefixo = str(padrao.pattern).split('/')[0]
+            chave = PREFIXOS_PK.get(prefixo)
+        else:
+            chave = PARAMETROS.get(nome)
+        if chave is None:
+            raise ValueError(f'Rota {padrao.name!r}: não sei preencher o parâmetro {nome!r}.')
+        parametros[nome] = amostras[chave].pk
+    url = reverse(f'{escola_urls.app_name}:{padrao.name}', kwargs=parametros)
+    if padrao.name in CONSULTAS:
+        url = f'{url}?{CONSULTAS[padrao.name]}'
+    return url
+
+
+def _estatisticas(tempos):
+    tempos = sorted(tempos)
+    p95 = statistics.quantiles(tempos, n=20)[-1] if len(tempos) > 1 else tempos[0]
+    return {
+        'min_ms': round(tempos[0], 2),
+        'mediana_ms': round(statistics.median(tempos), 2),
+        'p95_ms': round(p95, 2),
+        'max_ms': round(tempos[-1], 2),
+    }
+
+
+def _requisitar(client, url):
+    with CaptureQueriesContext(connection) as consultas:
+        inicio = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        duracao = (time.perf_counter() - inicio) * 1000
+    return response.status_code, len(consultas), duracao
+
+
+@contextmanager
+def ambiente_descartavel(prefixo='escola-benchmark-'):
+    """Aponta ``MEDIA_ROOT``, ``ESCOLA_ARQUIVO_DIR`` e o cache para pastas temporárias.
+
+    Os arquivos de amostra e as turmas arquivadas por ``_arquivada`` ficam
+    nelas, e não sobrescrevem os de verdade. O cache, do mesmo tipo do
+    compartilhado, não recebe dados do banco de teste nem é esvaziado no
+    lugar do real. As pastas são apagadas no fim.
+    """
+    pasta = tempfile.mkdtemp(prefix=prefixo)
+    cache_descartavel = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(pasta, 'cache'),
+    }
+    try:
+        with override_settings(MEDIA_ROOT=os.path.join(pasta, 'media'),
+                               ESCOLA_ARQUIVO_DIR=os.path.join(pasta, 'arquivo'),
+                               CACHES={'default': cache_descartavel}):
+            yield
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+
+@contextmanager
+def _sem_log_sql():
+    # A linha de log por requisição do middleware só atrapalharia a saída
+    registro_sql = logging.getLogger('escola.sql')
+    desativado, registro_sql.disabled = registro_sql.disabled, True
+    try:
+        yield
+    finally:
+        registro_sql.disabled = desativado
+
+
+def medir_rotas(professor, repeticoes=REPETICOES, frio=False):
+    """Mede todas as rotas de ``escola.urls`` como ``professor``.
+
+    Cada rota recebe uma requisição de aquecimento, que não entra na conta.
+    Com ``frio=True`` o cache é limpo antes de cada requisição.
+    """
+    client = Client()
+    client.force_login(professor)
+    amostras = _amostras(professor)
+    with _sem_log_sql():
+        return _medir(client, amostras, repeticoes, frio)
+
+
+def _medir(client, amostras, repeticoes, frio):
+    resultados = {}
+    for padrao in escola_urls.urlpatterns:
+        tempos, consultas, status = [], set(), set()
+        for i in range(repeticoes + 1):
+            if padrao.name in DESTRUTIVAS:
+                url = url_da_rota(padrao, dict(amostras, material=_novo_material(amostras['turma'])))
+            else:
+                url = url_da_rota(padrao, amostras)
+            if frio:
+                cache.clear()
+            codigo, quantidade, duracao = _requisitar(client, url)
+            if i == 0:
+                continue
+            tempos.append(duracao)
+            consultas.add(quantidade)
+            status.add(codigo)
+        resultados[padrao.name] = {
+            'url': str(padrao.pattern),
+            'status': sorted(status),
+            'consultas': max(consultas),
+            **_estatisticas(tempos),
+        }
+    return resultados
+
+
+class UrlconfLeitura:
+    """Urlconf raiz com as rotas do app e as views de leitura de ``leitura``.
+
+    Para usar em ``ROOT_URLCONF`` (via ``override_settings``) e alternar entre
+    ``views`` e ``views_async`` sem depender de ``ESCOLA_VIEWS_ASYNC``.
+    """
+
+    def __init__(self, leitura):
+        padroes = [
+            path(str(padrao.pattern),
+                 getattr(leitura, padrao.name) if padrao.name in ROTAS_ASYNC else padrao.callback,
+                 name=padrao.name)
+            for padrao in escola_urls.urlpatterns
+        ]
+        # Admin, login e logout continuam vindo da urlconf do projeto
+        demais = [
+            padrao for padrao in import_module(settings.ROOT_URLCONF).urlpatterns
+            if getattr(padrao, 'app_name', None) != escola_urls.app_name
+        ]
+        self.urlpatterns = [path('', include((padroes, escola_urls.app_name))), *demais]
+
+
+def _ambiente_wsgi(url, cookie):
+    caminho, _, consulta = url.partition('?')
+    return {
+        'REQUEST_METHOD': 'GET',
+        'SCRIPT_NAME': '',
+        'PATH_INFO': caminho,
+        'QUERY_STRING': consulta,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'testserver',
+        'HTTP_COOKIE': cookie,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': BytesIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+
+
+def _get_wsgi(aplicacao, url, cookie):
+    status = []
+    corpo = aplicacao(_ambiente_wsgi(url, cookie), lambda linha, cabecalhos, *_: status.append(linha))
+    try:
+        for _ in corpo:
+            pass
+    finally:
+        if hasattr(corpo, 'close'):
+            corpo.close()
+    return int(status[0].split()[0])
+
+
+async def _get_asgi(aplicacao, url, cookie):
+    caminho, _, consulta = url.partition('?')
+    escopo = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': caminho,
+        'raw_path': caminho.encode(),
+        'query_string': consulta.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    enviado = asyncio.Event()
+    pedido_lido = False
+    status = []
+
+    async def receber():
+        nonlocal pedido_lido
+        if not pedido_lido:
+            pedido_lido = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # O cliente só "desconecta" depois de receber a resposta inteira
+        await enviado.wait()
+        return {'type': 'http.disconnect'}
+
+    async def enviar(mensagem):
+        if mensagem['type'] == 'http.response.start':
+            status.append(mensagem['status'])
+        elif not mensagem.get('more_body'):
+            enviado.set()
+
+    await aplicacao(escopo, receber, enviar)
+    return status[0]
+
+
+def _resumo_vazao(duracao, latencias, status):
+    return {
+        'requisicoes_por_segundo': round(len(latencias) / duracao, 1),
+        'status': sorted(status),
+        **_estatisticas([latencia * 1000 for latencia in latencias]),
+    }
+
+
+def _vazao_wsgi(url, cookie, clientes, requisicoes):
+    aplicacao = WSGIHandler()
+    por_cliente = max(requisicoes // clientes, 1)
+
+    def cliente():
+        latencias, status = [], set()
+        for _ in range(por_cliente):
+            inicio = time.perf_counter()
+            status.add(_get_wsgi(aplicacao, url, cookie))
+            latencias.append(time.perf_counter() - inicio)
+        return latencias, status
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(clientes) as pool:
+        resultados = list(pool.map(lambda _: cliente(), range(clientes)))
+    duracao = time.perf_counter() - inicio
+    return _resumo_vazao(
+        duracao,
+        [latencia for latencias, _ in resultados for latencia in latencias],
+        set().union(*(status for _, status in resultados)),
+    )
+
+
+def _vazao_asgi(url, cookie, clientes, requisicoes):
+    aplicacao = ASGIHandler()
+    por_cliente = max(requisicoes // clientes, 1)
+
+    async def cliente():
+        latencias, status = [], set()
+        for _ in range(por_cliente):
+            inicio = time.perf_counter()
+            status.add(await _get_asgi(aplicacao, url, cookie))
+            latencias.append(time.perf_counter() - inicio)
+        return latencias, status
+
+    async def todos():
+        return await asyncio.gather(*(cliente() for _ in range(clientes)))
+
+    inicio = time.perf_counter()
+    resultados = asyncio.run(todos())
+    duracao = time.perf_counter() - inicio
+    return _resumo_vazao(
+        duracao,
+        [latencia for latencias, _ in resultados for latencia in latencias],
+        set().union(*(status for _, status in resultados)),
+    )
+
+
+MODOS_VAZAO = {
+    'wsgi': (views, _vazao_wsgi),
+    'asgi': (views_async, _vazao_asgi),
+}
+
+
+def medir_vazao(professor, clientes=CLIENTES, requisicoes=REQUISICOES):
+    """Requisições por segundo e latência de ``ROTAS_ASYNC`` em WSGI e ASGI.
+
+    Para cada rota, modo e quantidade de clientes simultâneos, faz cerca de
+    ``requisicoes`` GETs divididos entre os clientes, cada um em sequência.
+    Cada combinação começa com uma requisição de aquecimento fora da conta.
+    """
+    client = Client()
+    client.force_login(professor)
+    cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+    amostras = _amostras(professor)
+    padroes = {padrao.name: padrao for padrao in escola_urls.urlpatterns}
+
+    resultados = {}
+    with _sem_log_sql():
+        for nome in ROTAS_ASYNC:
+            url = url_da_rota(padroes[nome], amostras)
+            resultados[nome] = {'url': url}
+            for modo, (leitura, medir) in MODOS_VAZAO.items():
+                with override_settings(ROOT_URLCONF=UrlconfLeitura(leitura)):
+                    medir(url, cookie, 1, 1)
+                    resultados[nome][modo] = {
+                        str(quantidade): medir(url, cookie, quantidade, requisicoes)
+                        for quantidade in clientes
+                    }
+    return resultados
+
+
+def rodar_benchmark(tamanhos=TAMANHOS, repeticoes=REPETICOES, frio=False, rotulo='', **parametros):
+    """Roda o benchmark para cada quantidade de alunos por turma em ``tamanhos``.
+
+    Apaga todos os dados do banco atual a cada tamanho; use um banco
+    descartável, dentro de ``ambiente_descartavel``. ``parametros`` vão para
+    ``gerar_escola`` (professores, turmas, atividades...).
+    """
+    resultado = {
+        'rotulo': rotulo,
+        'gerado_em': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'banco': connection.vendor,
+        'repeticoes': repeticoes,
+        'cache_frio': frio,
+        'tamanhos': [],
+    }
+    for alunos in tamanhos:
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+        inicio = time.perf_counter()
+        relatorio = gerar_escola(alunos=alunos, semente=alunos, **parametros)
+        geracao = time.perf_counter() - inicio
+        professor = Turma.objects.order_by('pk').first().professor
+        resultado['tamanhos'].append({
+            'alunos_por_turma': alunos,
+            'dados': vars(relatorio),
+            'geracao_s': round(geracao, 2),
+            'rotas': medir_rotas(professor, repeticoes, frio),
+        })
+    return resultado
+
+
+def rodar_vazao(alunos=100, clientes=CLIENTES, requisicoes=REQUISICOES, rotulo='', **parametros):
+    """Gera uma escola com ``alunos`` por turma e roda ``medir_vazao``.
+
+    Como ``rodar_benchmark``, apaga todos os dados do banco atual.
+    """
+    call_command('flush', interactive=False, verbosity=0)
+    cache.clear()
+    gerar_escola(alunos=alunos, semente=alunos, **parametros)
+    professor = Turma.objects.order_by('pk').first().professor
+    return {
+        'rotulo': rotulo,
+        'gerado_em': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'banco': connection.vendor,
+        'alunos_por_turma': alunos,
+        'requisicoes': requisicoes,
+        'rotas': medir_vazao(professor, clientes, requisicoes),
+    }
@@ -0,0 +1,126 @@
+# boletim.py
+"""Matriz de notas (aluno x atividade) de uma turma.
+
+Monta o boletim inteiro com um número fixo de consultas, independente do
+tamanho da turma, para ser reutilizado pela view do boletim e por exportações.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from decimal import Decimal, ROUND_HALF_UP
+
+from .models import Aluno, Atividade, Nota
+
+DUAS_CASAS = Decimal('0.01')
+
+
+def arredondar(valor):
+    if valor is None:
+        return None
+    return Decimal(valor).quantize(DUAS_CASAS, rounding=ROUND_HALF_UP)
+
+
+@dataclass
+class LinhaBoletim:
+    aluno: Aluno
+    notas: list
+    total_notas: int = 0
+    media: Decimal = Decimal('0.00')
+    media_ponderada: Decimal = None
+
+
+@dataclass
+class MatrizNotas:
+    turma: object
+    atividades: list
+    linhas: list = field(default_factory=list)
+
+    def __iter__(self):
+        return iter(self.linhas)
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def __bool__(self):
+        return bool(self.linhas)
+
+
+def _consultas_matriz(turma):
+    alunos = turma.alunos.all()
+    atividades = (
+        Atividade.objects.filter(turma=turma)
+        .order_by('data_entrega', 'pk')
+        .only('pk', 'titulo', 'valor_pontos', 'data_entrega')
+    )
+    valores = Nota.objects.filter(entrega__atividade__turma=turma).values_list(
+        'entrega__aluno_id', 'entrega__atividade_id', 'valor'
+    )
+    return alunos, atividades, valores
+
+
+def montar_matriz_notas(turma, ponderada=False):
+    """Retorna a ``MatrizNotas`` da turma.
+
+    São três consultas: alunos, atividades e todas as notas da turma (só as
+    colunas necessárias). O pivô, as contagens e as médias são calculados em
+    memória. Com ``ponderada=True`` cada linha recebe também a média ponderada
+    por ``Atividade.valor_pontos``.
+    """
+    alunos, atividades, valores = _consultas_matriz(turma)
+    return _pivotar(turma, list(alunos), list(atividades), valores.iterator(), ponderada)
+
+
+async def amontar_matriz_notas(turma, ponderada=False):
+    """Versão assíncrona de ``montar_matriz_notas``, com as três consultas em paralelo."""
+    consultas = _consultas_matriz(turma)
+    alunos, atividades, valores = await asyncio.gather(
+        *(_alistar(consulta) for consulta in consultas)
+    )
+    return _pivotar(turma, alunos, atividades, valores, ponderada)
+
+
+def matriz_de_dados(turma, alunos, atividades, valores, ponderada=False):
+    """``MatrizNotas`` de dados já carregados, como os de uma turma arquivada.
+
+    ``valores`` são tuplas ``(aluno_id, atividade_id, valor)``.
+    """
+    return _pivotar(turma, list(alunos), list(atividades), valores, ponderada)
+
+
+async def _alistar(consulta):
+    return [item async for item in consulta]
+
+
+def _pivotar(turma, alunos, atividades, valores, ponderada):
+    coluna = {atividade.pk: i for i, atividade in enumerate(atividades)}
+    pesos = [atividade.valor_pontos for atividade in atividades]
+
+    notas_por_aluno = {aluno.pk: [None] * len(atividades) for aluno in alunos}
+    for aluno_id, atividade_id, valor in valores:
+        # Notas de alunos que saíram da turma não entram no boletim
+        if aluno_id in notas_por_aluno:
+            notas_por_aluno[aluno_id][coluna[atividade_id]] = valor
+
+    matriz = MatrizNotas(turma=turma, atividades=atividades)
+    for aluno in alunos:
+        notas = notas_por_aluno[aluno.pk]
+        lancadas = [valor for valor in notas if valor is not None]
+        linha = LinhaBoletim(aluno=aluno, notas=notas, total_notas=len(lancadas))
+        if lancadas:
+            linha.media = arredondar(sum(lancadas) / len(lancadas))
+        if ponderada:
+            linha.media_ponderada = media_ponderada(notas, pesos)
+        matriz.linhas.append(linha)
+    return matriz
+
+
+def media_ponderada(notas, pesos):
+    soma = Decimal('0')
+    soma_pesos = Decimal('0')
+    for valor, peso in zip(notas, pesos):
+        if valor is None or not peso:
+            continue
+        soma += valor * peso
+        soma_pesos += peso
+    if not soma_pesos:
+        return Decimal('0.00')
+    return arredondar(soma / soma_pesos)
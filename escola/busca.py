@@ -0,0 +1,170 @@
+# busca.py
+"""Busca textual em materiais, atividades e avisos.
+
+Usa uma tabela virtual FTS5 do SQLite (``escola_busca``, criada na migração
+0005). O ``rowid`` de cada linha codifica o tipo e o id do objeto, então
+atualizar ou remover um item é uma operação por chave. Fora do SQLite (ou
+sem FTS5) a busca cai para ``icontains``, sem ranking.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Atividade, Aviso, Material, Turma
+
+TABELA = 'escola_busca'
+TAMANHO_LOTE = 500
+LIMITE_RESULTADOS = 50
+
+# tipo -> (código no rowid, modelo, campo do conteúdo)
+TIPOS = {
+    'material': (1, Material, 'descricao'),
+    'atividade': (2, Atividade, 'descricao'),
+    'aviso': (3, Aviso, 'conteudo'),
+}
+TIPO_DO_MODELO = {modelo: tipo for tipo, (_, modelo, _) in TIPOS.items()}
+
+# Marcadores que não aparecem em texto comum; trocados por <mark> após o escape
+INICIO_DESTAQUE, FIM_DESTAQUE = '\x02', '\x03'
+
+_tabela_existe = False
+
+
+def disponivel():
+    global _tabela_existe
+    if connection.vendor != 'sqlite':
+        return False
+    if not _tabela_existe:
+        _tabela_existe = TABELA in connection.introspection.table_names()
+    return _tabela_existe
+
+
+def _rowid(tipo, objeto_id):
+    return objeto_id * 4 + TIPOS[tipo][0]
+
+
+def _linha(tipo, objeto):
+    _, _, campo = TIPOS[tipo]
+    return (_rowid(tipo, objeto.pk), tipo, objeto.pk, objeto.turma_id,
+            objeto.titulo, getattr(objeto, campo))
+
+
+def indexar(objeto):
+    tipo = TIPO_DO_MODELO[type(objeto)]
+    if not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA} WHERE rowid = %s', [_rowid(tipo, objeto.pk)])
+        cursor.execute(
+            f'INSERT INTO {TABELA} (rowid, tipo, objeto_id, turma_id, titulo, conteudo) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            _linha(tipo, objeto),
+        )
+
+
+def remover(objeto):
+    tipo = TIPO_DO_MODELO[type(objeto)]
+    if not disponivel():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA} WHERE rowid = %s', [_rowid(tipo, objeto.pk)])
+
+
+def reconstruir_indice(tamanho_lote=TAMANHO_LOTE):
+    """Recria o índice inteiro, inserindo em lotes. Retorna o total indexado."""
+    if not disponivel():
+        return 0
+    total = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABELA}')
+        for tipo, (_, modelo, campo) in TIPOS.items():
+            objetos = modelo.objects.order_by().only('pk', 'turma_id', 'titulo', campo)
+            lote = []
+            for objeto in objetos.iterator(chunk_size=tamanho_lote):
+                lote.append(_linha(tipo, objeto))
+                if len(lote) >= tamanho_lote:
+                    _inserir_lote(cursor, lote)
+                    total += len(lote)
+                    lote = []
+            _inserir_lote(cursor, lote)
+            total += len(lote)
+    return total
+
+
+def _inserir_lote(cursor, lote):
+    if lote:
+        cursor.executemany(
+            f'INSERT INTO {TABELA} (rowid, tipo, objeto_id, turma_id, titulo, conteudo) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            lote,
+        )
+
+
+def _consulta_fts(termo):
+    # Cada palavra vira um prefixo entre aspas: evita erro de sintaxe do FTS5
+    palavras = [palavra.replace('"', '""') for palavra in termo.split()]
+    return ' '.join(f'"{palavra}"*' for palavra in palavras if palavra)
+
+
+def _trecho_seguro(trecho):
+    trecho = escape(trecho)
+    return mark_safe(trecho.replace(INICIO_DESTAQUE, '<mark>').replace(FIM_DESTAQUE, '</mark>'))
+
+
+def buscar(termo, professor, limite=LIMITE_RESULTADOS):
+    """Busca ``termo`` nas turmas do ``professor``, do mais para o menos relevante.
+
+    Retorna dicionários com ``tipo``, ``objeto_id``, ``turma``, ``titulo`` e
+    ``trecho`` (HTML seguro com os termos destacados).
+    """
+    consulta = _consulta_fts(termo)
+    if not consulta:
+        return []
+    turmas = {turma.pk: turma for turma in Turma.objects.filter(professor=professor)}
+    if not turmas:
+        return []
+    if not disponivel():
+        return _buscar_sem_indice(termo, turmas, limite)
+
+    marcadores = ', '.join(['%s'] * len(turmas))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT tipo, objeto_id, turma_id, '
+            f"highlight({TABELA}, 3, %s, %s), "
+            f"snippet({TABELA}, 4, %s, %s, '…', 16) "
+            f'FROM {TABELA} WHERE {TABELA} MATCH %s AND turma_id IN ({marcadores}) '
+            # Título pesa mais que o conteúdo
+            f'ORDER BY bm25({TABELA}, 0, 0, 0, 10.0, 1.0) LIMIT %s',
+            [INICIO_DESTAQUE, FIM_DESTAQUE, INICIO_DESTAQUE, FIM_DESTAQUE,
+             consulta, *turmas, limite],
+        )
+        linhas = cursor.fetchall()
+    return [
+        {
+            'tipo': tipo,
+            'objeto_id': objeto_id,
+            'turma': turmas[turma_id],
+            'titulo': _trecho_seguro(titulo),
+            'trecho': _trecho_seguro(trecho),
+        }
+        for tipo, objeto_id, turma_id, titulo, trecho in linhas
+    ]
+
+
+def _buscar_sem_indice(termo, turmas, limite):
+    resultados = []
+    for tipo, (_, modelo, campo) in TIPOS.items():
+        encontrados = modelo.objects.filter(
+            Q(titulo__icontains=termo) | Q(**{f'{campo}__icontains': termo}),
+            turma_id__in=turmas,
+        )
+        for objeto in encontrados[:limite]:
+            resultados.append({
+                'tipo': tipo,
+                'objeto_id': objeto.pk,
+                'turma': turmas[objeto.turma_id],
+                'titulo': objeto.titulo,
+                'trecho': getattr(objeto, campo)[:200],
+            })
+    return resultados[:limite]
@@ -0,0 +1,154 @@
+# cache.py
+"""Cache por professor com invalidação por versão.
+
+Cada professor tem uma chave de versão; os dados em cache usam a versão no
+nome da chave. Qualquer alteração relevante (ver ``signals.py``) troca a
+versão por um valor novo e as entradas antigas simplesmente deixam de ser
+lidas, expirando sozinhas. As versões são aleatórias, não um contador: se a
+chave de versão for descartada pelo cache, a nova não coincide com uma
+versão antiga cujas entradas ainda estejam guardadas.
+
+As versões ficam no cache ``default``, o mesmo dos dados. Com o backend de
+arquivo (ou outro compartilhado) a invalidação feita por um processo vale
+para todos: servidor web, trabalhador de tarefas e comandos. Com ``locmem``
+cada processo tem suas próprias versões e só enxerga as próprias trocas.
+
+As turmas têm versões por seção (alunos, notas...) no mesmo esquema, usadas
+como chave dos fragmentos ``{% cache %}`` dos templates.
+
+O que vai para o cache é calculado lendo do banco principal, mesmo numa
+requisição servida pela réplica (``banco.py``): ela pode não ter a escrita
+que acabou de trocar a versão, e a entrada velha ficaria sob a chave nova
+até a próxima alteração.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .banco import leituras_na_replica
+
+TEMPO_CACHE = getattr(settings, 'ESCOLA_CACHE_TIMEOUT', 60 * 60)
+
+
+def _chave_versao(professor_id):
+    return f'escola:professor:{professor_id}:versao'
+
+
+def _nova_versao():
+    return uuid.uuid4().hex[:16]
+
+
+def _versao(chave):
+    versao = cache.get(chave)
+    if versao is None:
+        versao = _nova_versao()
+        # add() não sobrescreve uma versão gravada em paralelo
+        if not cache.add(chave, versao, None):
+            versao = cache.get(chave, versao)
+    return versao
+
+
+def _renovar(chave):
+    cache.set(chave, _nova_versao(), None)
+
+
+def versao_professor(professor_id):
+    return _versao(_chave_versao(professor_id))
+
+
+def invalidar_professor(*professores_ids):
+    for professor_id in set(professores_ids):
+        _renovar(_chave_versao(professor_id))
+
+
+def _chave(professor_id, versao, nome):
+    return f'escola:professor:{professor_id}:v{versao}:{nome}'
+
+
+def chave_professor(professor_id, nome):
+    return _chave(professor_id, versao_professor(professor_id), nome)
+
+
+def obter_ou_calcular(professor_id, nome, calcular, timeout=TEMPO_CACHE):
+    chave = chave_professor(professor_id, nome)
+    valor = cache.get(chave)
+    if valor is None:
+        with leituras_na_replica(False):
+            valor = calcular()
+        cache.set(chave, valor, timeout)
+    return valor
+
+
+# Versões por turma, para o cache de fragmentos dos templates: cada bloco
+# ({% cache %}) varia com a versão das seções que mostra, renovada pelos
+# sinais quando linhas daquela seção mudam
+
+SECOES_TURMA = ('alunos', 'atividades', 'materiais', 'avisos', 'notas')
+
+
+def _chave_versao_turma(turma_id, secao):
+    return f'escola:turma:{turma_id}:{secao}:versao'
+
+
+def versoes_turma(turma_id):
+    """Versões de todas as seções da turma, com uma ida só ao cache."""
+    chaves = {secao: _chave_versao_turma(turma_id, secao) for secao in SECOES_TURMA}
+    encontradas = cache.get_many(chaves.values())
+    return {
+        secao: encontradas[chave] if chave in encontradas else _versao(chave)
+        for secao, chave in chaves.items()
+    }
+
+
+def versoes_secao(turmas_ids, secao):
+    """Versão de uma seção em várias turmas, ``{turma_id: versao}``."""
+    chaves = {turma_id: _chave_versao_turma(turma_id, secao) for turma_id in turmas_ids}
+    encontradas = cache.get_many(chaves.values())
+    return {
+        turma_id: encontradas[chave] if chave in encontradas else _versao(chave)
+        for turma_id, chave in chaves.items()
+    }
+
+
+def invalidar_turmas(turmas_ids, *secoes):
+    """Renova a versão das ``secoes`` (todas, se nenhuma for dada) das turmas."""
+    for turma_id in set(turmas_ids):
+        for secao in secoes or SECOES_TURMA:
+            _renovar(_chave_versao_turma(turma_id, secao))
+
+
+# Versões assíncronas, para as views de views_async.py (backends de arquivo não
+# bloqueiam o laço de eventos)
+
+async def _aversao(chave):
+    versao = await cache.aget(chave)
+    if versao is None:
+        versao = _nova_versao()
+        if not await cache.aadd(chave, versao, None):
+            versao = await cache.aget(chave, versao)
+    return versao
+
+
+async def aversao_professor(professor_id):
+    return await _aversao(_chave_versao(professor_id))
+
+
+async def aversoes_turma(turma_id):
+    chaves = {secao: _chave_versao_turma(turma_id, secao) for secao in SECOES_TURMA}
+    encontradas = await cache.aget_many(chaves.values())
+    return {
+        secao: encontradas[chave] if chave in encontradas else await _aversao(chave)
+        for secao, chave in chaves.items()
+    }
+
+
+async def aobter_ou_calcular(professor_id, nome, calcular, timeout=TEMPO_CACHE):
+    """Como ``obter_ou_calcular``, com ``calcular`` devolvendo uma corrotina."""
+    chave = _chave(professor_id, await aversao_professor(professor_id), nome)
+    valor = await cache.aget(chave)
+    if valor is None:
+        with leituras_na_replica(False):
+            valor = await calcular()
+        await cache.aset(chave, valor, timeout)
+    return valor
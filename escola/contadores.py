@@ -0,0 +1,71 @@
+# contadores.py
+"""Contadores desnormalizados ``Turma.total_alunos`` e ``Turma.total_atividades``.
+
+Os valores são recalculados com um UPDATE com subconsultas correlacionadas
+apenas para as turmas afetadas, o que evita tanto o JOIN duplo nas listagens
+quanto a deriva de um simples incremento/decremento.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Aluno, Atividade, Turma
+
+TAMANHO_LOTE = 1000
+
+AlunoTurma = Aluno.turmas.through
+
+
+def _contagem(queryset):
+    return Coalesce(
+        Subquery(
+            queryset.filter(turma_id=OuterRef('pk'))
+            .order_by()
+            .values('turma_id')
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def contagem_alunos():
+    return _contagem(AlunoTurma.objects.all())
+
+
+def contagem_atividades():
+    return _contagem(Atividade.objects.all())
+
+
+def atualizar_contadores(turmas_ids):
+    turmas_ids = set(turmas_ids)
+    if not turmas_ids:
+        return 0
+    return Turma.objects.filter(pk__in=turmas_ids).update(
+        total_alunos=contagem_alunos(),
+        total_atividades=contagem_atividades(),
+    )
+
+
+def reconciliar_contadores(tamanho_lote=TAMANHO_LOTE):
+    """Corrige, em lotes de turmas, os contadores que divergem da contagem real.
+
+    Retorna quantas turmas estavam divergentes.
+    """
+    corrigidas = 0
+    ultimo_pk = 0
+    while True:
+        ids = list(
+            Turma.objects.filter(pk__gt=ultimo_pk).order_by('pk')
+            .values_list('pk', flat=True)[:tamanho_lote]
+        )
+        if not ids:
+            return corrigidas
+        ultimo_pk = ids[-1]
+        divergentes = list(
+            Turma.objects.filter(pk__in=ids)
+            .annotate(alunos_reais=contagem_alunos(), atividades_reais=contagem_atividades())
+            .exclude(total_alunos=F('alunos_reais'), total_atividades=F('atividades_reais'))
+            .values_list('pk', flat=True)
+        )
+        corrigidas += atualizar_contadores(divergentes)
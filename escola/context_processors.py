@@ -0,0 +1,7 @@
+# context_processors.py
+from .cache import TEMPO_CACHE
+
+
+def cache_fragmentos(request):
+    """Validade dos blocos ``{% cache %}``; a chave já muda com as versões."""
+    return {'tempo_cache': TEMPO_CACHE}
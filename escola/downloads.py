@@ -0,0 +1,159 @@
+# downloads.py
+"""Entrega de arquivos protegidos (materiais, anexos e entregas).
+
+As views checam o dono como as demais e chamam ``resposta_arquivo``, que
+trata GET condicional (ETag/Last-Modified -> 304), pedidos ``Range`` (206 ou
+416) e escolhe como enviar o conteúdo conforme ``ESCOLA_DOWNLOAD_MODO``:
+
+- ``'python'`` (padrão): ``FileResponse``; servidores WSGI com
+  ``wsgi.file_wrapper`` usam ``sendfile`` no arquivo inteiro.
+- ``'x-accel'``: só os cabeçalhos e ``X-Accel-Redirect`` para o nginx servir
+  ``ESCOLA_DOWNLOAD_PREFIXO_INTERNO`` + nome (location ``internal``).
+- ``'x-sendfile'``: ``X-Sendfile`` com o caminho absoluto (Apache, lighttpd).
+
+Nos dois últimos o servidor da frente cuida do ``Range``.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+from .armazenamento import digest_do_nome
+
+MODOS = ('python', 'x-accel', 'x-sendfile')
+INTERVALO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _configuracao():
+    modo = getattr(settings, 'ESCOLA_DOWNLOAD_MODO', 'python')
+    if modo not in MODOS:
+        raise ValueError(f'ESCOLA_DOWNLOAD_MODO inválido: {modo!r} (use {", ".join(MODOS)}).')
+    return modo, getattr(settings, 'ESCOLA_DOWNLOAD_PREFIXO_INTERNO', '/protegido/')
+
+
+def _etag(nome, estado):
+    # No armazenamento deduplicado o digest já identifica o conteúdo
+    digest = digest_do_nome(nome)
+    if digest:
+        return quote_etag(digest)
+    return quote_etag(f'{estado.st_mtime_ns:x}-{estado.st_size:x}')
+
+
+def intervalo_pedido(cabecalho, tamanho):
+    """Converte ``Range: bytes=...`` em ``(inicio, fim)`` inclusivos.
+
+    Retorna ``None`` se o cabeçalho não se aplica (ausente, outra unidade ou
+    vários intervalos: o arquivo vai inteiro) e ``False`` se for impossível
+    de atender (416).
+    """
+    encontrado = INTERVALO.match((cabecalho or '').strip())
+    if not encontrado:
+        return None
+    inicio, fim = encontrado.groups()
+    if not inicio and not fim:
+        return None
+    if tamanho == 0:
+        return False
+    if not inicio:
+        # bytes=-N: os últimos N bytes
+        sufixo = int(fim)
+        if sufixo == 0:
+            return False
+        return max(tamanho - sufixo, 0), tamanho - 1
+    inicio = int(inicio)
+    fim = min(int(fim), tamanho - 1) if fim else tamanho - 1
+    if inicio >= tamanho or inicio > fim:
+        return False
+    return inicio, fim
+
+
+class _Trecho:
+    """Leitura limitada a ``tamanho`` bytes a partir da posição atual do arquivo."""
+
+    def __init__(self, arquivo, tamanho):
+        self.arquivo = arquivo
+        self.restante = tamanho
+
+    def read(self, tamanho=-1):
+        if self.restante <= 0:
+            return b''
+        if tamanho < 0 or tamanho > self.restante:
+            tamanho = self.restante
+        dados = self.arquivo.read(tamanho)
+        self.restante -= len(dados)
+        return dados
+
+    def fileno(self):
+        # Permite sendfile a partir da posição atual, limitado pelo Content-Length
+        return self.arquivo.fileno()
+
+    def close(self):
+        self.arquivo.close()
+
+
+def resposta_arquivo(request, campo, anexo=False):
+    """Resposta HTTP com o conteúdo do ``FieldFile`` ``campo``."""
+    if not campo:
+        raise Http404('Nenhum arquivo.')
+    try:
+        caminho = campo.path
+        estado = os.stat(caminho)
+    except (FileNotFoundError, NotImplementedError):
+        raise Http404('Arquivo não encontrado.')
+
+    etag = _etag(campo.name, estado)
+    modificado = int(estado.st_mtime)
+    nome = os.path.basename(campo.name)
+    modo, prefixo_interno = _configuracao()
+
+    response = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if response is None:
+        if modo == 'python':
+            response = _resposta_python(request, caminho, estado.st_size, etag, modificado, nome, anexo)
+        else:
+            tipo, _ = mimetypes.guess_type(nome)
+            response = HttpResponse(content_type=tipo or 'application/octet-stream')
+            disposicao = content_disposition_header(anexo, nome)
+            if disposicao:
+                response['Content-Disposition'] = disposicao
+            if modo == 'x-accel':
+                response['X-Accel-Redirect'] = quote(prefixo_interno.rstrip('/') + '/' + campo.name)
+            else:
+                response['X-Sendfile'] = caminho
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modificado)
+    # Conteúdo protegido: só o navegador guarda, e sempre revalida (304 é barato)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _resposta_python(request, caminho, tamanho, etag, modificado, nome, anexo):
+    intervalo = intervalo_pedido(request.headers.get('Range'), tamanho)
+    if_range = request.headers.get('If-Range')
+    if intervalo and if_range and if_range not in (etag, http_date(modificado)):
+        # O arquivo mudou desde a parte que o cliente já tem: vai inteiro
+        intervalo = None
+
+    if intervalo is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{tamanho}'
+        return response
+
+    arquivo = open(caminho, 'rb')
+    if intervalo is None:
+        response = FileResponse(arquivo, as_attachment=anexo, filename=nome)
+    else:
+        inicio, fim = intervalo
+        arquivo.seek(inicio)
+        response = FileResponse(
+            _Trecho(arquivo, fim - inicio + 1), as_attachment=anexo, filename=nome, status=206,
+        )
+        response['Content-Length'] = fim - inicio + 1
+        response['Content-Range'] = f'bytes {inicio}-{fim}/{tamanho}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,96 @@
+# entregas.py
+"""Criação antecipada das entregas pendentes.
+
+Cada aluno de uma turma ganha uma ``Entrega`` com status ``PENDENTE`` (ou
+``ATRASADO``, se o prazo já venceu) para cada atividade da turma, assim é
+possível listar quem ainda não entregou.
+As inserções são em lote e ignoram pares (atividade, aluno) já existentes.
+"""
+from django.utils import timezone
+
+from .models import Aluno, Atividade, Entrega
+
+TAMANHO_LOTE = 1000
+LOTE_ATIVIDADES = 100
+
+AlunoTurma = Aluno.turmas.through
+
+
+def _inserir(pares, vencidas=(), tamanho_lote=TAMANHO_LOTE):
+    # Atividades com prazo já vencido recebem a entrega direto como ATRASADO
+    entregas = [
+        Entrega(
+            atividade_id=atividade_id,
+            aluno_id=aluno_id,
+            status='ATRASADO' if atividade_id in vencidas else 'PENDENTE',
+        )
+        for atividade_id, aluno_id in pares
+    ]
+    Entrega.objects.bulk_create(entregas, batch_size=tamanho_lote, ignore_conflicts=True)
+    return len(entregas)
+
+
+def criar_entregas_da_atividade(atividade):
+    alunos = AlunoTurma.objects.filter(turma_id=atividade.turma_id).values_list('aluno_id', flat=True)
+    vencidas = {atividade.pk} if atividade.data_entrega <= timezone.now() else set()
+    return _inserir(((atividade.pk, aluno_id) for aluno_id in alunos), vencidas)
+
+
+def criar_entregas_das_matriculas(matriculas):
+    """Cria as entregas dos pares ``(aluno_id, turma_id)`` recém-matriculados."""
+    alunos_por_turma = {}
+    for aluno_id, turma_id in matriculas:
+        alunos_por_turma.setdefault(turma_id, set()).add(aluno_id)
+    if not alunos_por_turma:
+        return 0
+    atividades = list(
+        Atividade.objects.filter(turma_id__in=alunos_por_turma)
+        .values_list('pk', 'turma_id', 'data_entrega')
+    )
+    return _inserir(
+        (
+            (atividade_id, aluno_id)
+            for atividade_id, turma_id, _ in atividades
+            for aluno_id in alunos_por_turma[turma_id]
+        ),
+        _vencidas(atividades),
+    )
+
+
+def _vencidas(atividades):
+    agora = timezone.now()
+    return {atividade_id for atividade_id, _, prazo in atividades if prazo <= agora}
+
+
+def preencher_entregas(lote_atividades=LOTE_ATIVIDADES, tamanho_lote=TAMANHO_LOTE):
+    """Cria as entregas que faltam para todas as atividades, em lotes.
+
+    Percorre as atividades em ordem de ``pk``; cada lote busca as matrículas
+    das turmas envolvidas numa consulta e insere os pares que faltam.
+    Retorna a quantidade de pares enviados ao banco.
+    """
+    total = 0
+    ultimo_pk = 0
+    while True:
+        atividades = list(
+            Atividade.objects.filter(pk__gt=ultimo_pk)
+            .order_by('pk')
+            .values_list('pk', 'turma_id', 'data_entrega')[:lote_atividades]
+        )
+        if not atividades:
+            return total
+        ultimo_pk = atividades[-1][0]
+        alunos_por_turma = {}
+        for aluno_id, turma_id in AlunoTurma.objects.filter(
+            turma_id__in={turma_id for _, turma_id, _ in atividades}
+        ).values_list('aluno_id', 'turma_id').iterator():
+            alunos_por_turma.setdefault(turma_id, []).append(aluno_id)
+        total += _inserir(
+            (
+                (atividade_id, aluno_id)
+                for atividade_id, turma_id, _ in atividades
+                for aluno_id in alunos_por_turma.get(turma_id, ())
+            ),
+            _vencidas(atividades),
+            tamanho_lote=tamanho_lote,
+        )
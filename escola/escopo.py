@@ -0,0 +1,121 @@
+# escopo.py
+"""Escopo de autorização do professor: ids das turmas, atividades e alunos dele.
+
+O escopo é montado com uma consulta só e guardado no cache por professor
+(``cache.py``), invalidado pelas mesmas versões. Por isso o backend padrão
+precisa ser compartilhado entre os processos (ver ``CACHES``): uma escrita
+no trabalhador de tarefas ou num comando troca a versão que o servidor web
+lê, e nenhum processo guarda o escopo só na própria memória.
+
+O escopo só adianta o 404: um id fora dele nem chega ao banco. Quem decide
+é o dono do objeto buscado, conferido na mesma consulta (``Turma.professor``
+pelas chaves estrangeiras, ou um EXISTS nas turmas do aluno), já que um
+escopo em cache pode estar atrasado.
+"""
+from dataclasses import dataclass
+
+from django.db.models import (BooleanField, CharField, Exists, ExpressionWrapper, OuterRef, Q,
+                              Value)
+from django.http import Http404
+from django.shortcuts import aget_object_or_404, get_object_or_404
+
+from .cache import aobter_ou_calcular, obter_ou_calcular
+from .models import Aluno, Atividade, Aviso, Entrega, Material, Turma
+
+
+@dataclass(frozen=True)
+class Escopo:
+    turmas: frozenset = frozenset()
+    atividades: frozenset = frozenset()
+    alunos: frozenset = frozenset()
+
+
+# Modelo -> (conjunto do escopo com os ids do modelo, caminho até o professor)
+DONOS = {
+    Turma: ('turmas', 'professor'),
+    Atividade: ('atividades', 'turma__professor'),
+    Aluno: ('alunos', None),
+    Material: (None, 'turma__professor'),
+    Aviso: (None, 'turma__professor'),
+    Entrega: (None, 'atividade__turma__professor'),
+}
+
+
+def _ids(consulta, conjunto, campo='pk'):
+    # Sem a ordenação padrão do modelo, que o SQLite recusa dentro de UNION
+    return consulta.order_by().annotate(
+        conjunto=Value(conjunto, output_field=CharField())
+    ).values_list('conjunto', campo)
+
+
+def _consulta_escopo(professor_id):
+    return _ids(Turma.objects.filter(professor_id=professor_id), 'turmas').union(
+        _ids(Atividade.objects.filter(turma__professor_id=professor_id), 'atividades'),
+        _ids(Aluno.turmas.through.objects.filter(turma__professor_id=professor_id), 'alunos', 'aluno_id'),
+        all=True,
+    )
+
+
+def _montar(linhas):
+    ids = {'turmas': set(), 'atividades': set(), 'alunos': set()}
+    for conjunto, pk in linhas:
+        ids[conjunto].add(pk)
+    return Escopo(**{conjunto: frozenset(valores) for conjunto, valores in ids.items()})
+
+
+def escopo_professor(professor_id):
+    return obter_ou_calcular(
+        professor_id, 'escopo', lambda: _montar(_consulta_escopo(professor_id))
+    )
+
+
+async def aescopo_professor(professor_id):
+    async def calcular():
+        return _montar([linha async for linha in _consulta_escopo(professor_id)])
+    return await aobter_ou_calcular(professor_id, 'escopo', calcular)
+
+
+def _fora_do_escopo(modelo):
+    return Http404(f'No {modelo._meta.object_name} matches the given query.')
+
+
+def _conferir_antes(escopo, modelo, pk):
+    conjunto, _ = DONOS[modelo]
+    if conjunto and pk not in getattr(escopo, conjunto):
+        raise _fora_do_escopo(modelo)
+
+
+def _com_dono(consulta, professor_id):
+    """``consulta`` anotada com ``do_professor``, calculado na mesma ida ao banco."""
+    if not hasattr(consulta, 'model'):
+        consulta = consulta._default_manager.all()
+    _, caminho = DONOS[consulta.model]
+    if caminho is None:
+        do_professor = Exists(Aluno.turmas.through.objects.filter(
+            aluno_id=OuterRef('pk'), turma__professor_id=professor_id,
+        ))
+    else:
+        do_professor = ExpressionWrapper(Q(**{caminho: professor_id}), output_field=BooleanField())
+    return consulta.annotate(do_professor=do_professor)
+
+
+def _conferir_depois(modelo, objeto):
+    if not objeto.do_professor:
+        raise _fora_do_escopo(modelo)
+    return objeto
+
+
+def obter_ou_404(professor, consulta, pk):
+    """``get_object_or_404`` pela chave primária, só se o objeto é do professor.
+
+    ``consulta`` é um modelo de ``DONOS`` ou um queryset dele.
+    """
+    consulta = _com_dono(consulta, professor.pk)
+    _conferir_antes(escopo_professor(professor.pk), consulta.model, pk)
+    return _conferir_depois(consulta.model, get_object_or_404(consulta, pk=pk))
+
+
+async def aobter_ou_404(professor, consulta, pk):
+    consulta = _com_dono(consulta, professor.pk)
+    _conferir_antes(await aescopo_professor(professor.pk), consulta.model, pk)
+    return _conferir_depois(consulta.model, await aget_object_or_404(consulta, pk=pk))
@@ -0,0 +1,188 @@
+# estatisticas.py
+"""Estatísticas das notas de cada atividade.
+
+Uma consulta traz ``(atividade, status, nota)`` de todas as entregas das
+atividades pedidas; média, mediana, desvio padrão, percentis, histograma e
+taxa de entrega saem de operações sobre a coluna de notas inteira, com o
+NumPy (opcional) ou, sem ele, com a biblioteca padrão. O resultado fica no
+cache com as versões ``notas`` e ``alunos`` da turma na chave (ver
+``cache.py``): a próxima nota lançada, alterada ou apagada o invalida.
+"""
+import math
+import statistics
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from .banco import leituras_na_replica
+from .cache import TEMPO_CACHE, versoes_secao
+from .models import Atividade, Entrega
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - dependência opcional
+    numpy = None
+
+PERCENTIS = (25, 75, 90)
+NOTA_MAXIMA = 10
+FAIXAS_HISTOGRAMA = 10
+STATUS_ENVIADOS = ('ENTREGUE', 'AVALIADO')
+TAMANHO_LOTE = 500
+
+
+@dataclass(frozen=True)
+class Estatisticas:
+    total_entregas: int = 0
+    enviadas: int = 0
+    avaliadas: int = 0
+    media: float = None
+    mediana: float = None
+    desvio_padrao: float = None
+    minima: float = None
+    maxima: float = None
+    percentis: tuple = ()  # ((25, valor), (75, valor), ...)
+    histograma: tuple = ()  # ((início, fim, quantidade), ...)
+
+    @property
+    def taxa_entrega(self):
+        return 100 * self.enviadas / self.total_entregas if self.total_entregas else 0
+
+    @property
+    def maior_faixa(self):
+        return max((quantidade for _, _, quantidade in self.histograma), default=0)
+
+
+def _limites_faixas():
+    largura = NOTA_MAXIMA / FAIXAS_HISTOGRAMA
+    return [(i * largura, (i + 1) * largura) for i in range(FAIXAS_HISTOGRAMA)]
+
+
+def _com_numpy(notas):
+    valores = numpy.asarray(notas, dtype=float)
+    contagens, _ = numpy.histogram(valores, bins=FAIXAS_HISTOGRAMA, range=(0, NOTA_MAXIMA))
+    return {
+        'media': float(valores.mean()),
+        'mediana': float(numpy.median(valores)),
+        'desvio_padrao': float(valores.std()),
+        'minima': float(valores.min()),
+        'maxima': float(valores.max()),
+        'percentis': [float(valor) for valor in numpy.percentile(valores, PERCENTIS)],
+        'contagens': [int(contagem) for contagem in contagens],
+    }
+
+
+def _percentil(ordenados, percentil):
+    # Interpolação linear entre vizinhos, como o padrão de numpy.percentile
+    posicao = (len(ordenados) - 1) * percentil / 100
+    abaixo, acima = math.floor(posicao), math.ceil(posicao)
+    return ordenados[abaixo] + (ordenados[acima] - ordenados[abaixo]) * (posicao - abaixo)
+
+
+def _sem_numpy(notas):
+    ordenados = sorted(map(float, notas))
+    contagens = [0] * FAIXAS_HISTOGRAMA
+    for valor in ordenados:
+        # A última faixa inclui a nota máxima, como em numpy.histogram
+        contagens[min(int(valor * FAIXAS_HISTOGRAMA / NOTA_MAXIMA), FAIXAS_HISTOGRAMA - 1)] += 1
+    return {
+        'media': statistics.fmean(ordenados),
+        'mediana': statistics.median(ordenados),
+        'desvio_padrao': statistics.pstdev(ordenados),
+        'minima': ordenados[0],
+        'maxima': ordenados[-1],
+        'percentis': [_percentil(ordenados, percentil) for percentil in PERCENTIS],
+        'contagens': contagens,
+    }
+
+
+def resumir(notas, total_entregas=0, enviadas=0, usar_numpy=None):
+    """``Estatisticas`` de uma sequência de notas (``Decimal`` ou números)."""
+    usar_numpy = numpy is not None if usar_numpy is None else usar_numpy
+    if not notas:
+        return Estatisticas(total_entregas=total_entregas, enviadas=enviadas)
+    calculo = (_com_numpy if usar_numpy else _sem_numpy)(notas)
+    return Estatisticas(
+        total_entregas=total_entregas,
+        enviadas=enviadas,
+        avaliadas=len(notas),
+        media=calculo['media'],
+        mediana=calculo['mediana'],
+        desvio_padrao=calculo['desvio_padrao'],
+        minima=calculo['minima'],
+        maxima=calculo['maxima'],
+        percentis=tuple(zip(PERCENTIS, calculo['percentis'])),
+        histograma=tuple(
+            (inicio, fim, quantidade)
+            for (inicio, fim), quantidade in zip(_limites_faixas(), calculo['contagens'])
+        ),
+    )
+
+
+def calcular(atividades_ids, usar_numpy=None):
+    """``{atividade_id: Estatisticas}`` com uma consulta só, sem cache."""
+    colunas = {atividade_id: ([], [0, 0]) for atividade_id in atividades_ids}
+    linhas = (
+        Entrega.objects.filter(atividade_id__in=colunas)
+        .values_list('atividade_id', 'status', 'nota__valor')
+        .order_by()
+    )
+    for atividade_id, status, valor in linhas.iterator(chunk_size=2000):
+        notas, contagens = colunas[atividade_id]
+        contagens[0] += 1
+        contagens[1] += status in STATUS_ENVIADOS
+        if valor is not None:
+            notas.append(valor)
+    return {
+        atividade_id: resumir(notas, *contagens, usar_numpy=usar_numpy)
+        for atividade_id, (notas, contagens) in colunas.items()
+    }
+
+
+def _chaves(atividades):
+    """``{chave de cache: atividade_id}`` para ``(atividade_id, turma_id)``."""
+    turmas = {turma_id for _, turma_id in atividades}
+    notas = versoes_secao(turmas, 'notas')
+    alunos = versoes_secao(turmas, 'alunos')
+    return {
+        f'escola:atividade:{atividade_id}:estatisticas:{notas[turma_id]}:{alunos[turma_id]}': atividade_id
+        for atividade_id, turma_id in atividades
+    }
+
+
+def estatisticas_atividades(atividades):
+    """Estatísticas em cache das ``atividades`` (objetos com ``pk`` e ``turma_id``).
+
+    As que faltam no cache são calculadas juntas, numa consulta.
+    """
+    chaves = _chaves([(atividade.pk, atividade.turma_id) for atividade in atividades])
+    encontradas = cache.get_many(chaves)
+    resultado = {chaves[chave]: valor for chave, valor in encontradas.items()}
+    faltando = [chave for chave in chaves if chave not in encontradas]
+    if faltando:
+        # Vão para o cache: lidas do principal, não da réplica (ver cache.py)
+        with leituras_na_replica(False):
+            calculadas = calcular([chaves[chave] for chave in faltando])
+        cache.set_many({chave: calculadas[chaves[chave]] for chave in faltando}, TEMPO_CACHE)
+        resultado.update(calculadas)
+    return resultado
+
+
+def estatisticas_atividade(atividade):
+    return estatisticas_atividades([atividade])[atividade.pk]
+
+
+def recalcular(atividades=None, tamanho_lote=TAMANHO_LOTE):
+    """Recalcula e grava no cache as estatísticas de ``atividades`` (todas, por padrão).
+
+    Uma consulta por lote de ``tamanho_lote`` atividades; retorna quantas foram.
+    """
+    atividades = Atividade.objects.all() if atividades is None else atividades
+    pares = list(atividades.order_by('pk').values_list('pk', 'turma_id'))
+    for inicio in range(0, len(pares), tamanho_lote):
+        chaves = _chaves(pares[inicio:inicio + tamanho_lote])
+        calculadas = calcular(chaves.values())
+        cache.set_many(
+            {chave: calculadas[atividade_id] for chave, atividade_id in chaves.items()},
+            TEMPO_CACHE,
+        )
+    return len(pares)
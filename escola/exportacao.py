@@ -0,0 +1,132 @@
+# exportacao.py
+"""Exportação de boletins e entregas em CSV ou XLSX.
+
+As linhas são geradas sob demanda a partir de consultas com ``.iterator()``,
+então o consumo de memória não cresce com o tamanho da escola: o CSV é
+escrito direto na resposta (ou arquivo) e o XLSX usa o modo ``write_only``
+do openpyxl, que é opcional.
+"""
+import csv
+import io
+import tempfile
+
+from django.utils import timezone
+
+from .boletim import montar_matriz_notas
+from .models import Entrega
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - dependência opcional
+    openpyxl = None
+
+TAMANHO_LOTE = 2000
+
+FORMATOS = ('csv', 'xlsx')
+
+CABECALHO_BOLETIM = ['Turma', 'Ano', 'Matrícula', 'Aluno', 'Nº de Notas',
+                     'Média', 'Média Ponderada']
+
+CABECALHO_ENTREGAS = ['Turma', 'Ano', 'Atividade', 'Matrícula', 'Aluno',
+                      'Status', 'Data Entrega', 'Nota', 'Data Avaliação',
+                      'Comentário do Professor']
+
+
+def linhas_boletim(turmas, detalhar_atividades=False):
+    """Gera o cabeçalho e uma linha por aluno de cada turma.
+
+    Cada turma é montada com ``montar_matriz_notas`` e descartada antes da
+    próxima. Com ``detalhar_atividades`` (útil para uma turma só) as notas de
+    cada atividade entram como colunas extras.
+    """
+    cabecalho_pronto = False
+    for turma in turmas.iterator(chunk_size=100):
+        matriz = montar_matriz_notas(turma, ponderada=True)
+        if not cabecalho_pronto:
+            extras = [a.titulo for a in matriz.atividades] if detalhar_atividades else []
+            yield CABECALHO_BOLETIM + extras
+            cabecalho_pronto = True
+        for linha in matriz:
+            valores = [
+                turma.nome, turma.ano, linha.aluno.matricula, linha.aluno.nome,
+                linha.total_notas, linha.media, linha.media_ponderada,
+            ]
+            if detalhar_atividades:
+                valores += linha.notas
+            yield valores
+    if not cabecalho_pronto:
+        yield CABECALHO_BOLETIM
+
+
+def linhas_entregas(entregas):
+    yield CABECALHO_ENTREGAS
+    status = dict(Entrega.STATUS_CHOICES)
+    valores = entregas.order_by(
+        'atividade__turma__ano', 'atividade__turma__nome', 'atividade__data_entrega',
+        'atividade_id', 'aluno__nome', 'pk',
+    ).values_list(
+        'atividade__turma__nome', 'atividade__turma__ano', 'atividade__titulo',
+        'aluno__matricula', 'aluno__nome', 'status', 'data_entrega',
+        'nota__valor', 'nota__data_avaliacao', 'nota__comentario_professor',
+    )
+    for linha in valores.iterator(chunk_size=TAMANHO_LOTE):
+        linha = list(linha)
+        linha[5] = status.get(linha[5], linha[5])
+        linha[6] = _data(linha[6])
+        linha[8] = _data(linha[8])
+        yield linha
+
+
+def _data(valor):
+    if valor is None:
+        return None
+    return timezone.localtime(valor).replace(tzinfo=None, microsecond=0)
+
+
+class _Eco:
+    """Pseudo-arquivo que devolve o que recebe, para o csv.writer gerar texto."""
+
+    def write(self, valor):
+        return valor
+
+
+def gerar_csv(linhas):
+    escritor = csv.writer(_Eco(), delimiter=';')
+    # BOM para o Excel reconhecer o UTF-8
+    yield '\ufeff'
+    for linha in linhas:
+        yield escritor.writerow(['' if valor is None else valor for valor in linha])
+
+
+def escrever_csv(linhas, arquivo):
+    for trecho in gerar_csv(linhas):
+        arquivo.write(trecho)
+
+
+def escrever_xlsx(linhas, arquivo, titulo='Planilha'):
+    if openpyxl is None:
+        raise RuntimeError('Exportação XLSX requer o pacote openpyxl.')
+    planilha = openpyxl.Workbook(write_only=True)
+    aba = planilha.create_sheet(title=titulo[:31])
+    for linha in linhas:
+        aba.append(linha)
+    planilha.save(arquivo)
+
+
+def escrever_planilha(linhas, arquivo, formato='csv', titulo='Planilha'):
+    """Grava as linhas em ``arquivo`` binário no ``formato`` pedido."""
+    if formato == 'xlsx':
+        escrever_xlsx(linhas, arquivo, titulo)
+        return
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8', newline='')
+    escrever_csv(linhas, texto)
+    texto.flush()
+    texto.detach()
+
+
+def gerar_xlsx_temporario(linhas, titulo='Planilha'):
+    """Grava o XLSX num arquivo temporário e o devolve posicionado no início."""
+    arquivo = tempfile.TemporaryFile()
+    escrever_xlsx(linhas, arquivo, titulo)
+    arquivo.seek(0)
+    return arquivo
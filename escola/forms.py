@@ -32,6 +32,26 @@ class AlunoForm(forms.ModelForm):
             self.fields['turmas'].queryset = Turma.objects.filter(professor=user)
 
 
+class ImportarAlunosForm(forms.Form):
+    arquivo = forms.FileField(
+        label='Arquivo CSV',
+        help_text='Colunas: nome, email, matricula, data_nascimento (opcional), turmas (IDs separados por |, opcional).',
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+    )
+    turmas = forms.ModelMultipleChoiceField(
+        queryset=Turma.objects.none(),
+        required=False,
+        label='Matricular todos nas turmas',
+        widget=forms.CheckboxSelectMultiple(),
+    )
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        super().__init__(*args, **kwargs)
+        if user:
+            self.fields['turmas'].queryset = Turma.objects.filter(professor=user)
+
+
 class MaterialForm(forms.ModelForm):
     class Meta:
         model = Material
@@ -45,6 +65,24 @@ class MaterialForm(forms.ModelForm):
         }
 
 
+class ClonarMaterialForm(forms.Form):
+    turma = forms.ModelChoiceField(
+        queryset=Turma.objects.none(),
+        label='Copiar para a turma',
+        widget=forms.Select(attrs={'class': 'form-select'}),
+    )
+    
+    def __init__(self, *args, **kwargs):
+        user = kwargs.pop('user', None)
+        material = kwargs.pop('material', None)
+        super().__init__(*args, **kwargs)
+        if user:
+            turmas = Turma.objects.filter(professor=user)
+            if material:
+                turmas = turmas.exclude(pk=material.turma_id)
+            self.fields['turma'].queryset = turmas
+
+
 class AtividadeForm(forms.ModelForm):
     class Meta:
         model = Atividade
@@ -68,6 +106,21 @@ class NotaForm(forms.ModelForm):
         }
 
 
+class NotaLoteForm(forms.Form):
+    entrega = forms.IntegerField(widget=forms.HiddenInput())
+    valor = forms.DecimalField(
+        max_digits=5, decimal_places=2, min_value=0, max_value=10, required=False,
+        widget=forms.NumberInput(attrs={'class': 'form-control form-control-sm', 'step': '0.5', 'min': '0', 'max': '10'}),
+    )
+    comentario_professor = forms.CharField(
+        required=False,
+        widget=forms.TextInput(attrs={'class': 'form-control form-control-sm'}),
+    )
+
+
+NotaLoteFormSet = forms.formset_factory(NotaLoteForm, extra=0)
+
+
 class AvisoForm(forms.ModelForm):
     class Meta:
         model = Aviso
@@ -0,0 +1,215 @@
+# importacao.py
+"""Importação de alunos em massa a partir de CSV.
+
+Colunas: ``nome``, ``email``, ``matricula`` e, opcionalmente,
+``data_nascimento`` (AAAA-MM-DD ou DD/MM/AAAA) e ``turmas`` (IDs separados
+por ``|``). O arquivo é processado em lotes: cada lote valida e-mails e
+matrículas contra o banco com duas consultas, grava os alunos com
+``bulk_create`` e as matrículas nas turmas direto na tabela intermediária,
+tudo numa transação por lote.
+"""
+import csv
+import itertools
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .cache import invalidar_professor, invalidar_turmas
+from .contadores import atualizar_contadores
+from .entregas import criar_entregas_das_matriculas
+from .models import Aluno, Turma
+
+TAMANHO_LOTE = 500
+
+COLUNAS_OBRIGATORIAS = ('nome', 'email', 'matricula')
+FORMATOS_DATA = ('%Y-%m-%d', '%d/%m/%Y')
+
+
+@dataclass
+class RelatorioImportacao:
+    criados: int = 0
+    matriculas: int = 0
+    erros: list = field(default_factory=list)
+
+    def erro(self, linha, mensagem):
+        self.erros.append((linha, mensagem))
+
+
+def _ler_csv(arquivo):
+    cabecalho = arquivo.readline()
+    delimitador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    leitor = csv.DictReader(itertools.chain([cabecalho], arquivo), delimiter=delimitador)
+    if leitor.fieldnames:
+        leitor.fieldnames = [nome.strip().lower() for nome in leitor.fieldnames]
+    return leitor
+
+
+def _data(valor):
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            continue
+    raise ValueError
+
+
+def _validar_linha(numero, dados, turmas_permitidas, relatorio):
+    nome = (dados.get('nome') or '').strip()
+    email = (dados.get('email') or '').strip()
+    matricula = (dados.get('matricula') or '').strip()
+    if not nome or not email or not matricula:
+        relatorio.erro(numero, 'Nome, email e matrícula são obrigatórios.')
+        return None
+    if len(nome) > Aluno._meta.get_field('nome').max_length:
+        relatorio.erro(numero, 'Nome muito longo.')
+        return None
+    if len(matricula) > Aluno._meta.get_field('matricula').max_length:
+        relatorio.erro(numero, f'Matrícula "{matricula}" muito longa.')
+        return None
+    try:
+        validate_email(email)
+    except ValidationError:
+        relatorio.erro(numero, f'Email "{email}" inválido.')
+        return None
+
+    data_nascimento = None
+    if (dados.get('data_nascimento') or '').strip():
+        try:
+            data_nascimento = _data(dados['data_nascimento'].strip())
+        except ValueError:
+            relatorio.erro(numero, f'Data de nascimento "{dados["data_nascimento"]}" inválida.')
+            return None
+
+    turmas = set()
+    for turma_id in (dados.get('turmas') or '').split('|'):
+        turma_id = turma_id.strip()
+        if not turma_id:
+            continue
+        if not turma_id.isdigit() or int(turma_id) not in turmas_permitidas:
+            relatorio.erro(numero, f'Turma "{turma_id}" não encontrada.')
+            return None
+        turmas.add(int(turma_id))
+
+    aluno = Aluno(nome=nome, email=email, matricula=matricula,
+                  data_nascimento=data_nascimento)
+    return numero, aluno, turmas
+
+
+def _gravar_lote(lote, turmas_padrao, relatorio):
+    emails = {aluno.email for _, aluno, _ in lote}
+    matriculas = {aluno.matricula for _, aluno, _ in lote}
+    emails_existentes = set(
+        Aluno.objects.filter(email__in=emails).values_list('email', flat=True)
+    )
+    matriculas_existentes = set(
+        Aluno.objects.filter(matricula__in=matriculas).values_list('matricula', flat=True)
+    )
+
+    validos = []
+    for numero, aluno, turmas in lote:
+        if aluno.email in emails_existentes:
+            relatorio.erro(numero, f'Email "{aluno.email}" já cadastrado.')
+        elif aluno.matricula in matriculas_existentes:
+            relatorio.erro(numero, f'Matrícula "{aluno.matricula}" já cadastrada.')
+        else:
+            validos.append((numero, aluno, turmas | turmas_padrao))
+    if not validos:
+        return
+
+    AlunoTurma = Aluno.turmas.through
+    try:
+        with transaction.atomic():
+            criados = Aluno.objects.bulk_create([aluno for _, aluno, _ in validos])
+            vinculos = [
+                AlunoTurma(aluno_id=aluno.pk, turma_id=turma_id)
+                for aluno, (_, _, turmas) in zip(criados, validos)
+                for turma_id in turmas
+            ]
+            AlunoTurma.objects.bulk_create(vinculos)
+            # A tabela intermediária gravada em lote não dispara m2m_changed
+            criar_entregas_das_matriculas(
+                (vinculo.aluno_id, vinculo.turma_id) for vinculo in vinculos
+            )
+            turmas_ids = {vinculo.turma_id for vinculo in vinculos}
+            atualizar_contadores(turmas_ids)
+            professores = set(Turma.objects.filter(
+                pk__in=turmas_ids
+            ).values_list('professor_id', flat=True))
+
+            def invalidar():
+                invalidar_professor(*professores)
+                invalidar_turmas(turmas_ids, 'alunos')
+            # Só depois do commit, para ninguém guardar a lista antiga sob a versão nova
+            transaction.on_commit(invalidar)
+    except IntegrityError:
+        # Outro cadastro concorrente ocupou algum email/matrícula do lote
+        for numero, _, _ in validos:
+            relatorio.erro(numero, 'Lote não gravado por conflito de email ou matrícula; reenvie a linha.')
+        return
+    relatorio.criados += len(criados)
+    relatorio.matriculas += len(vinculos)
+
+
+def importar_alunos(arquivo, turmas_permitidas, turmas_padrao=(), tamanho_lote=TAMANHO_LOTE,
+                    progresso=None, ja_lidas=0, relatorio=None):
+    """Importa os alunos do CSV ``arquivo`` (aberto em modo texto).
+
+    Devolve um ``RelatorioImportacao`` com os totais e os erros por linha.
+
+    ``turmas_permitidas`` limita os IDs aceitos na coluna ``turmas`` e
+    ``turmas_padrao`` são as turmas em que todos os alunos são matriculados.
+    Linhas com erro são listadas no relatório e não impedem as demais.
+    ``progresso``, se informado, é chamado com o número de linhas lidas
+    na mesma transação de cada lote gravado.
+
+    Para retomar uma importação interrompida, ``ja_lidas`` é o último valor
+    passado a ``progresso`` e ``relatorio`` o relatório daquele momento: as
+    linhas até ali só são relidas para achar repetições no arquivo.
+    """
+    relatorio = RelatorioImportacao() if relatorio is None else relatorio
+    turmas_permitidas = set(turmas_permitidas)
+    turmas_padrao = set(turmas_padrao)
+
+    leitor = _ler_csv(arquivo)
+    faltando = [coluna for coluna in COLUNAS_OBRIGATORIAS if coluna not in (leitor.fieldnames or [])]
+    if faltando:
+        relatorio.erro(1, f'Colunas obrigatórias ausentes: {", ".join(faltando)}.')
+        return relatorio
+
+    def fechar_lote(lote):
+        # O ponto de retomada é gravado junto com o lote: ou os dois, ou nenhum
+        with transaction.atomic():
+            if lote:
+                _gravar_lote(lote, turmas_padrao, relatorio)
+            if progresso:
+                progresso(leitor.line_num - 1)
+
+    vistos_email, vistos_matricula = set(), set()
+    descartado = RelatorioImportacao()
+    lote = []
+    for dados in leitor:
+        numero = leitor.line_num
+        relida = numero - 1 <= ja_lidas
+        item = _validar_linha(numero, dados, turmas_permitidas, descartado if relida else relatorio)
+        if item is None:
+            continue
+        aluno = item[1]
+        if aluno.email in vistos_email or aluno.matricula in vistos_matricula:
+            if not relida:
+                relatorio.erro(numero, 'Email ou matrícula repetido no arquivo.')
+            continue
+        vistos_email.add(aluno.email)
+        vistos_matricula.add(aluno.matricula)
+        if relida:
+            continue
+        lote.append(item)
+        if len(lote) >= tamanho_lote:
+            fechar_lote(lote)
+            lote = []
+    fechar_lote(lote)
+
+    relatorio.erros.sort()
+    return relatorio
@@ -0,0 +1,26 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from escola.arquivamento import TAMANHO_LOTE, arquivar_ano
+
+
+class Command(BaseCommand):
+    help = 'Move as turmas de um ano encerrado (e tudo o que pende delas) para arquivos compactados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ano', type=int)
+        parser.add_argument('--professor', help='Username do professor (padrão: todos).')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de turmas arquivadas por transação.')
+
+    def handle(self, *args, **options):
+        professor = None
+        if options['professor']:
+            professor = User.objects.filter(username=options['professor']).first()
+            if professor is None:
+                raise CommandError(f'Professor {options["professor"]!r} não encontrado.')
+        try:
+            total = arquivar_ano(options['ano'], professor=professor, tamanho_lote=options['lote'])
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        self.stdout.write(self.style.SUCCESS(f'{total} turmas de {options["ano"]} arquivadas.'))
@@ -0,0 +1,49 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from escola.exportacao import (FORMATOS, escrever_csv, escrever_xlsx,
+                               linhas_boletim, linhas_entregas)
+from escola.models import Entrega, Turma
+
+
+class Command(BaseCommand):
+    help = 'Exporta boletins ou entregas/notas (por turma, ano, professor ou da escola toda).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=['boletim', 'entregas'])
+        parser.add_argument('--formato', choices=FORMATOS, default='csv')
+        parser.add_argument('--turma', type=int, help='ID de uma turma específica.')
+        parser.add_argument('--ano', type=int, help='Somente turmas deste ano.')
+        parser.add_argument('--professor', help='Username do professor.')
+        parser.add_argument('--saida', help='Arquivo de destino (padrão: saída padrão, só CSV).')
+
+    def handle(self, *args, **options):
+        turmas = Turma.objects.all()
+        if options['turma']:
+            turmas = turmas.filter(pk=options['turma'])
+        if options['ano']:
+            turmas = turmas.filter(ano=options['ano'])
+        if options['professor']:
+            turmas = turmas.filter(professor__username=options['professor'])
+
+        if options['tipo'] == 'boletim':
+            linhas = linhas_boletim(turmas, detalhar_atividades=bool(options['turma']))
+        else:
+            linhas = linhas_entregas(Entrega.objects.filter(atividade__turma__in=turmas))
+
+        saida = options['saida']
+        if options['formato'] == 'xlsx':
+            if not saida:
+                raise CommandError('Informe --saida para exportar em XLSX.')
+            try:
+                escrever_xlsx(linhas, saida, titulo=options['tipo'])
+            except RuntimeError as erro:
+                raise CommandError(str(erro))
+        elif saida:
+            with open(saida, 'w', encoding='utf-8', newline='') as arquivo:
+                escrever_csv(linhas, arquivo)
+        else:
+            escrever_csv(linhas, sys.stdout)
+            return
+        self.stdout.write(self.style.SUCCESS(f'Exportação gravada em {saida}.'))
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from escola.sintetico import SENHA_PADRAO, TAMANHO_LOTE, gerar_escola
+
+
+class Command(BaseCommand):
+    help = ('Gera uma escola sintética (professores, turmas, alunos, atividades, entregas e notas) '
+            'com inserções em lote, para testes de carga.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--professores', type=int, default=2)
+        parser.add_argument('--turmas', type=int, default=3, help='Turmas por professor.')
+        parser.add_argument('--alunos', type=int, default=30, help='Alunos por turma.')
+        parser.add_argument('--atividades', type=int, default=10, help='Atividades por turma.')
+        parser.add_argument('--materiais', type=int, default=3, help='Materiais por turma.')
+        parser.add_argument('--avisos', type=int, default=2, help='Avisos por turma.')
+        parser.add_argument('--entregues', type=float, default=0.8,
+                            help='Proporção de entregas feitas (entre 0 e 1).')
+        parser.add_argument('--prefixo', default='S',
+                            help='Prefixo das matrículas e dos usuários gerados.')
+        parser.add_argument('--semente', type=int, default=None,
+                            help='Semente do gerador aleatório, para repetir a mesma escola.')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de linhas por INSERT.')
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        relatorio = gerar_escola(
+            professores=options['professores'],
+            turmas=options['turmas'],
+            alunos=options['alunos'],
+            atividades=options['atividades'],
+            materiais=options['materiais'],
+            avisos=options['avisos'],
+            proporcao_entregue=options['entregues'],
+            prefixo=options['prefixo'],
+            semente=options['semente'],
+            tamanho_lote=options['lote'],
+        )
+        duracao = time.perf_counter() - inicio
+        for nome, quantidade in vars(relatorio).items():
+            self.stdout.write(f'{nome}: {quantidade}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{relatorio.total} registros gerados em {duracao:.1f}s '
+            f'(senha dos professores: {SENHA_PADRAO}).'
+        ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from escola.importacao import TAMANHO_LOTE, importar_alunos
+from escola.models import Turma
+
+
+class Command(BaseCommand):
+    help = 'Importa alunos de um arquivo CSV em lotes (nome, email, matricula, data_nascimento, turmas).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV (UTF-8).')
+        parser.add_argument('--turma', type=int, action='append', default=[],
+                            help='ID de turma em que todos serão matriculados (pode repetir).')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de linhas gravadas por transação.')
+
+    def handle(self, *args, **options):
+        turmas_permitidas = set(Turma.objects.values_list('pk', flat=True))
+        desconhecidas = set(options['turma']) - turmas_permitidas
+        if desconhecidas:
+            raise CommandError(f'Turmas inexistentes: {sorted(desconhecidas)}')
+
+        try:
+            with open(options['arquivo'], encoding='utf-8-sig', newline='') as arquivo:
+                relatorio = importar_alunos(
+                    arquivo,
+                    turmas_permitidas=turmas_permitidas,
+                    turmas_padrao=options['turma'],
+                    tamanho_lote=options['lote'],
+                )
+        except OSError as erro:
+            raise CommandError(str(erro))
+
+        for linha, mensagem in relatorio.erros:
+            self.stderr.write(f'Linha {linha}: {mensagem}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{relatorio.criados} alunos criados, {relatorio.matriculas} matrículas, '
+            f'{len(relatorio.erros)} erros.'
+        ))
@@ -0,0 +1,73 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from escola.benchmark import REPETICOES, TAMANHOS, ambiente_descartavel, rodar_benchmark
+
+
+def _tamanhos(valor):
+    try:
+        tamanhos = [int(parte) for parte in valor.split(',') if parte.strip()]
+    except ValueError:
+        tamanhos = []
+    if not tamanhos or min(tamanhos) < 1:
+        raise CommandError('Use números positivos separados por vírgula, como 10,100,500.')
+    return tamanhos
+
+
+class Command(BaseCommand):
+    help = ('Mede latência e número de consultas de todas as rotas do app em bancos '
+            'sintéticos de vários tamanhos e grava o resultado em JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanhos', default=','.join(map(str, TAMANHOS)),
+                            help='Alunos por turma em cada rodada, separados por vírgula.')
+        parser.add_argument('--repeticoes', type=int, default=REPETICOES)
+        parser.add_argument('--professores', type=int, default=2)
+        parser.add_argument('--turmas', type=int, default=3, help='Turmas por professor.')
+        parser.add_argument('--atividades', type=int, default=10, help='Atividades por turma.')
+        parser.add_argument('--frio', action='store_true',
+                            help='Limpa o cache antes de cada requisição.')
+        parser.add_argument('--rotulo', default='', help='Identificação da versão medida.')
+        parser.add_argument('--saida', help='Arquivo JSON de saída (padrão: saída padrão).')
+        parser.add_argument('--banco-atual', action='store_true',
+                            help='Usa o banco configurado em vez de um banco de teste. '
+                                 'ATENÇÃO: todos os dados são apagados.')
+
+    def handle(self, *args, **options):
+        tamanhos = _tamanhos(options['tamanhos'])
+        if options['repeticoes'] < 1:
+            raise CommandError('--repeticoes deve ser pelo menos 1.')
+        verbosidade = options['verbosity']
+
+        setup_test_environment()
+        bancos = None
+        if not options['banco_atual']:
+            bancos = setup_databases(verbosidade, interactive=False)
+        try:
+            # Arquivos de amostra e turmas arquivadas não vão para as pastas reais
+            with ambiente_descartavel():
+                resultado = rodar_benchmark(
+                    tamanhos=tamanhos,
+                    repeticoes=options['repeticoes'],
+                    frio=options['frio'],
+                    rotulo=options['rotulo'],
+                    professores=options['professores'],
+                    turmas=options['turmas'],
+                    atividades=options['atividades'],
+                )
+        finally:
+            if bancos is not None:
+                teardown_databases(bancos, verbosidade)
+            teardown_test_environment()
+
+        conteudo = json.dumps(resultado, ensure_ascii=False, indent=2)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(conteudo + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {options["saida"]}.'))
+        else:
+            self.stdout.write(conteudo)
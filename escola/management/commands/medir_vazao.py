@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from escola.benchmark import CLIENTES, REQUISICOES, ambiente_descartavel, rodar_vazao
+
+from .medir_desempenho import _tamanhos
+
+
+class Command(BaseCommand):
+    help = ('Compara a vazão (requisições por segundo) das views de leitura síncronas '
+            'sob WSGI com as assíncronas sob ASGI, com vários clientes simultâneos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', default=','.join(map(str, CLIENTES)),
+                            help='Clientes simultâneos em cada rodada, separados por vírgula.')
+        parser.add_argument('--requisicoes', type=int, default=REQUISICOES,
+                            help='Requisições por rota, modo e quantidade de clientes.')
+        parser.add_argument('--alunos', type=int, default=100, help='Alunos por turma.')
+        parser.add_argument('--professores', type=int, default=2)
+        parser.add_argument('--turmas', type=int, default=3, help='Turmas por professor.')
+        parser.add_argument('--atividades', type=int, default=10, help='Atividades por turma.')
+        parser.add_argument('--rotulo', default='', help='Identificação da versão medida.')
+        parser.add_argument('--saida', help='Arquivo JSON de saída (padrão: saída padrão).')
+        parser.add_argument('--banco-atual', action='store_true',
+                            help='Usa o banco configurado em vez de um banco de teste. '
+                                 'ATENÇÃO: todos os dados são apagados.')
+
+    def handle(self, *args, **options):
+        clientes = _tamanhos(options['clientes'])
+        if options['requisicoes'] < 1 or options['alunos'] < 1:
+            raise CommandError('--requisicoes e --alunos devem ser pelo menos 1.')
+        verbosidade = options['verbosity']
+
+        setup_test_environment()
+        bancos = None
+        if not options['banco_atual']:
+            bancos = setup_databases(verbosidade, interactive=False)
+        try:
+            with ambiente_descartavel('escola-vazao-'):
+                resultado = rodar_vazao(
+                    alunos=options['alunos'],
+                    clientes=clientes,
+                    requisicoes=options['requisicoes'],
+                    rotulo=options['rotulo'],
+                    professores=options['professores'],
+                    turmas=options['turmas'],
+                    atividades=options['atividades'],
+                )
+        finally:
+            if bancos is not None:
+                teardown_databases(bancos, verbosidade)
+            teardown_test_environment()
+
+        conteudo = json.dumps(resultado, ensure_ascii=False, indent=2)
+        if options['saida']:
+            with open(options['saida'], 'w', encoding='utf-8') as arquivo:
+                arquivo.write(conteudo + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Resultado gravado em {options["saida"]}.'))
+        else:
+            self.stdout.write(conteudo)
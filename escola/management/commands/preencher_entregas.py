@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from escola.entregas import LOTE_ATIVIDADES, TAMANHO_LOTE, preencher_entregas
+
+
+class Command(BaseCommand):
+    help = 'Cria as entregas PENDENTE que faltam para as atividades já existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote-atividades', type=int, default=LOTE_ATIVIDADES,
+                            help='Quantidade de atividades processadas por vez.')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de entregas por INSERT.')
+
+    def handle(self, *args, **options):
+        total = preencher_entregas(
+            lote_atividades=options['lote_atividades'],
+            tamanho_lote=options['lote'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'{total} pares atividade/aluno verificados.'))
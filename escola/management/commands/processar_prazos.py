@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from escola.prazos import processar_prazos
+
+
+class Command(BaseCommand):
+    help = 'Marca como ATRASADO as entregas pendentes de atividades com prazo vencido.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true',
+                            help='Ignora a última execução e revisa todas as atividades.')
+        parser.add_argument('--loop', action='store_true',
+                            help='Continua rodando, processando a cada --intervalo segundos.')
+        parser.add_argument('--intervalo', type=int, default=60)
+
+    def handle(self, *args, **options):
+        completo = options['completo']
+        while True:
+            resultado = processar_prazos(completo=completo)
+            total = sum(atualizadas for _, atualizadas in resultado)
+            self.stdout.write(
+                f'{len(resultado)} atividades vencidas, {total} entregas marcadas como atrasadas.'
+            )
+            if not options['loop']:
+                break
+            completo = False
+            time.sleep(options['intervalo'])
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from escola.tarefas import limpar_tarefas, nome_trabalhador, processar
+
+
+class Command(BaseCommand):
+    help = ('Executa as tarefas em segundo plano (importações, exportações, avaliações '
+            'em lote) num pool de threads ou processos.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modo', choices=['thread', 'processo'], default='thread',
+                            help='Threads (padrão) ou processos, para tarefas pesadas em CPU.')
+        parser.add_argument('--trabalhadores', type=int, default=2,
+                            help='Tarefas executadas ao mesmo tempo.')
+        parser.add_argument('--uma-vez', action='store_true',
+                            help='Sai quando não houver mais tarefas disponíveis.')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos entre buscas quando a fila está vazia.')
+        parser.add_argument('--limpar-dias', type=int,
+                            help='Antes de começar, apaga tarefas finalizadas há mais de N dias.')
+
+    def handle(self, *args, **options):
+        if options['trabalhadores'] < 1:
+            raise CommandError('--trabalhadores deve ser pelo menos 1.')
+        if options['limpar_dias'] is not None:
+            apagadas = limpar_tarefas(options['limpar_dias'])
+            self.stdout.write(f'{apagadas} tarefas antigas apagadas.')
+
+        trabalhador = nome_trabalhador()
+        self.stdout.write(
+            f'Trabalhador {trabalhador}: {options["trabalhadores"]} em modo {options["modo"]}.'
+        )
+        try:
+            executadas = processar(
+                trabalhadores=options['trabalhadores'],
+                modo=options['modo'],
+                uma_vez=options['uma_vez'],
+                intervalo=options['intervalo'],
+                trabalhador=trabalhador,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Interrompido; tarefas em andamento voltam à fila quando a reserva vencer.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'{executadas} tarefas executadas.'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from escola.estatisticas import TAMANHO_LOTE, recalcular
+from escola.models import Atividade
+
+
+class Command(BaseCommand):
+    help = 'Recalcula e guarda no cache as estatísticas de notas das atividades.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--turma', type=int, action='append', dest='turmas',
+                            help='Só as atividades desta turma (pode repetir).')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de atividades calculadas por consulta.')
+
+    def handle(self, *args, **options):
+        atividades = Atividade.objects.all()
+        if options['turmas']:
+            atividades = atividades.filter(turma_id__in=options['turmas'])
+        total = recalcular(atividades, tamanho_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'Estatísticas de {total} atividades recalculadas.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from escola.armazenamento import reconciliar_arquivos
+
+
+class Command(BaseCommand):
+    help = ('Recalcula as referências do armazenamento deduplicado e apaga arquivos '
+            'sem referência e temporários de uploads interrompidos.')
+
+    def handle(self, *args, **options):
+        corrigidos, removidos = reconciliar_arquivos()
+        self.stdout.write(self.style.SUCCESS(
+            f'{corrigidos} contagens corrigidas, {removidos} arquivos removidos.'
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from escola.contadores import TAMANHO_LOTE, reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = 'Corrige os contadores de alunos e atividades das turmas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de turmas verificadas por vez.')
+
+    def handle(self, *args, **options):
+        corrigidas = reconciliar_contadores(tamanho_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{corrigidas} turmas corrigidas.'))
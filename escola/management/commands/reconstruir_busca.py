@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from escola.busca import TAMANHO_LOTE, disponivel, reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Recria o índice de busca textual (FTS5) de materiais, atividades e avisos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de registros inseridos por vez.')
+
+    def handle(self, *args, **options):
+        if not disponivel():
+            raise CommandError('Índice de busca indisponível (requer SQLite com FTS5 e as migrações aplicadas).')
+        total = reconstruir_indice(tamanho_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} registros indexados.'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from escola.resumos import TAMANHO_LOTE, reconstruir_resumos
+
+
+class Command(BaseCommand):
+    help = 'Recria do zero a tabela de resumos de notas (aluno x turma).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE,
+                            help='Quantidade de resumos gravados por INSERT.')
+
+    def handle(self, *args, **options):
+        total = reconstruir_resumos(tamanho_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} resumos recriados.'))
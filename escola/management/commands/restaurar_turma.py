@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from escola.arquivamento import restaurar_turma
+from escola.models import TurmaArquivada
+
+
+class Command(BaseCommand):
+    help = 'Devolve turmas arquivadas às tabelas, com os mesmos IDs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('turmas', type=int, nargs='*', help='IDs originais das turmas.')
+        parser.add_argument('--ano', type=int, help='Todas as turmas arquivadas deste ano.')
+
+    def handle(self, *args, **options):
+        if not options['turmas'] and not options['ano']:
+            raise CommandError('Informe os IDs das turmas ou --ano.')
+        arquivadas = TurmaArquivada.objects.all()
+        if options['turmas']:
+            arquivadas = arquivadas.filter(id_original__in=options['turmas'])
+        if options['ano']:
+            arquivadas = arquivadas.filter(ano=options['ano'])
+        faltando = set(options['turmas']) - set(arquivadas.values_list('id_original', flat=True))
+        if faltando:
+            raise CommandError(f'Turmas não arquivadas: {", ".join(map(str, sorted(faltando)))}.')
+
+        total = 0
+        for arquivada in arquivadas:
+            try:
+                restaurar_turma(arquivada)
+            except ValueError as erro:
+                raise CommandError(str(erro))
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f'{total} turmas restauradas.'))
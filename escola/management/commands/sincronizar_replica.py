@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from escola.banco import alias_replica, sincronizar_replica
+
+
+class Command(BaseCommand):
+    help = ('Copia o banco principal para a réplica de leitura com a API de backup do '
+            'SQLite (uma vez, ou em laço com --intervalo).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--destino', default=None,
+                            help='Alias da réplica em DATABASES (padrão: ESCOLA_BANCO_REPLICA).')
+        parser.add_argument('--intervalo', type=float,
+                            help='Repete a cópia a cada N segundos até ser interrompido.')
+
+    def handle(self, *args, **options):
+        destino = options['destino'] or alias_replica()
+        intervalo = options['intervalo']
+        if intervalo is not None and intervalo <= 0:
+            raise CommandError('--intervalo deve ser positivo.')
+        try:
+            while True:
+                try:
+                    duracao = sincronizar_replica(destino=destino)
+                except ValueError as erro:
+                    raise CommandError(str(erro))
+                if options['verbosity'] > 1 or intervalo is None:
+                    self.stdout.write(self.style.SUCCESS(
+                        f'Réplica {destino!r} sincronizada em {duracao * 1000:.0f} ms.'
+                    ))
+                if intervalo is None:
+                    return
+                time.sleep(max(intervalo - duracao, 0))
+        except KeyboardInterrupt:
+            self.stdout.write('Interrompido.')
@@ -0,0 +1,162 @@
+# middleware.py
+"""Instrumentação de SQL por requisição.
+
+Conta as consultas, soma o tempo gasto no banco e detecta consultas
+repetidas que só diferem nos parâmetros (sinal típico de N+1). O resultado
+vai no cabeçalho ``Server-Timing`` e numa linha de log ``escola.sql`` por
+requisição, identificada pelo nome da URL.
+
+Funciona sob WSGI e ASGI. No modo assíncrono as consultas rodam na thread
+que o Django reserva para cada requisição (``sync_to_async``), e as
+conexões são locais a cada thread: o contador é instalado nessa thread.
+
+``ReplicaLeituraMiddleware`` escolhe, por requisição, se as leituras vão
+para a réplica (ver ``banco.py``).
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .banco import leituras_na_replica
+
+logger = logging.getLogger('escola.sql')
+
+
+class RegistroConsultas:
+    def __init__(self):
+        self.total = 0
+        self.tempo = 0.0
+        self.modelos = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.total += 1
+            # O SQL chega com os marcadores (%s); parâmetros diferentes caem no mesmo modelo
+            self.modelos[sql] += 1
+
+    @property
+    def duplicadas(self):
+        return sum(vezes - 1 for vezes in self.modelos.values() if vezes > 1)
+
+    @property
+    def mais_repetida(self):
+        if not self.duplicadas:
+            return None
+        sql, vezes = self.modelos.most_common(1)[0]
+        return sql, vezes
+
+
+def _instrumentar(registro):
+    pilha = ExitStack()
+    for conexao in connections.all():
+        pilha.enter_context(conexao.execute_wrapper(registro))
+    return pilha
+
+
+class InstrumentacaoSQLMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        registro = RegistroConsultas()
+        with _instrumentar(registro):
+            inicio = time.perf_counter()
+            response = self.get_response(request)
+            duracao = time.perf_counter() - inicio
+        self.registrar(request, response, registro, duracao)
+        return response
+
+    async def __acall__(self, request):
+        registro = RegistroConsultas()
+        pilha = await sync_to_async(_instrumentar)(registro)
+        try:
+            inicio = time.perf_counter()
+            response = await self.get_response(request)
+            duracao = time.perf_counter() - inicio
+        finally:
+            await sync_to_async(pilha.close)()
+        self.registrar(request, response, registro, duracao)
+        return response
+
+    def registrar(self, request, response, registro, duracao):
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={registro.tempo * 1000:.2f};desc="{registro.total} consultas"',
+            f'dbdup;desc="{registro.duplicadas} duplicadas"',
+            f'app;dur={duracao * 1000:.2f}',
+        ])
+
+        match = getattr(request, 'resolver_match', None)
+        extra = {
+            'url_name': match.view_name if match else None,
+            'metodo': request.method,
+            'status': response.status_code,
+            'consultas': registro.total,
+            'duplicadas': registro.duplicadas,
+            'tempo_sql_ms': round(registro.tempo * 1000, 2),
+            'tempo_total_ms': round(duracao * 1000, 2),
+        }
+        nivel = logging.WARNING if registro.duplicadas else logging.INFO
+        logger.log(
+            nivel,
+            ' '.join(f'{chave}={valor}' for chave, valor in extra.items()),
+            extra=extra,
+        )
+        if registro.duplicadas:
+            sql, vezes = registro.mais_repetida
+            logger.debug('consulta repetida %d vezes: %s', vezes, sql)
+
+
+class ReplicaLeituraMiddleware:
+    """Liga as leituras na réplica (ver ``banco.py``) em GET e HEAD.
+
+    Depois de um POST o navegador recebe o cookie ``COOKIE_PRINCIPAL`` por
+    ``ESCOLA_REPLICA_JANELA`` segundos e, enquanto isso, lê do principal:
+    o redirecionamento que segue o POST precisa ver o que acabou de ser
+    gravado, e a réplica só recebe na próxima sincronização.
+    """
+    COOKIE_PRINCIPAL = 'escola_principal'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.janela = getattr(settings, 'ESCOLA_REPLICA_JANELA', 30)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with leituras_na_replica(self.usar_replica(request)):
+            response = self.get_response(request)
+        return self.marcar(request, response)
+
+    async def __acall__(self, request):
+        with leituras_na_replica(self.usar_replica(request)):
+            response = await self.get_response(request)
+        return self.marcar(request, response)
+
+    def usar_replica(self, request):
+        return request.method in ('GET', 'HEAD') and self.COOKIE_PRINCIPAL not in request.COOKIES
+
+    def marcar(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            response.set_cookie(self.COOKIE_PRINCIPAL, '1', max_age=self.janela,
+                                httponly=True, samesite='Lax')
+        return response
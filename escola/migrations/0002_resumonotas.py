@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escola', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoNotas',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_notas', models.PositiveIntegerField(default=0)),
+                ('soma_notas', models.DecimalField(decimal_places=2, default=0, max_digits=9)),
+                ('media', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('ultima_avaliacao', models.DateTimeField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('aluno', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos', to='escola.aluno')),
+                ('turma', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos', to='escola.turma')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Notas',
+                'verbose_name_plural': 'Resumos de Notas',
+                'ordering': ['turma', '-media'],
+                'unique_together': {('aluno', 'turma')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:38
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Turma = apps.get_model('escola', 'Turma')
+    Aluno = apps.get_model('escola', 'Aluno')
+    Atividade = apps.get_model('escola', 'Atividade')
+
+    def contagem(queryset):
+        return Coalesce(
+            Subquery(
+                queryset.filter(turma_id=OuterRef('pk')).order_by()
+                .values('turma_id').annotate(total=Count('pk')).values('total'),
+                output_field=IntegerField(),
+            ),
+            0,
+        )
+
+    Turma.objects.update(
+        total_alunos=contagem(Aluno.turmas.through.objects.all()),
+        total_atividades=contagem(Atividade.objects.all()),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escola', '0003_marcaprocessamento'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='turma',
+            name='total_alunos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='turma',
+            name='total_atividades',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
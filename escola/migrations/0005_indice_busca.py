@@ -0,0 +1,37 @@
+from django.db import migrations
+
+
+def criar_indice(apps, schema_editor):
+    # FTS5 só existe no SQLite; nos demais bancos a busca usa icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS escola_busca USING fts5('
+        'tipo UNINDEXED, objeto_id UNINDEXED, turma_id UNINDEXED, titulo, conteudo, '
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    for tipo, codigo, modelo, campo in (
+        ('material', 1, 'material', 'descricao'),
+        ('atividade', 2, 'atividade', 'descricao'),
+        ('aviso', 3, 'aviso', 'conteudo'),
+    ):
+        schema_editor.execute(
+            'INSERT INTO escola_busca (rowid, tipo, objeto_id, turma_id, titulo, conteudo) '
+            f"SELECT id * 4 + {codigo}, '{tipo}', id, turma_id, titulo, {campo} FROM escola_{modelo}"
+        )
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS escola_busca')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escola', '0004_contadores_turma'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
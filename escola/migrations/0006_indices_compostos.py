@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escola', '0005_indice_busca'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['turma', '-data_entrega'], name='atividade_turma_prazo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atividade',
+            index=models.Index(fields=['turma', '-criado_em'], name='atividade_turma_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='aviso',
+            index=models.Index(fields=['turma', '-importante', '-criado_em'], name='aviso_turma_imp_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entrega',
+            index=models.Index(fields=['atividade', 'status'], name='entrega_ativ_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(fields=['turma', '-criado_em'], name='material_turma_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='turma',
+            index=models.Index(fields=['professor', '-ano', 'nome'], name='turma_prof_ano_nome_idx'),
+        ),
+    ]
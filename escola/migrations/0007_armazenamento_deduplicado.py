@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:53
+
+import escola.armazenamento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escola', '0006_indices_compostos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoArmazenado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('tamanho', models.BigIntegerField()),
+                ('referencias', models.PositiveIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Arquivo Armazenado',
+                'verbose_name_plural': 'Arquivos Armazenados',
+            },
+        ),
+        migrations.AlterField(
+            model_name='atividade',
+            name='arquivo_anexo',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=escola.armazenamento.armazenamento_arquivos, upload_to='atividades/'),
+        ),
+        migrations.AlterField(
+            model_name='entrega',
+            name='arquivo',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=escola.armazenamento.armazenamento_arquivos, upload_to='entregas/'),
+        ),
+        migrations.AlterField(
+            model_name='material',
+            name='arquivo',
+            field=models.FileField(blank=True, max_length=255, null=True, storage=escola.armazenamento.armazenamento_arquivos, upload_to='materiais/'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escola', '0008_tarefas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurmaArquivada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_original', models.BigIntegerField(unique=True)),
+                ('nome', models.CharField(max_length=100)),
+                ('ano', models.IntegerField()),
+                ('arquivo', models.CharField(help_text='Caminho dentro de ESCOLA_ARQUIVO_DIR.', max_length=255)),
+                ('tamanho', models.BigIntegerField(default=0)),
+                ('total_alunos', models.PositiveIntegerField(default=0)),
+                ('total_atividades', models.PositiveIntegerField(default=0)),
+                ('total_entregas', models.PositiveIntegerField(default=0)),
+                ('arquivos', models.JSONField(blank=True, default=list)),
+                ('arquivada_em', models.DateTimeField(auto_now_add=True)),
+                ('professor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='turmas_arquivadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Turma arquivada',
+                'verbose_name_plural': 'Turmas arquivadas',
+                'ordering': ['-ano', 'nome'],
+                'indexes': [models.Index(fields=['professor', '-ano', 'nome'], name='arquivada_prof_ano_nome_idx')],
+            },
+        ),
+    ]
@@ -2,6 +2,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+
+from .armazenamento import armazenamento_arquivos
 
 class Turma(models.Model):
     nome = models.CharField(max_length=100)
@@ -9,13 +12,31 @@ class Turma(models.Model):
     descricao = models.TextField(blank=True)
     professor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='turmas')
     criado_em = models.DateTimeField(auto_now_add=True)
+    # Contadores mantidos por escola/contadores.py
+    total_alunos = models.PositiveIntegerField(default=0, editable=False)
+    total_atividades = models.PositiveIntegerField(default=0, editable=False)
+    
+    CONTADORES = ('total_alunos', 'total_atividades')
     
     class Meta:
         verbose_name_plural = "Turmas"
         ordering = ['-ano', 'nome']
+        indexes = [
+            models.Index(fields=['professor', '-ano', 'nome'], name='turma_prof_ano_nome_idx'),
+        ]
     
     def __str__(self):
         return f"{self.nome} - {self.ano}"
+    
+    def save(self, *args, **kwargs):
+        # Uma instância carregada antes de uma matrícula não pode sobrescrever
+        # os contadores com valores antigos; eles só mudam via UPDATE.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.CONTADORES
+            ]
+        super().save(*args, **kwargs)
 
 
 class Aluno(models.Model):
@@ -45,7 +66,7 @@ class Material(models.Model):
     titulo = models.CharField(max_length=200)
     descricao = models.TextField()
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
-    arquivo = models.FileField(upload_to='materiais/', null=True, blank=True)
+    arquivo = models.FileField(upload_to='materiais/', storage=armazenamento_arquivos, max_length=255, null=True, blank=True)
     link = models.URLField(blank=True)
     turma = models.ForeignKey(Turma, on_delete=models.CASCADE, related_name='materiais')
     criado_em = models.DateTimeField(auto_now_add=True)
@@ -54,6 +75,9 @@ class Material(models.Model):
     class Meta:
         verbose_name_plural = "Materiais"
         ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['turma', '-criado_em'], name='material_turma_criado_idx'),
+        ]
     
     def __str__(self):
         return self.titulo
@@ -65,12 +89,16 @@ class Atividade(models.Model):
     turma = models.ForeignKey(Turma, on_delete=models.CASCADE, related_name='atividades')
     data_entrega = models.DateTimeField()
     valor_pontos = models.DecimalField(max_digits=5, decimal_places=2, default=10.0)
-    arquivo_anexo = models.FileField(upload_to='atividades/', null=True, blank=True)
+    arquivo_anexo = models.FileField(upload_to='atividades/', storage=armazenamento_arquivos, max_length=255, null=True, blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name_plural = "Atividades"
         ordering = ['-data_entrega']
+        indexes = [
+            models.Index(fields=['turma', '-data_entrega'], name='atividade_turma_prazo_idx'),
+            models.Index(fields=['turma', '-criado_em'], name='atividade_turma_criado_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titulo} - {self.turma.nome}"
@@ -86,7 +114,7 @@ class Entrega(models.Model):
     
     atividade = models.ForeignKey(Atividade, on_delete=models.CASCADE, related_name='entregas')
     aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, related_name='entregas')
-    arquivo = models.FileField(upload_to='entregas/', null=True, blank=True)
+    arquivo = models.FileField(upload_to='entregas/', storage=armazenamento_arquivos, max_length=255, null=True, blank=True)
     comentario_aluno = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
     data_entrega = models.DateTimeField(null=True, blank=True)
@@ -94,6 +122,9 @@ class Entrega(models.Model):
     class Meta:
         verbose_name_plural = "Entregas"
         unique_together = ['atividade', 'aluno']
+        indexes = [
+            models.Index(fields=['atividade', 'status'], name='entrega_ativ_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.aluno.nome} - {self.atividade.titulo}"
@@ -126,6 +157,127 @@ class Aviso(models.Model):
     class Meta:
         verbose_name_plural = "Avisos"
         ordering = ['-importante', '-criado_em']
+        indexes = [
+            models.Index(fields=['turma', '-importante', '-criado_em'], name='aviso_turma_imp_criado_idx'),
+        ]
+    
+    def __str__(self):
+        return self.titulo
+
+class ResumoNotas(models.Model):
+    aluno = models.ForeignKey(Aluno, on_delete=models.CASCADE, related_name='resumos')
+    turma = models.ForeignKey(Turma, on_delete=models.CASCADE, related_name='resumos')
+    total_notas = models.PositiveIntegerField(default=0)
+    soma_notas = models.DecimalField(max_digits=9, decimal_places=2, default=0)
+    media = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    ultima_avaliacao = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Resumo de Notas"
+        verbose_name_plural = "Resumos de Notas"
+        unique_together = ['aluno', 'turma']
+        ordering = ['turma', '-media']
+    
+    def __str__(self):
+        return f"{self.aluno.nome} - {self.turma.nome}: {self.media}"
+
+
+class MarcaProcessamento(models.Model):
+    """Ponto até onde uma rotina periódica já processou (high-water mark)."""
+    nome = models.CharField(max_length=50, unique=True)
+    valor = models.DateTimeField(null=True, blank=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Marca de Processamento"
+        verbose_name_plural = "Marcas de Processamento"
+    
+    def __str__(self):
+        return f"{self.nome}: {self.valor}"
+
+
+class ArquivoArmazenado(models.Model):
+    """Conteúdo gravado uma única vez pelo armazenamento deduplicado."""
+    digest = models.CharField(max_length=64, unique=True)
+    tamanho = models.BigIntegerField()
+    referencias = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Arquivo Armazenado"
+        verbose_name_plural = "Arquivos Armazenados"
+    
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.referencias} ref.)"
+
+
+class Tarefa(models.Model):
+    """Trabalho em segundo plano executado pelo comando ``processar_tarefas``."""
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('EXECUTANDO', 'Executando'),
+        ('CONCLUIDA', 'Concluída'),
+        ('FALHOU', 'Falhou'),
+    ]
+    
+    tipo = models.CharField(max_length=50)
+    parametros = models.JSONField(default=dict, blank=True)
+    professor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tarefas', null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    prioridade = models.SmallIntegerField(default=0, help_text='Menor valor roda primeiro.')
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    max_tentativas = models.PositiveSmallIntegerField(default=3)
+    disponivel_em = models.DateTimeField(default=timezone.now)
+    trabalhador = models.CharField(max_length=100, blank=True)
+    expira_em = models.DateTimeField(null=True, blank=True)
+    progresso = models.PositiveSmallIntegerField(default=0)
+    mensagem = models.CharField(max_length=255, blank=True)
+    resultado = models.JSONField(null=True, blank=True)
+    erro = models.TextField(blank=True)
+    arquivo = models.FileField(upload_to='tarefas/', storage=armazenamento_arquivos, max_length=255, null=True, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciada_em = models.DateTimeField(null=True, blank=True)
+    concluida_em = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name_plural = "Tarefas"
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'prioridade', 'disponivel_em'], name='tarefa_fila_idx'),
+            models.Index(fields=['professor', '-criado_em'], name='tarefa_prof_criado_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def finalizada(self):
+        return self.status in ('CONCLUIDA', 'FALHOU')
+
+
+class TurmaArquivada(models.Model):
+    """Turma de um ano encerrado, guardada num arquivo compactado (ver ``arquivamento.py``)."""
+    id_original = models.BigIntegerField(unique=True)
+    nome = models.CharField(max_length=100)
+    ano = models.IntegerField()
+    professor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='turmas_arquivadas')
+    arquivo = models.CharField(max_length=255, help_text='Caminho dentro de ESCOLA_ARQUIVO_DIR.')
+    tamanho = models.BigIntegerField(default=0)
+    total_alunos = models.PositiveIntegerField(default=0)
+    total_atividades = models.PositiveIntegerField(default=0)
+    total_entregas = models.PositiveIntegerField(default=0)
+    # Nomes no armazenamento deduplicado cuja referência o arquivo mantém
+    arquivos = models.JSONField(default=list, blank=True)
+    arquivada_em = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = "Turma arquivada"
+        verbose_name_plural = "Turmas arquivadas"
+        ordering = ['-ano', 'nome']
+        indexes = [
+            models.Index(fields=['professor', '-ano', 'nome'], name='arquivada_prof_ano_nome_idx'),
+        ]
     
     def __str__(self):
-        return self.titulo
\ No newline at end of file
+        return f"{self.nome} - {self.ano} (arquivada)"
@@ -0,0 +1,108 @@
+# notificacoes.py
+"""Envio por e-mail dos avisos importantes aos alunos da turma.
+
+Salvar um aviso importante grava, na mesma transação, uma tarefa
+``notificar_aviso`` na fila (``tarefas.py``), que faz o papel de caixa de
+saída: o aviso nunca fica sem notificação nem a notificação sem aviso, e a
+requisição não espera os envios. O trabalhador busca os destinatários em
+lotes de ``ESCOLA_AVISOS_LOTE`` (paginação por ``pk``), manda tudo por uma
+única conexão SMTP, no máximo ``ESCOLA_AVISOS_POR_SEGUNDO`` mensagens por
+segundo, e guarda o último aluno atendido: uma falha volta para a fila e a
+nova tentativa continua dali, sem repetir e-mails. Um endereço malformado ou
+recusado pelo servidor não derruba o envio: o aluno é anotado em
+``recusados`` e o envio segue para o próximo.
+"""
+import time
+from smtplib import SMTPRecipientsRefused
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.mail import EmailMessage, get_connection
+from django.core.validators import validate_email
+
+TAMANHO_LOTE = getattr(settings, 'ESCOLA_AVISOS_LOTE', 200)
+POR_SEGUNDO = getattr(settings, 'ESCOLA_AVISOS_POR_SEGUNDO', 10)
+
+# Erros de um destinatário só, que uma nova tentativa não resolveria; os
+# demais (conexão, respostas 4xx) voltam para a fila. ValueError vem de um
+# endereço que o backend não consegue montar no cabeçalho.
+ERROS_DO_DESTINATARIO = (SMTPRecipientsRefused, ValidationError, ValueError)
+
+
+class Ritmo:
+    """Espaça chamadas de ``aguardar`` para no máximo ``por_segundo`` por segundo."""
+
+    def __init__(self, por_segundo, relogio=time.monotonic, dormir=time.sleep):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self.relogio = relogio
+        self.dormir = dormir
+        self.proximo = None
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        agora = self.relogio()
+        if self.proximo is not None and agora < self.proximo:
+            self.dormir(self.proximo - agora)
+            agora = self.proximo
+        self.proximo = agora + self.intervalo
+
+
+def destinatarios(aviso, depois_de=0, tamanho=TAMANHO_LOTE):
+    """Próximo lote de ``(pk, nome, email)`` dos alunos da turma, por ``pk``."""
+    return list(
+        aviso.turma.alunos.filter(pk__gt=depois_de)
+        .order_by('pk').values_list('pk', 'nome', 'email')[:tamanho]
+    )
+
+
+def montar_mensagem(aviso, nome, email, conexao=None):
+    validate_email(email)
+    corpo = f'Olá, {nome}.\n\n{aviso.conteudo}\n\n— {aviso.turma.nome}'
+    return EmailMessage(
+        subject=f'[{aviso.turma.nome}] {aviso.titulo}',
+        body=corpo,
+        to=[email],
+        connection=conexao,
+    )
+
+
+def enviar_aviso(aviso, depois_de=0, enviados=0, progresso=None, conexao=None,
+                 ritmo=None, tamanho_lote=None, pulso=None, recusados=None):
+    """Envia ``aviso`` aos alunos com ``pk`` maior que ``depois_de``.
+
+    ``progresso(ultimo_aluno, enviados)`` é chamado a cada lote e, antes de
+    propagar um erro de envio, com o último aluno atendido; ``pulso``, com
+    os mesmos argumentos, depois de cada mensagem. Os alunos pulados por um
+    erro de ``ERROS_DO_DESTINATARIO`` entram na lista ``recusados`` como
+    ``{'aluno': pk, 'email': email}``.
+    Retorna o total de enviados (incluindo os ``enviados`` de antes).
+    """
+    recusados = [] if recusados is None else recusados
+    conexao = conexao or get_connection()
+    tamanho_lote = tamanho_lote or TAMANHO_LOTE
+    ritmo = ritmo or Ritmo(POR_SEGUNDO)
+    progresso = progresso or (lambda ultimo_aluno, enviados: None)
+    pulso = pulso or (lambda ultimo_aluno, enviados: None)
+    conexao.open()
+    try:
+        while True:
+            lote = destinatarios(aviso, depois_de, tamanho_lote)
+            if not lote:
+                return enviados
+            for pk, nome, email in lote:
+                ritmo.aguardar()
+                try:
+                    conexao.send_messages([montar_mensagem(aviso, nome, email, conexao)])
+                except ERROS_DO_DESTINATARIO:
+                    recusados.append({'aluno': pk, 'email': email})
+                except Exception:
+                    progresso(depois_de, enviados)
+                    raise
+                else:
+                    enviados += 1
+                depois_de = pk
+                pulso(depois_de, enviados)
+            progresso(depois_de, enviados)
+    finally:
+        conexao.close()
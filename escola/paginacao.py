@@ -0,0 +1,143 @@
+# paginacao.py
+"""Paginação por cursor (keyset) sobre uma ordenação estável.
+
+Em vez de ``OFFSET``, cada página filtra a partir dos valores de ordenação do
+último (ou primeiro) item da página anterior, então o custo não cresce com o
+número da página. A ordenação precisa terminar num campo único, como
+``('nome', 'pk')``.
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+TAMANHO_PAGINA = 50
+
+
+@dataclass
+class PaginaCursor:
+    itens: list = field(default_factory=list)
+    proximo: str = None
+    anterior: str = None
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __bool__(self):
+        return bool(self.itens)
+
+    @property
+    def paginado(self):
+        return bool(self.proximo or self.anterior)
+
+
+def _valor(objeto, campo):
+    for parte in campo.split('__'):
+        objeto = getattr(objeto, parte)
+    return objeto
+
+
+def _codificar(direcao, valores):
+    dados = json.dumps([direcao, valores], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip('=')
+
+
+def _campo_do_modelo(modelo, caminho):
+    for parte in caminho.split('__'):
+        campo = modelo._meta.pk if parte == 'pk' else modelo._meta.get_field(parte)
+        modelo = campo.related_model or modelo
+    return campo
+
+
+def _decodificar(cursor, campos, modelo):
+    """``(direcao, valores)`` do cursor, com cada valor no tipo do seu campo.
+
+    O cursor vem da URL e pode ter sido alterado: qualquer coisa que não
+    decodifique para valores válidos dos ``campos`` vira ``(None, None)``.
+    """
+    try:
+        preenchimento = '=' * (-len(cursor) % 4)
+        direcao, valores = json.loads(base64.urlsafe_b64decode(cursor + preenchimento))
+        if direcao not in ('>', '<') or not isinstance(valores, list) or len(valores) != len(campos):
+            return None, None
+        valores = [
+            _campo_do_modelo(modelo, campo).to_python(valor)
+            for campo, valor in zip(campos, valores)
+        ]
+    except (ValueError, TypeError, ValidationError, FieldDoesNotExist):
+        return None, None
+    if any(valor is None for valor in valores):
+        return None, None
+    return direcao, valores
+
+
+def _filtro_keyset(campos, valores, direcao):
+    operador = 'gt' if direcao == '>' else 'lt'
+    filtro = Q()
+    for i, campo in enumerate(campos):
+        iguais = {anterior: valores[j] for j, anterior in enumerate(campos[:i])}
+        filtro |= Q(**iguais, **{f'{campo}__{operador}': valores[i]})
+    return filtro
+
+
+def _consulta_pagina(queryset, campos, cursor, tamanho):
+    direcao, valores = _decodificar(cursor, campos, queryset.model) if cursor else (None, None)
+    if direcao == '<':
+        queryset = queryset.filter(_filtro_keyset(campos, valores, '<'))
+        queryset = queryset.order_by(*[f'-{campo}' for campo in campos])
+    else:
+        if direcao == '>':
+            queryset = queryset.filter(_filtro_keyset(campos, valores, '>'))
+        queryset = queryset.order_by(*campos)
+    return direcao, queryset[:tamanho + 1]
+
+
+def _montar_pagina(itens, campos, direcao, tamanho):
+    tem_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+
+    pagina = PaginaCursor(itens=itens)
+    if direcao == '<':
+        itens.reverse()
+        tem_anterior, tem_proxima = tem_mais, True
+    else:
+        tem_anterior, tem_proxima = direcao == '>', tem_mais
+    if itens and tem_proxima:
+        pagina.proximo = _codificar('>', [_valor(itens[-1], campo) for campo in campos])
+    if itens and tem_anterior:
+        pagina.anterior = _codificar('<', [_valor(itens[0], campo) for campo in campos])
+    return pagina
+
+
+def normalizar_cursor(cursor, modelo, campos=('nome', 'pk')):
+    """Forma canônica de ``cursor`` ('' se ausente ou inválido), sem consultar o banco.
+
+    Para chaves de cache: cursores adulterados que levam à mesma página dão a
+    mesma chave, em vez de uma entrada nova para cada valor da URL.
+    """
+    direcao, valores = _decodificar(cursor, list(campos), modelo) if cursor else (None, None)
+    return _codificar(direcao, valores) if direcao else ''
+
+
+def paginar_por_cursor(queryset, campos=('nome', 'pk'), cursor=None, tamanho=TAMANHO_PAGINA):
+    """Devolve a ``PaginaCursor`` de ``queryset`` ordenado por ``campos``.
+
+    ``cursor`` é o valor recebido em ``?cursor=`` (``proximo``/``anterior`` da
+    página vista antes); um cursor ausente ou inválido volta à primeira página.
+    Busca ``tamanho + 1`` linhas para saber se há outra página sem ``COUNT``.
+    """
+    campos = list(campos)
+    direcao, consulta = _consulta_pagina(queryset, campos, cursor, tamanho)
+    return _montar_pagina(list(consulta), campos, direcao, tamanho)
+
+
+async def apaginar_por_cursor(queryset, campos=('nome', 'pk'), cursor=None, tamanho=TAMANHO_PAGINA):
+    """Versão assíncrona de ``paginar_por_cursor``."""
+    campos = list(campos)
+    direcao, consulta = _consulta_pagina(queryset, campos, cursor, tamanho)
+    return _montar_pagina([item async for item in consulta], campos, direcao, tamanho)
@@ -0,0 +1,54 @@
+# prazos.py
+"""Marca como ``ATRASADO`` as entregas não enviadas após o prazo.
+
+Cada execução guarda em ``MarcaProcessamento`` o instante processado e, na
+seguinte, só olha as atividades cujo prazo venceu depois disso. Para cada
+atividade vencida é feito um único UPDATE nas entregas ainda pendentes.
+O UPDATE não dispara sinais: as versões de cache das turmas e professores
+afetados são trocadas aqui, depois do commit.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import invalidar_professor, invalidar_turmas
+from .models import Atividade, Entrega, MarcaProcessamento
+
+MARCA_PRAZOS = 'prazos_entregas'
+
+
+def processar_prazos(agora=None, completo=False):
+    """Processa os prazos vencidos até ``agora``.
+
+    Com ``completo=True`` ignora a marca e revisa todas as atividades (útil
+    depois de editar prazos para uma data passada). Retorna uma lista de
+    ``(atividade_id, entregas_atualizadas)``.
+    """
+    agora = agora or timezone.now()
+    resultado = []
+    turmas, professores = set(), set()
+    with transaction.atomic():
+        marca, _ = MarcaProcessamento.objects.get_or_create(nome=MARCA_PRAZOS)
+        vencidas = Atividade.objects.filter(data_entrega__lte=agora)
+        if marca.valor and not completo:
+            # Atividades criadas já vencidas depois da última execução também entram
+            vencidas = vencidas.filter(Q(data_entrega__gt=marca.valor) | Q(criado_em__gt=marca.valor))
+        linhas = vencidas.order_by('data_entrega').values_list('pk', 'turma_id', 'turma__professor_id')
+        for atividade_id, turma_id, professor_id in linhas:
+            atualizadas = Entrega.objects.filter(
+                atividade_id=atividade_id, status='PENDENTE'
+            ).update(status='ATRASADO')
+            resultado.append((atividade_id, atualizadas))
+            if atualizadas:
+                turmas.add(turma_id)
+                professores.add(professor_id)
+        marca.valor = agora
+        marca.save(update_fields=['valor', 'atualizado_em'])
+
+        def invalidar():
+            # Mesma seção que a mudança de status de uma entrega salva (signals.py)
+            invalidar_turmas(turmas, 'notas')
+            invalidar_professor(*professores)
+        if turmas:
+            transaction.on_commit(invalidar)
+    return resultado
@@ -0,0 +1,98 @@
+# resumos.py
+"""Manutenção da tabela ``ResumoNotas`` (uma linha por aluno e turma).
+
+As telas leem o resumo pronto em vez de agregar ``Nota`` -> ``Entrega`` ->
+``Atividade`` a cada acesso. Cada alteração de nota recalcula só o par
+(aluno, turma) afetado; ``reconstruir_resumos`` refaz a tabela inteira.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from .boletim import arredondar
+from .models import Nota, ResumoNotas
+
+TAMANHO_LOTE = 1000
+
+
+def _agregar_notas(filtro):
+    return (
+        Nota.objects.filter(**filtro)
+        .values('entrega__aluno_id', 'entrega__atividade__turma_id')
+        .annotate(
+            total=Count('pk'),
+            soma=Sum('valor'),
+            ultima=Max('data_avaliacao'),
+        )
+        .order_by()
+    )
+
+
+def _resumo(aluno_id, turma_id, total, soma, ultima):
+    return ResumoNotas(
+        aluno_id=aluno_id,
+        turma_id=turma_id,
+        total_notas=total,
+        soma_notas=soma,
+        media=arredondar(soma / total),
+        ultima_avaliacao=ultima,
+    )
+
+
+def atualizar_resumo(aluno_id, turma_id):
+    atualizar_resumos([(aluno_id, turma_id)])
+
+
+def atualizar_resumos(chaves):
+    """Recalcula os resumos dos pares ``(aluno_id, turma_id)`` informados.
+
+    Uma consulta agregada por turma e um upsert em lote; pares sem nenhuma
+    nota têm o resumo removido.
+    """
+    por_turma = {}
+    for aluno_id, turma_id in set(chaves):
+        por_turma.setdefault(turma_id, set()).add(aluno_id)
+
+    with transaction.atomic():
+        for turma_id, alunos_ids in por_turma.items():
+            resumos = [
+                _resumo(
+                    linha['entrega__aluno_id'], turma_id,
+                    linha['total'], linha['soma'], linha['ultima'],
+                )
+                for linha in _agregar_notas({
+                    'entrega__atividade__turma_id': turma_id,
+                    'entrega__aluno_id__in': alunos_ids,
+                })
+            ]
+            sem_notas = alunos_ids - {resumo.aluno_id for resumo in resumos}
+            if sem_notas:
+                ResumoNotas.objects.filter(
+                    turma_id=turma_id, aluno_id__in=sem_notas
+                ).delete()
+            ResumoNotas.objects.bulk_create(
+                resumos,
+                update_conflicts=True,
+                unique_fields=['aluno', 'turma'],
+                update_fields=['total_notas', 'soma_notas', 'media',
+                               'ultima_avaliacao', 'atualizado_em'],
+            )
+
+
+def reconstruir_resumos(tamanho_lote=TAMANHO_LOTE):
+    """Apaga e recria todos os resumos a partir das notas. Retorna o total."""
+    total = 0
+    with transaction.atomic():
+        ResumoNotas.objects.all().delete()
+        lote = []
+        for linha in _agregar_notas({}).iterator(chunk_size=tamanho_lote):
+            lote.append(_resumo(
+                linha['entrega__aluno_id'], linha['entrega__atividade__turma_id'],
+                linha['total'], linha['soma'], linha['ultima'],
+            ))
+            if len(lote) >= tamanho_lote:
+                ResumoNotas.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        ResumoNotas.objects.bulk_create(lote)
+        total += len(lote)
+    return total
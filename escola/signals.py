@@ -0,0 +1,340 @@
+# signals.py
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import banco, busca, tarefas
+from .cache import invalidar_professor, invalidar_turmas
+from .contadores import atualizar_contadores
+from .entregas import criar_entregas_da_atividade, criar_entregas_das_matriculas
+from .models import Aluno, Atividade, Aviso, Entrega, Material, Nota, Tarefa, Turma
+from .resumos import atualizar_resumo
+
+
+def _modelo_origem(origin):
+    return getattr(origin, 'model', type(origin))
+
+
+def _chave_resumo(entrega_id):
+    return (
+        Entrega.objects.filter(pk=entrega_id)
+        .values_list('aluno_id', 'atividade__turma_id')
+        .first()
+    )
+
+
+# Resumo de notas
+
+@receiver(post_save, sender=Nota)
+def nota_salva(sender, instance, **kwargs):
+    # Guardado também para a versão dos fragmentos, mais abaixo
+    instance._chave_resumo = chave = _chave_resumo(instance.entrega_id)
+    if chave:
+        atualizar_resumo(*chave)
+
+
+@receiver(pre_delete, sender=Nota)
+def nota_sendo_deletada(sender, instance, origin=None, **kwargs):
+    # Ao apagar uma turma ou um aluno os resumos somem junto em cascata
+    if _modelo_origem(origin) in (Turma, Aluno):
+        return
+    instance._chave_resumo = _chave_resumo(instance.entrega_id)
+
+
+@receiver(post_delete, sender=Nota)
+def nota_deletada(sender, instance, **kwargs):
+    chave = getattr(instance, '_chave_resumo', None)
+    if chave:
+        atualizar_resumo(*chave)
+
+
+@receiver(post_init, sender=Entrega)
+def entrega_carregada(sender, instance, **kwargs):
+    # Campo adiado (.only/.defer) não deve disparar consulta aqui
+    instance._status_original = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Entrega)
+def entrega_salva(sender, instance, created, **kwargs):
+    instance._chave_resumo = None
+    if not created and instance.status != instance._status_original:
+        # Guardado também para a versão das notas (taxa de entrega), mais abaixo
+        instance._chave_resumo = chave = _chave_resumo(instance.pk)
+        if chave:
+            atualizar_resumo(*chave)
+    instance._status_original = instance.status
+
+
+# Entregas pendentes
+
+@receiver(post_save, sender=Atividade)
+def atividade_salva(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        criar_entregas_da_atividade(instance)
+
+
+@receiver(m2m_changed, sender=Aluno.turmas.through)
+def matriculas_alteradas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        # turma.alunos.add(...)
+        matriculas = [(aluno_id, instance.pk) for aluno_id in pk_set]
+    else:
+        # aluno.turmas.add(...)
+        matriculas = [(instance.pk, turma_id) for turma_id in pk_set]
+    criar_entregas_das_matriculas(matriculas)
+
+
+# Contadores de alunos e atividades da turma
+
+@receiver(post_save, sender=Atividade)
+def atividade_salva_contador(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        atualizar_contadores([instance.turma_id])
+
+
+@receiver(post_delete, sender=Atividade)
+def atividade_deletada_contador(sender, instance, origin=None, **kwargs):
+    if _modelo_origem(origin) is not Turma:
+        atualizar_contadores([instance.turma_id])
+
+
+@receiver(pre_delete, sender=Aluno)
+def aluno_sendo_deletado(sender, instance, **kwargs):
+    # Guardado também para a invalidação do cache, mais abaixo
+    instance._turmas_ids = list(instance.turmas.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Aluno)
+def aluno_deletado_contador(sender, instance, **kwargs):
+    atualizar_contadores(getattr(instance, '_turmas_ids', []))
+
+
+@receiver(m2m_changed, sender=Aluno.turmas.through)
+def matriculas_alteradas_contador(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            atualizar_contadores([instance.pk])
+    elif action in ('post_add', 'post_remove') and pk_set:
+        atualizar_contadores(pk_set)
+    elif action == 'pre_clear':
+        instance._turmas_ids = list(instance.turmas.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        atualizar_contadores(getattr(instance, '_turmas_ids', []))
+
+
+# Índice de busca textual
+
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Atividade)
+@receiver(post_save, sender=Aviso)
+def conteudo_salvo(sender, instance, raw=False, **kwargs):
+    if not raw:
+        busca.indexar(instance)
+
+
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=Atividade)
+@receiver(post_delete, sender=Aviso)
+def conteudo_deletado(sender, instance, **kwargs):
+    busca.remover(instance)
+
+
+# Notificação dos avisos importantes (ver notificacoes.py)
+
+@receiver(post_init, sender=Aviso)
+def aviso_carregado(sender, instance, **kwargs):
+    instance._importante_original = instance.__dict__.get('importante')
+
+
+@receiver(post_save, sender=Aviso)
+def aviso_salvo(sender, instance, created, raw=False, **kwargs):
+    # Novo e importante, ou marcado como importante agora
+    if instance.importante and not raw and (created or not instance._importante_original):
+        tarefas.enfileirar(
+            'notificar_aviso', professor=instance.turma.professor,
+            max_tentativas=5, aviso_id=instance.pk,
+        )
+    instance._importante_original = instance.importante
+
+
+# Conexões novas ao banco (PRAGMAs do perfil de produção, ver banco.py)
+
+connection_created.connect(banco.configurar_conexao, dispatch_uid='escola_configurar_conexao')
+
+
+# Referências do armazenamento deduplicado (ver armazenamento.py)
+
+CAMPOS_ARQUIVO = {
+    Material: 'arquivo', Atividade: 'arquivo_anexo', Entrega: 'arquivo', Tarefa: 'arquivo',
+}
+
+
+def _nome_arquivo(instance):
+    valor = instance.__dict__.get(CAMPOS_ARQUIVO[type(instance)])
+    return getattr(valor, 'name', valor) or ''
+
+
+def _liberar_arquivo(sender, nome):
+    # Só depois do commit: num rollback o objeto continua apontando para o arquivo
+    storage = sender._meta.get_field(CAMPOS_ARQUIVO[sender]).storage
+    transaction.on_commit(lambda: storage.delete(nome))
+
+
+@receiver(post_init, sender=Material)
+@receiver(post_init, sender=Atividade)
+@receiver(post_init, sender=Entrega)
+@receiver(post_init, sender=Tarefa)
+def arquivo_carregado(sender, instance, **kwargs):
+    instance._arquivo_original = _nome_arquivo(instance)
+
+
+@receiver(post_save, sender=Material)
+@receiver(post_save, sender=Atividade)
+@receiver(post_save, sender=Entrega)
+@receiver(post_save, sender=Tarefa)
+def arquivo_salvo(sender, instance, raw=False, **kwargs):
+    atual = _nome_arquivo(instance)
+    if not raw and instance._arquivo_original and instance._arquivo_original != atual:
+        _liberar_arquivo(sender, instance._arquivo_original)
+    instance._arquivo_original = atual
+
+
+@receiver(post_delete, sender=Material)
+@receiver(post_delete, sender=Atividade)
+@receiver(post_delete, sender=Entrega)
+@receiver(post_delete, sender=Tarefa)
+def arquivo_deletado(sender, instance, **kwargs):
+    nome = _nome_arquivo(instance)
+    if nome:
+        _liberar_arquivo(sender, nome)
+
+
+# Invalidação do cache por professor (depois dos demais, que alteram dados)
+
+def _professores_das_turmas(turmas_ids):
+    return Turma.objects.filter(pk__in=turmas_ids).values_list('professor_id', flat=True)
+
+
+@receiver(post_init, sender=Turma)
+def turma_carregada(sender, instance, **kwargs):
+    # O escopo de autorização (escopo.py) do dono anterior também muda
+    instance._professor_original = instance.__dict__.get('professor_id')
+
+
+@receiver(post_save, sender=Turma)
+@receiver(post_delete, sender=Turma)
+def turma_alterada(sender, instance, **kwargs):
+    invalidar_professor(*{instance.professor_id, instance._professor_original} - {None})
+    instance._professor_original = instance.professor_id
+
+
+@receiver(post_init, sender=Atividade)
+def atividade_carregada(sender, instance, **kwargs):
+    instance._turma_original = instance.__dict__.get('turma_id')
+
+
+@receiver(post_save, sender=Atividade)
+@receiver(post_delete, sender=Atividade)
+def atividade_alterada(sender, instance, origin=None, **kwargs):
+    if _modelo_origem(origin) is Turma:
+        return
+    invalidar_professor(*_professores_das_turmas(
+        {instance.turma_id, instance._turma_original} - {None}
+    ))
+    instance._turma_original = instance.turma_id
+
+
+@receiver(post_save, sender=Entrega)
+@receiver(post_delete, sender=Entrega)
+def entrega_alterada(sender, instance, origin=None, **kwargs):
+    if _modelo_origem(origin) in (Turma, Atividade, Aluno):
+        return
+    invalidar_professor(*Turma.objects.filter(
+        atividades__pk=instance.atividade_id
+    ).values_list('professor_id', flat=True))
+
+
+@receiver(post_delete, sender=Aluno)
+def aluno_deletado(sender, instance, **kwargs):
+    invalidar_professor(*_professores_das_turmas(getattr(instance, '_turmas_ids', [])))
+
+
+@receiver(m2m_changed, sender=Aluno.turmas.through)
+def matriculas_alteradas_cache(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # turma.alunos.add/remove/clear(...)
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidar_professor(instance.professor_id)
+    elif action in ('post_add', 'post_remove') and pk_set:
+        invalidar_professor(*_professores_das_turmas(pk_set))
+    elif action == 'post_clear':
+        invalidar_professor(*_professores_das_turmas(getattr(instance, '_turmas_ids', [])))
+
+
+# Versões das seções da turma (cache de fragmentos dos templates)
+
+@receiver(post_save, sender=Material)
+@receiver(post_delete, sender=Material)
+def material_alterado_fragmentos(sender, instance, origin=None, **kwargs):
+    if _modelo_origem(origin) is not Turma:
+        invalidar_turmas([instance.turma_id], 'materiais')
+
+
+@receiver(post_save, sender=Aviso)
+@receiver(post_delete, sender=Aviso)
+def aviso_alterado_fragmentos(sender, instance, origin=None, **kwargs):
+    if _modelo_origem(origin) is not Turma:
+        invalidar_turmas([instance.turma_id], 'avisos')
+
+
+@receiver(post_save, sender=Atividade)
+@receiver(post_delete, sender=Atividade)
+def atividade_alterada_fragmentos(sender, instance, origin=None, **kwargs):
+    if _modelo_origem(origin) is not Turma:
+        invalidar_turmas([instance.turma_id], 'atividades')
+
+
+@receiver(post_save, sender=Nota)
+@receiver(post_delete, sender=Nota)
+def nota_alterada_fragmentos(sender, instance, **kwargs):
+    chave = getattr(instance, '_chave_resumo', None)
+    if chave:
+        invalidar_turmas([chave[1]], 'notas')
+
+
+@receiver(post_save, sender=Entrega)
+def entrega_salva_fragmentos(sender, instance, **kwargs):
+    # Só quando o status mudou; as estatísticas (estatisticas.py) mostram a taxa de entrega
+    chave = getattr(instance, '_chave_resumo', None)
+    if chave:
+        invalidar_turmas([chave[1]], 'notas')
+
+
+@receiver(post_save, sender=Aluno)
+def aluno_salvo_fragmentos(sender, instance, created, raw=False, **kwargs):
+    # Um aluno novo ainda não tem turmas; as matrículas são tratadas abaixo
+    if created or raw:
+        return
+    turmas = list(Turma.objects.filter(alunos=instance).values_list('pk', 'professor_id'))
+    invalidar_turmas([turma_id for turma_id, _ in turmas], 'alunos')
+    # A lista de alunos do professor varia com a versão dele
+    invalidar_professor(*[professor_id for _, professor_id in turmas])
+
+
+@receiver(post_delete, sender=Aluno)
+def aluno_deletado_fragmentos(sender, instance, **kwargs):
+    invalidar_turmas(getattr(instance, '_turmas_ids', []), 'alunos')
+
+
+@receiver(m2m_changed, sender=Aluno.turmas.through)
+def matriculas_alteradas_fragmentos(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidar_turmas([instance.pk], 'alunos')
+    elif action in ('post_add', 'post_remove') and pk_set:
+        invalidar_turmas(pk_set, 'alunos')
+    elif action == 'post_clear':
+        invalidar_turmas(getattr(instance, '_turmas_ids', []), 'alunos')
@@ -0,0 +1,199 @@
+# sintetico.py
+"""Geração de uma escola sintética para testes de carga e benchmarks.
+
+Cria professores, turmas, alunos matriculados, materiais, avisos,
+atividades, entregas e notas em lote, uma turma por vez e numa única
+transação. As tabelas que crescem com o produto alunos x atividades
+(matrículas, entregas e notas) são gravadas com ``executemany`` direto,
+sem instanciar modelos. Como nada disso dispara sinais, os dados derivados
+(contadores das turmas, resumos de notas e índice de busca) são
+atualizados no final, de uma vez.
+"""
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import busca
+from .contadores import atualizar_contadores
+from .models import Aluno, Atividade, Aviso, Entrega, Material, Nota, Turma
+from .resumos import atualizar_resumos
+
+TAMANHO_LOTE = 2000
+SENHA_PADRAO = 'senha123'
+# Horas de antecedência das entregas feitas em relação ao prazo
+ANTECEDENCIAS = (1, 3, 6, 12, 24, 48, 72)
+
+AlunoTurma = Aluno.turmas.through
+
+NOMES = ['Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor',
+         'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael',
+         'Sofia', 'Thiago', 'Valentina', 'Vinícius']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Costa',
+              'Ferreira', 'Almeida', 'Ribeiro', 'Carvalho', 'Gomes', 'Martins', 'Rocha']
+DISCIPLINAS = ['Matemática', 'Português', 'História', 'Geografia', 'Ciências',
+               'Inglês', 'Física', 'Química', 'Biologia', 'Artes']
+TEMAS = ['frações', 'equações', 'leitura', 'redação', 'revolução industrial', 'relevo',
+         'ecossistemas', 'verbos', 'cinemática', 'tabela periódica', 'células', 'geometria']
+
+
+@dataclass
+class RelatorioGeracao:
+    professores: int = 0
+    turmas: int = 0
+    alunos: int = 0
+    matriculas: int = 0
+    materiais: int = 0
+    avisos: int = 0
+    atividades: int = 0
+    entregas: int = 0
+    notas: int = 0
+
+    @property
+    def total(self):
+        return sum(vars(self).values())
+
+
+def _inserir_linhas(cursor, modelo, campos, linhas, tamanho_lote):
+    """INSERT em lote de tuplas já adaptadas para o banco; retorna o total."""
+    quote = connection.ops.quote_name
+    colunas = ', '.join(quote(modelo._meta.get_field(campo).column) for campo in campos)
+    marcadores = ', '.join(['%s'] * len(campos))
+    sql = f'INSERT INTO {quote(modelo._meta.db_table)} ({colunas}) VALUES ({marcadores})'
+    total = 0
+    for inicio in range(0, len(linhas), tamanho_lote):
+        lote = linhas[inicio:inicio + tamanho_lote]
+        cursor.executemany(sql, lote)
+        total += len(lote)
+    return total
+
+
+def _proximo_numero(prefixo):
+    # Permite gerar mais de uma vez no mesmo banco sem colidir matrículas/e-mails
+    return Aluno.objects.filter(matricula__startswith=prefixo).count()
+
+
+def gerar_escola(professores=2, turmas=3, alunos=30, atividades=10, materiais=3, avisos=2,
+                 proporcao_entregue=0.8, prefixo='S', semente=None, tamanho_lote=TAMANHO_LOTE):
+    """Gera a escola sintética e retorna um ``RelatorioGeracao``.
+
+    ``turmas`` é por professor; ``alunos``, ``atividades``, ``materiais`` e
+    ``avisos`` são por turma. Cada aluno tem uma entrega por atividade da
+    turma; ``proporcao_entregue`` das entregas com prazo vencido já vem
+    avaliada, com nota.
+    """
+    aleatorio = random.Random(semente)
+    agora = timezone.now()
+    ano = agora.year
+    relatorio = RelatorioGeracao()
+    senha = make_password(SENHA_PADRAO)
+    inicio_alunos = _proximo_numero(prefixo)
+    inicio_professores = User.objects.filter(username__startswith=f'{prefixo.lower()}prof').count()
+
+    adaptar_data = connection.ops.adapt_datetimefield_value
+    data_avaliacao = adaptar_data(agora)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        usuarios = User.objects.bulk_create([
+            User(username=f'{prefixo.lower()}prof{inicio_professores + i:04}', password=senha,
+                 first_name=aleatorio.choice(NOMES), last_name=aleatorio.choice(SOBRENOMES))
+            for i in range(professores)
+        ])
+        relatorio.professores = len(usuarios)
+
+        novas_turmas = Turma.objects.bulk_create([
+            Turma(nome=f'{aleatorio.choice(DISCIPLINAS)} {serie}º {chr(65 + i % 26)}',
+                  ano=ano, professor=usuario, descricao='Turma gerada automaticamente')
+            for usuario in usuarios
+            for i, serie in enumerate(aleatorio.randint(1, 9) for _ in range(turmas))
+        ])
+        relatorio.turmas = len(novas_turmas)
+
+        numero = inicio_alunos
+        chaves_com_nota = set()
+        for turma in novas_turmas:
+            novos_alunos = []
+            for _ in range(alunos):
+                numero += 1
+                nome = f'{aleatorio.choice(NOMES)} {aleatorio.choice(SOBRENOMES)}'
+                novos_alunos.append(Aluno(
+                    nome=nome,
+                    email=f'{prefixo.lower()}{numero}@escola.exemplo',
+                    matricula=f'{prefixo}{numero:08}',
+                    data_nascimento=agora.date() - timedelta(days=aleatorio.randint(8 * 365, 17 * 365)),
+                ))
+            novos_alunos = Aluno.objects.bulk_create(novos_alunos, batch_size=tamanho_lote)
+            relatorio.matriculas += _inserir_linhas(
+                cursor, AlunoTurma, ['aluno', 'turma'],
+                [(aluno.pk, turma.pk) for aluno in novos_alunos], tamanho_lote,
+            )
+
+            Material.objects.bulk_create([
+                Material(titulo=f'Material de {aleatorio.choice(TEMAS)}',
+                         descricao=f'Resumo sobre {aleatorio.choice(TEMAS)}.',
+                         tipo=aleatorio.choice(['PDF', 'VIDEO', 'LINK', 'DOCUMENTO']), turma=turma)
+                for _ in range(materiais)
+            ])
+            Aviso.objects.bulk_create([
+                Aviso(titulo=f'Aviso sobre {aleatorio.choice(TEMAS)}',
+                      conteudo=f'Lembrete: estudar {aleatorio.choice(TEMAS)}.',
+                      importante=aleatorio.random() < 0.3, turma=turma)
+                for _ in range(avisos)
+            ])
+
+            novas_atividades = Atividade.objects.bulk_create([
+                Atividade(titulo=f'Lista de {aleatorio.choice(TEMAS)}',
+                          descricao=f'Exercícios de {aleatorio.choice(TEMAS)}.',
+                          turma=turma, valor_pontos=Decimal('10.00'),
+                          data_entrega=agora + timedelta(days=aleatorio.randint(-60, 30)))
+                for _ in range(atividades)
+            ])
+
+            alunos_ids = [aluno.pk for aluno in novos_alunos]
+            entregas, valores = [], {}
+            for atividade in novas_atividades:
+                atividade_id = atividade.pk
+                vencida = atividade.data_entrega <= agora
+                # Poucas datas possíveis por atividade, adaptadas uma vez só
+                datas = [adaptar_data(atividade.data_entrega - timedelta(hours=horas))
+                         for horas in ANTECEDENCIAS]
+                for aluno_id in alunos_ids:
+                    if aleatorio.random() < proporcao_entregue:
+                        status = 'AVALIADO' if vencida else 'ENTREGUE'
+                        data = aleatorio.choice(datas)
+                    else:
+                        status = 'ATRASADO' if vencida else 'PENDENTE'
+                        data = None
+                    entregas.append((atividade_id, aluno_id, '', '', status, data))
+                    if status == 'AVALIADO':
+                        valores[atividade_id, aluno_id] = f'{aleatorio.randint(0, 100) / 10:.1f}'
+            relatorio.entregas += _inserir_linhas(
+                cursor, Entrega,
+                ['atividade', 'aluno', 'arquivo', 'comentario_aluno', 'status', 'data_entrega'],
+                entregas, tamanho_lote,
+            )
+            avaliadas = Entrega.objects.filter(
+                atividade__turma=turma, status='AVALIADO',
+            ).values_list('pk', 'atividade_id', 'aluno_id')
+            relatorio.notas += _inserir_linhas(
+                cursor, Nota, ['entrega', 'valor', 'comentario_professor', 'data_avaliacao'],
+                [(pk, valores[atividade_id, aluno_id], '', data_avaliacao)
+                 for pk, atividade_id, aluno_id in avaliadas],
+                tamanho_lote,
+            )
+            chaves_com_nota.update((aluno_id, turma.pk) for _, aluno_id in valores)
+
+            relatorio.alunos += len(novos_alunos)
+            relatorio.materiais += materiais
+            relatorio.avisos += avisos
+            relatorio.atividades += len(novas_atividades)
+
+        atualizar_contadores(turma.pk for turma in novas_turmas)
+        atualizar_resumos(chaves_com_nota)
+    busca.reconstruir_indice()
+    return relatorio
@@ -0,0 +1,432 @@
+# tarefas.py
+"""Fila de tarefas em segundo plano guardada no próprio banco.
+
+``enfileirar`` grava uma ``Tarefa``; o comando ``processar_tarefas`` busca as
+disponíveis com um SELECT, reivindica cada uma com um UPDATE condicional
+(ou ``SELECT ... FOR UPDATE SKIP LOCKED``, onde o banco suporta) e as
+executa num pool de threads ou processos. Cada reivindicação vale por
+``TEMPO_RESERVA``; ``reportar`` atualiza o progresso e renova a reserva, e
+uma tarefa cujo trabalhador morreu volta para a fila quando a reserva vence.
+Falhas voltam para a fila com espera exponencial até ``max_tentativas``.
+
+Os tipos de tarefa são funções ``f(tarefa, **parametros)`` registradas com
+``@tipo_tarefa('nome', 'descrição')``; o valor retornado (serializável em JSON) vira
+``Tarefa.resultado``. Tarefas longas chamam um ``Pulso`` a cada passo, que renova a
+reserva a cada ``INTERVALO_PULSO`` segundos: um passo lento não deixa a reserva
+vencer e outro trabalhador começar uma segunda cópia.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import tempfile
+import time
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.core.files import File
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Atividade, Aviso, Entrega, Tarefa, Turma
+
+logger = logging.getLogger('escola.tarefas')
+
+TEMPO_RESERVA = timedelta(minutes=5)
+ESPERA_BASE = 10  # segundos; dobra a cada tentativa
+ESPERA_MAXIMA = 60 * 60
+MAXIMO_ERROS_RESULTADO = 200
+# Segundos entre renovações da reserva nas tarefas longas (bem menos que TEMPO_RESERVA)
+INTERVALO_PULSO = 30
+# Notas gravadas por transação na avaliação em lote
+LOTE_AVALIACAO = 500
+
+TIPOS = {}
+
+
+class FalhaDefinitiva(Exception):
+    """Erro que não adianta tentar de novo (parâmetros inválidos, objeto apagado)."""
+
+
+def tipo_tarefa(nome, descricao):
+    def registrar(funcao):
+        funcao.descricao = descricao
+        TIPOS[nome] = funcao
+        return funcao
+    return registrar
+
+
+def descricao(tipo):
+    funcao = TIPOS.get(tipo)
+    return funcao.descricao if funcao else tipo
+
+
+def nome_trabalhador():
+    # O sufixo aleatório distingue reinícios do mesmo processo
+    return f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+def enfileirar(tipo, professor=None, arquivo=None, prioridade=0, max_tentativas=3, **parametros):
+    """Cria uma tarefa pendente; ``arquivo`` (opcional) é gravado junto."""
+    if tipo not in TIPOS:
+        raise ValueError(f'Tipo de tarefa desconhecido: {tipo!r}.')
+    tarefa = Tarefa(
+        tipo=tipo, professor=professor, parametros=parametros,
+        prioridade=prioridade, max_tentativas=max_tentativas,
+    )
+    if arquivo is not None:
+        tarefa.arquivo.save(os.path.basename(arquivo.name or tipo), arquivo, save=False)
+    tarefa.save()
+    return tarefa
+
+
+def _disponiveis(agora):
+    # Pendentes já liberadas, ou reservas vencidas de um trabalhador que sumiu
+    return (Q(status='PENDENTE', disponivel_em__lte=agora)
+            | Q(status='EXECUTANDO', expira_em__lt=agora))
+
+
+class Pulso:
+    """Chama ``reportar`` no máximo a cada ``intervalo`` segundos.
+
+    Barato de chamar a cada linha ou mensagem: só olha o relógio até o
+    intervalo passar. Retorna ``True`` quando reportou.
+    """
+
+    def __init__(self, tarefa, intervalo=INTERVALO_PULSO, relogio=time.monotonic):
+        self.tarefa = tarefa
+        self.intervalo = intervalo
+        self.relogio = relogio
+        self.ultimo = relogio()
+
+    def __call__(self, progresso, mensagem='', parcial=None):
+        agora = self.relogio()
+        if agora - self.ultimo < self.intervalo:
+            return False
+        self.ultimo = agora
+        reportar(self.tarefa, progresso, mensagem, parcial)
+        return True
+
+
+def _acompanhar(linhas, pulso, total):
+    """Repassa ``linhas`` chamando ``pulso`` a cada uma."""
+    for numero, linha in enumerate(linhas):
+        pulso(10 + 85 * numero / max(total, 1), f'{numero} de {total} linhas')
+        yield linha
+
+
+def reivindicar(trabalhador, limite=1, agora=None):
+    """Reserva até ``limite`` tarefas para ``trabalhador``; retorna os IDs."""
+    agora = agora or timezone.now()
+    reserva = {
+        'status': 'EXECUTANDO',
+        'trabalhador': trabalhador,
+        'tentativas': F('tentativas') + 1,
+        'iniciada_em': agora,
+        'expira_em': agora + TEMPO_RESERVA,
+    }
+    fila = Tarefa.objects.filter(_disponiveis(agora)).order_by('prioridade', 'disponivel_em', 'pk')
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(fila.select_for_update(skip_locked=True).values_list('pk', flat=True)[:limite])
+            Tarefa.objects.filter(pk__in=ids).update(**reserva)
+        return ids
+
+    # Sem SKIP LOCKED (SQLite): o UPDATE só vale se ninguém reservou antes
+    ids = []
+    for pk in fila.values_list('pk', flat=True)[:limite * 2]:
+        if Tarefa.objects.filter(_disponiveis(agora), pk=pk).update(**reserva):
+            ids.append(pk)
+            if len(ids) >= limite:
+                break
+    return ids
+
+
+def reportar(tarefa, progresso, mensagem='', parcial=None):
+    """Atualiza o progresso (0 a 100) que a interface consulta e renova a reserva.
+
+    ``parcial`` (serializável em JSON) fica em ``Tarefa.resultado`` até a
+    conclusão; uma nova tentativa o recebe em ``tarefa.resultado`` e pode
+    continuar de onde a anterior parou.
+    """
+    tarefa.progresso = max(0, min(100, int(progresso)))
+    tarefa.mensagem = mensagem[:255]
+    campos = {'progresso': tarefa.progresso, 'mensagem': tarefa.mensagem}
+    if parcial is not None:
+        tarefa.resultado = campos['resultado'] = parcial
+    Tarefa.objects.filter(pk=tarefa.pk, trabalhador=tarefa.trabalhador).update(
+        expira_em=timezone.now() + TEMPO_RESERVA, **campos
+    )
+
+
+def espera(tentativa):
+    """Segundos até a próxima tentativa: exponencial, com variação aleatória."""
+    base = min(ESPERA_BASE * 2 ** max(tentativa - 1, 0), ESPERA_MAXIMA)
+    return base + random.uniform(0, base / 2)
+
+
+def executar_tarefa(tarefa_id):
+    """Executa uma tarefa já reservada e grava o resultado ou a falha."""
+    tarefa = Tarefa.objects.get(pk=tarefa_id)
+    try:
+        if tarefa.tentativas > tarefa.max_tentativas:
+            raise FalhaDefinitiva('Tentativas esgotadas (a reserva venceu sem resposta).')
+        funcao = TIPOS.get(tarefa.tipo)
+        if funcao is None:
+            raise FalhaDefinitiva(f'Tipo de tarefa desconhecido: {tarefa.tipo!r}.')
+        resultado = funcao(tarefa, **tarefa.parametros)
+    except Exception as erro:
+        _registrar_falha(tarefa, erro)
+    else:
+        _concluir(tarefa, resultado)
+
+
+def _executar_no_pool(tarefa_id):
+    # Cada thread/processo do pool tem a própria conexão; não a deixa aberta à toa
+    try:
+        executar_tarefa(tarefa_id)
+    finally:
+        close_old_connections()
+
+
+def processar(trabalhadores=1, modo='thread', uma_vez=False, intervalo=1.0, trabalhador=None):
+    """Busca e executa tarefas num pool de ``trabalhadores`` threads ou processos.
+
+    Reivindica só o que o pool tem livre, para as demais ficarem disponíveis
+    a outros trabalhadores. Com ``uma_vez`` termina quando a fila esvazia;
+    senão espera ``intervalo`` segundos entre buscas vazias. Retorna quantas
+    tarefas executou.
+    """
+    trabalhador = trabalhador or nome_trabalhador()
+    if modo == 'processo':
+        pool = ProcessPoolExecutor(
+            trabalhadores, mp_context=multiprocessing.get_context('spawn'),
+            # Processos "spawn" começam do zero: configura o Django antes de
+            # desserializar a primeira tarefa (que importa este módulo)
+            initializer=django.setup,
+        )
+    else:
+        pool = ThreadPoolExecutor(trabalhadores, thread_name_prefix='tarefa')
+    executadas = 0
+    em_andamento = set()
+    try:
+        while True:
+            livres = trabalhadores - len(em_andamento)
+            ids = reivindicar(trabalhador, livres) if livres else []
+            for tarefa_id in ids:
+                em_andamento.add(pool.submit(_executar_no_pool, tarefa_id))
+            if not em_andamento:
+                if uma_vez:
+                    break
+                close_old_connections()
+                time.sleep(intervalo)
+                continue
+            prontas, em_andamento = wait(
+                em_andamento, timeout=None if ids or uma_vez else intervalo,
+                return_when=FIRST_COMPLETED,
+            )
+            for futuro in prontas:
+                if futuro.exception() is not None:
+                    # Erro fora da tarefa (banco indisponível...): a reserva vence e ela volta
+                    logger.error('falha no trabalhador', exc_info=futuro.exception())
+            executadas += len(prontas)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+    return executadas
+
+
+def limpar_tarefas(dias):
+    """Apaga as tarefas finalizadas há mais de ``dias`` dias (e seus arquivos)."""
+    limite = timezone.now() - timedelta(days=dias)
+    apagadas, _ = Tarefa.objects.filter(
+        status__in=('CONCLUIDA', 'FALHOU'), concluida_em__lt=limite,
+    ).delete()
+    return apagadas
+
+
+def _concluir(tarefa, resultado):
+    atualizadas = Tarefa.objects.filter(pk=tarefa.pk, trabalhador=tarefa.trabalhador).update(
+        status='CONCLUIDA', progresso=100, resultado=resultado, erro='',
+        concluida_em=timezone.now(), expira_em=None,
+    )
+    if not atualizadas:
+        logger.warning('tarefa=%s concluída depois de perder a reserva', tarefa.pk)
+
+
+def _registrar_falha(tarefa, erro):
+    definitiva = isinstance(erro, FalhaDefinitiva) or tarefa.tentativas >= tarefa.max_tentativas
+    agora = timezone.now()
+    campos = {'erro': ''.join(traceback.format_exception(erro)), 'expira_em': None}
+    if definitiva:
+        campos.update(status='FALHOU', concluida_em=agora, mensagem=str(erro)[:255])
+    else:
+        atraso = espera(tarefa.tentativas)
+        campos.update(status='PENDENTE', disponivel_em=agora + timedelta(seconds=atraso))
+    Tarefa.objects.filter(pk=tarefa.pk, trabalhador=tarefa.trabalhador).update(**campos)
+    logger.warning('tarefa=%s tipo=%s tentativa=%s definitiva=%s erro=%r',
+                   tarefa.pk, tarefa.tipo, tarefa.tentativas, definitiva, erro)
+
+
+# Tipos de tarefa
+
+def _gravar_resultado(tarefa, nome, escrever):
+    """Grava em ``tarefa.arquivo`` o que ``escrever(arquivo)`` produzir."""
+    with tempfile.TemporaryFile() as temporario:
+        escrever(temporario)
+        temporario.seek(0)
+        tarefa.arquivo.save(nome, File(temporario), save=False)
+    Tarefa.objects.filter(pk=tarefa.pk).update(arquivo=tarefa.arquivo.name)
+
+
+@tipo_tarefa('importar_alunos', 'Importação de alunos')
+def tarefa_importar_alunos(tarefa, turmas_permitidas=(), turmas_padrao=()):
+    from .importacao import TAMANHO_LOTE, RelatorioImportacao, importar_alunos
+
+    if not tarefa.arquivo:
+        raise FalhaDefinitiva('A tarefa não tem o arquivo CSV.')
+    anterior = tarefa.resultado or {}
+    relatorio = RelatorioImportacao(
+        criados=anterior.get('criados', 0),
+        matriculas=anterior.get('matriculas', 0),
+        erros=[tuple(erro) for erro in anterior.get('erros', [])],
+    )
+
+    def progresso(linhas):
+        reportar(tarefa, 100 * linhas / total, f'{linhas} de {total} linhas', parcial={
+            'lidas': linhas,
+            'criados': relatorio.criados,
+            'matriculas': relatorio.matriculas,
+            'erros': relatorio.erros,
+        })
+
+    with tarefa.arquivo.open('rb') as bruto:
+        total = max(sum(1 for _ in bruto) - 1, 1)
+        bruto.seek(0)
+        arquivo = io.TextIOWrapper(bruto, encoding='utf-8-sig', newline='')
+        try:
+            relatorio = importar_alunos(
+                arquivo,
+                turmas_permitidas=turmas_permitidas,
+                turmas_padrao=turmas_padrao,
+                tamanho_lote=TAMANHO_LOTE,
+                progresso=progresso,
+                # Uma nova tentativa continua depois do último lote gravado
+                ja_lidas=anterior.get('lidas', 0),
+                relatorio=relatorio,
+            )
+        except UnicodeDecodeError:
+            # O arquivo é o mesmo em cada tentativa: não adianta repetir
+            raise FalhaDefinitiva('O arquivo não está em UTF-8; salve o CSV como UTF-8 e envie de novo.')
+    return {
+        'criados': relatorio.criados,
+        'matriculas': relatorio.matriculas,
+        'total_erros': len(relatorio.erros),
+        'erros': relatorio.erros[:MAXIMO_ERROS_RESULTADO],
+    }
+
+
+@tipo_tarefa('exportar_boletim', 'Exportação de boletins')
+def tarefa_exportar_boletim(tarefa, turma_id=None, formato='csv'):
+    from .exportacao import escrever_planilha, linhas_boletim
+
+    turmas = Turma.objects.filter(professor=tarefa.professor)
+    if turma_id is not None:
+        turmas = turmas.filter(pk=turma_id)
+    nome = f'boletim_turma_{turma_id}' if turma_id is not None else 'boletins'
+    reportar(tarefa, 10, 'Gerando o boletim')
+    total = turmas.aggregate(total=Sum('total_alunos'))['total'] or 0
+    linhas = _acompanhar(linhas_boletim(turmas, detalhar_atividades=turma_id is not None),
+                         Pulso(tarefa), total)
+    _gravar_resultado(tarefa, f'{nome}.{formato}',
+                      lambda arquivo: escrever_planilha(linhas, arquivo, formato, titulo=nome))
+    return {'arquivo': os.path.basename(tarefa.arquivo.name)}
+
+
+@tipo_tarefa('exportar_entregas', 'Exportação de entregas')
+def tarefa_exportar_entregas(tarefa, turma_id=None, formato='csv'):
+    from .exportacao import escrever_planilha, linhas_entregas
+
+    entregas = Entrega.objects.filter(atividade__turma__professor=tarefa.professor)
+    if turma_id is not None:
+        entregas = entregas.filter(atividade__turma_id=turma_id)
+    nome = f'entregas_turma_{turma_id}' if turma_id is not None else 'entregas'
+    reportar(tarefa, 10, 'Gerando a planilha de entregas')
+    linhas = _acompanhar(linhas_entregas(entregas), Pulso(tarefa), entregas.count())
+    _gravar_resultado(tarefa, f'{nome}.{formato}',
+                      lambda arquivo: escrever_planilha(linhas, arquivo, formato, titulo=nome))
+    return {'arquivo': os.path.basename(tarefa.arquivo.name)}
+
+
+@tipo_tarefa('avaliar_em_lote', 'Avaliação em lote')
+def tarefa_avaliar_em_lote(tarefa, atividade_id, avaliacoes):
+    from decimal import Decimal
+
+    from .avaliacao import salvar_notas_em_lote
+
+    atividade = (
+        Atividade.objects.select_related('turma')
+        .filter(pk=atividade_id, turma__professor=tarefa.professor).first()
+    )
+    if atividade is None:
+        raise FalhaDefinitiva('Atividade não encontrada.')
+    entregas = atividade.entregas.in_bulk([entrega_id for entrega_id, _, _ in avaliacoes])
+    # Uma transação por lote de ``avaliacoes``, que grava junto (reportar) o
+    # ponto de retomada e renova a reserva. Se a tarefa cair no meio, os lotes
+    # já gravados ficam valendo, como numa avaliação feita aos poucos, e a nova
+    # tentativa continua do primeiro lote que faltou.
+    anterior = tarefa.resultado or {}
+    inicio, total = anterior.get('proximo', 0), anterior.get('avaliadas', 0)
+    while inicio < len(avaliacoes):
+        fim = inicio + LOTE_AVALIACAO
+        lote = [
+            (entregas[entrega_id], Decimal(valor), comentario)
+            for entrega_id, valor, comentario in avaliacoes[inicio:fim] if entrega_id in entregas
+        ]
+        with transaction.atomic():
+            total += salvar_notas_em_lote(atividade, lote)
+            reportar(tarefa, 100 * min(fim, len(avaliacoes)) / len(avaliacoes),
+                     f'{total} notas gravadas', parcial={'proximo': fim, 'avaliadas': total})
+        inicio = fim
+    return {'avaliadas': total}
+
+
+@tipo_tarefa('notificar_aviso', 'Envio de aviso por e-mail')
+def tarefa_notificar_aviso(tarefa, aviso_id):
+    from .notificacoes import enviar_aviso
+
+    aviso = Aviso.objects.select_related('turma').filter(pk=aviso_id).first()
+    if aviso is None:
+        raise FalhaDefinitiva('Aviso não encontrado.')
+    total = aviso.turma.alunos.count()
+    anterior = tarefa.resultado or {}
+    # Preenchida por enviar_aviso; vai junto em cada parcial
+    recusados = anterior.get('recusados', [])
+
+    def parcial(ultimo_aluno, enviados):
+        return {'ultimo_aluno': ultimo_aluno, 'enviados': enviados, 'recusados': recusados}
+
+    def progresso(ultimo_aluno, enviados):
+        reportar(tarefa, 100 * enviados / max(total, 1), f'{enviados} de {total} e-mails',
+                 parcial=parcial(ultimo_aluno, enviados))
+
+    pulso = Pulso(tarefa)
+    enviados = enviar_aviso(
+        aviso,
+        depois_de=anterior.get('ultimo_aluno', 0),
+        enviados=anterior.get('enviados', 0),
+        progresso=progresso,
+        # Entre os lotes (SMTP lento), renova a reserva já com o ponto de retomada
+        pulso=lambda ultimo_aluno, enviados: pulso(
+            100 * enviados / max(total, 1), f'{enviados} de {total} e-mails',
+            parcial=parcial(ultimo_aluno, enviados),
+        ),
+        recusados=recusados,
+    )
+    return {'enviados': enviados, 'recusados': recusados}
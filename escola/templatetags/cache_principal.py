@@ -0,0 +1,27 @@
+# cache_principal.py
+"""A tag ``{% cache %}`` do Django, montando os blocos com leituras do principal.
+
+Um bloco que falta no cache é renderizado com ``leituras_na_replica(False)``:
+ele fica guardado sob a versão atual, e a réplica pode ainda não ter a
+escrita que a trocou (ver ``cache.py``). O uso é o mesmo da tag original,
+trocando ``{% load cache %}`` por ``{% load cache_principal %}``.
+"""
+from django import template
+from django.templatetags.cache import CacheNode, do_cache
+
+from ..banco import leituras_na_replica
+
+register = template.Library()
+
+
+class CacheNoPrincipalNode(CacheNode):
+    def render(self, context):
+        with leituras_na_replica(False):
+            return super().render(context)
+
+
+@register.tag('cache')
+def cache_no_principal(parser, token):
+    no = do_cache(parser, token)
+    return CacheNoPrincipalNode(no.nodelist, no.expire_time_var, no.fragment_name, no.vary_on,
+                                no.cache_name)
@@ -1,3 +1,1533 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import unittest
+import unittest.mock
+from datetime import timedelta
+from decimal import Decimal
+from smtplib import SMTPRecipientsRefused
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.core.mail.backends import locmem
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import urls as escola_urls
+from . import busca, estatisticas, notificacoes, views_async
+from .arquivamento import arquivar_ano, boletim as boletim_arquivado
+from .armazenamento import reconciliar_arquivos
+from .avaliacao import salvar_notas_em_lote
+from .banco import RoteadorReplica, configurar_conexao, copiar_banco, leituras_na_replica
+from .benchmark import UrlconfLeitura, ambiente_descartavel, medir_rotas
+from .boletim import montar_matriz_notas
+from .busca import _consulta_fts, buscar
+from .cache import invalidar_professor, obter_ou_calcular, versao_professor, versoes_turma
+from .contadores import reconciliar_contadores
+from .entregas import criar_entregas_das_matriculas, preencher_entregas
+from .escopo import Escopo, aobter_ou_404, escopo_professor
+from .importacao import _gravar_lote, importar_alunos
+from .middleware import ReplicaLeituraMiddleware
+from .models import (Turma, Aluno, Material, Atividade, Entrega, Nota, Aviso, ResumoNotas,
+                     ArquivoArmazenado, MarcaProcessamento, Tarefa, TurmaArquivada)
+from .notificacoes import Ritmo
+from .paginacao import _codificar, paginar_por_cursor
+from .prazos import processar_prazos
+from .resumos import reconstruir_resumos
+from .sintetico import gerar_escola
+from .tarefas import (TEMPO_RESERVA, TIPOS, Pulso, enfileirar, executar_tarefa, reivindicar,
+                      reportar)
+
+
+# Os testes esvaziam e enchem o cache à vontade: nunca o compartilhado
+# (settings.CACHES), que o servidor e o trabalhador estão usando
+CACHE_DE_TESTE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                              'LOCATION': 'escola-testes'}}
+
+
+def usar_midia_temporaria(teste):
+    """Aponta ``MEDIA_ROOT`` e ``ESCOLA_ARQUIVO_DIR`` para pastas apagadas no fim do teste."""
+    midia, arquivo = tempfile.mkdtemp(), tempfile.mkdtemp()
+    for pasta in (midia, arquivo):
+        teste.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+    configuracao = override_settings(MEDIA_ROOT=midia, ESCOLA_ARQUIVO_DIR=arquivo)
+    configuracao.enable()
+    teste.addCleanup(configuracao.disable)
+    return midia
+
+
+@override_settings(CACHES=CACHE_DE_TESTE)
+class EscolaTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.professor = User.objects.create_user('professor', password='senha')
+        cls.turma = Turma.objects.create(nome='7º A', ano=2025, professor=cls.professor)
+        cls.alunos = [
+            Aluno.objects.create(nome=f'Aluno {i}', email=f'aluno{i}@escola.com', matricula=f'M{i:03}')
+            for i in range(3)
+        ]
+        cls.turma.alunos.add(*cls.alunos)
+        cls.atividade = Atividade.objects.create(
+            titulo='Frações', descricao='Lista de frações', turma=cls.turma,
+            data_entrega=timezone.now() + timedelta(days=7),
+        )
+        Material.objects.create(titulo='Apostila', descricao='Frações', tipo='PDF', turma=cls.turma)
+        Aviso.objects.create(titulo='Prova', conteudo='Prova de frações', turma=cls.turma, importante=True)
+        cls.entrega = Entrega.objects.get(atividade=cls.atividade, aluno=cls.alunos[0])
+        cls.entrega.status = 'ENTREGUE'
+        cls.entrega.save()
+        Nota.objects.create(entrega=cls.entrega, valor=8)
+        # O aviso importante acima enfileirou seu envio; os testes partem da fila vazia
+        Tarefa.objects.all().delete()
+
+    def setUp(self):
+        cache.clear()
+        usar_midia_temporaria(self)
+        self.client.force_login(self.professor)
+
+    def urls_de_leitura(self):
+        return [
+            reverse('escola:dashboard'),
+            reverse('escola:lista_turmas'),
+            reverse('escola:detalhes_turma', args=[self.turma.pk]),
+            reverse('escola:editar_turma', args=[self.turma.pk]),
+            reverse('escola:lista_alunos'),
+            reverse('escola:detalhes_aluno', args=[self.alunos[0].pk]),
+            reverse('escola:detalhes_atividade', args=[self.atividade.pk]),
+            reverse('escola:avaliar_entregas', args=[self.atividade.pk]),
+            reverse('escola:avaliar_entrega', args=[self.entrega.pk]),
+            reverse('escola:boletim_turma', args=[self.turma.pk]),
+            reverse('escola:exportar_boletim_turma', args=[self.turma.pk]),
+            reverse('escola:exportar_entregas'),
+            reverse('escola:buscar') + '?q=frações',
+        ]
+
+    def get(self, url, status=200):
+        # assertLogs também silencia a linha de log do middleware de SQL
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = self.client.get(url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status, url)
+        return response
+
+    def assertOrcamentoConsultas(self, url, maximo, status=200):
+        """Falha se o GET em ``url`` fizer mais que ``maximo`` consultas."""
+        with CaptureQueriesContext(connection) as consultas:
+            self.get(url, status)
+        sql = '\n'.join(consulta['sql'] for consulta in consultas.captured_queries)
+        self.assertLessEqual(
+            len(consultas), maximo,
+            f'{url}: {len(consultas)} consultas (orçamento {maximo})\n{sql}',
+        )
+        return len(consultas)
+
+
+class BoletimTest(EscolaTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.decimais = Atividade.objects.create(
+            titulo='Decimais', descricao='-', turma=cls.turma, valor_pontos=30,
+            data_entrega=cls.atividade.data_entrega + timedelta(days=7),
+        )
+        for aluno, valor in ((cls.alunos[0], 5), (cls.alunos[1], 10)):
+            entrega, _ = Entrega.objects.get_or_create(atividade=cls.decimais, aluno=aluno)
+            Nota.objects.create(entrega=entrega, valor=valor)
+
+    def linhas(self, matriz):
+        return [
+            (linha.aluno.nome, linha.notas, linha.total_notas, linha.media, linha.media_ponderada)
+            for linha in matriz
+        ]
+
+    def test_pivo_e_medias(self):
+        with self.assertNumQueries(3):
+            matriz = montar_matriz_notas(self.turma, ponderada=True)
+        self.assertEqual([atividade.titulo for atividade in matriz.atividades], ['Frações', 'Decimais'])
+        self.assertEqual(self.linhas(matriz), [
+            ('Aluno 0', [Decimal(8), Decimal(5)], 2, Decimal('6.50'), Decimal('5.75')),
+            ('Aluno 1', [None, Decimal(10)], 1, Decimal('10.00'), Decimal('10.00')),
+            ('Aluno 2', [None, None], 0, Decimal('0.00'), Decimal('0.00')),
+        ])
+        self.assertIsNone(montar_matriz_notas(self.turma).linhas[0].media_ponderada)
+
+    def test_consultas_nao_crescem_com_a_turma(self):
+        novos = [
+            Aluno.objects.create(nome=f'Novo {i}', email=f'novo{i}@escola.com', matricula=f'N{i:03}')
+            for i in range(5)
+        ]
+        self.turma.alunos.add(*novos)
+        for atividade in (self.atividade, self.decimais):
+            for aluno in novos:
+                entrega, _ = Entrega.objects.get_or_create(atividade=atividade, aluno=aluno)
+                Nota.objects.create(entrega=entrega, valor=7)
+        with self.assertNumQueries(3):
+            matriz = montar_matriz_notas(self.turma, ponderada=True)
+        self.assertEqual(len(matriz), 8)
+        self.assertEqual(matriz.linhas[-1].notas, [Decimal(7), Decimal(7)])
+
+    def test_aluno_que_saiu_da_turma_fica_de_fora(self):
+        self.turma.alunos.remove(self.alunos[1])
+        matriz = montar_matriz_notas(self.turma)
+        self.assertEqual([linha.aluno.nome for linha in matriz], ['Aluno 0', 'Aluno 2'])
+
+
+class ResumoNotasTest(EscolaTestCase):
+    def resumo(self):
+        resumo = ResumoNotas.objects.filter(aluno=self.alunos[0], turma=self.turma).first()
+        return resumo and (resumo.total_notas, resumo.soma_notas, resumo.media)
+
+    def test_resumo_acompanha_notas_lancadas_e_apagadas(self):
+        self.assertEqual(self.resumo(), (1, Decimal(8), Decimal(8)))
+        decimais = Atividade.objects.create(titulo='Decimais', descricao='-', turma=self.turma,
+                                            data_entrega=timezone.now() + timedelta(days=1))
+        entrega, _ = Entrega.objects.get_or_create(atividade=decimais, aluno=self.alunos[0])
+        segunda = Nota.objects.create(entrega=entrega, valor=5)
+        self.assertEqual(self.resumo(), (2, Decimal(13), Decimal('6.50')))
+
+        Nota.objects.get(entrega=self.entrega).delete()
+        self.assertEqual(self.resumo(), (1, Decimal(5), Decimal(5)))
+        # A reconstrução completa chega ao mesmo resultado
+        reconstruir_resumos()
+        self.assertEqual(self.resumo(), (1, Decimal(5), Decimal(5)))
+
+        segunda.delete()
+        self.assertIsNone(self.resumo())
+
+    def test_atividade_apagada_sai_do_resumo(self):
+        self.atividade.delete()
+        self.assertIsNone(self.resumo())
+
+
+class ExportacaoCsvTest(EscolaTestCase):
+    def baixar(self, url):
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        conteudo = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(conteudo.startswith('\ufeff'))
+        return list(csv.reader(io.StringIO(conteudo[1:]), delimiter=';'))
+
+    def test_boletim_da_turma(self):
+        aluno = self.alunos[1]
+        aluno.nome = 'Silva; "Bia"'
+        aluno.save()
+        linhas = self.baixar(reverse('escola:exportar_boletim_turma', args=[self.turma.pk]))
+        self.assertEqual(linhas, [
+            ['Turma', 'Ano', 'Matrícula', 'Aluno', 'Nº de Notas', 'Média', 'Média Ponderada', 'Frações'],
+            ['7º A', '2025', 'M000', 'Aluno 0', '1', '8.00', '8.00', '8.00'],
+            ['7º A', '2025', 'M002', 'Aluno 2', '0', '0.00', '0.00', ''],
+            ['7º A', '2025', 'M001', 'Silva; "Bia"', '0', '0.00', '0.00', ''],
+        ])
+
+    def test_entregas(self):
+        for aluno in self.alunos:
+            Entrega.objects.get_or_create(atividade=self.atividade, aluno=aluno)
+        linhas = self.baixar(reverse('escola:exportar_entregas'))
+        self.assertEqual(linhas[0][:3], ['Turma', 'Ano', 'Atividade'])
+        self.assertEqual(
+            [(linha[4], linha[5], linha[7]) for linha in linhas[1:]],
+            [('Aluno 0', 'Entregue', '8.00'), ('Aluno 1', 'Pendente', ''), ('Aluno 2', 'Pendente', '')],
+        )
+
+
+class EntregasPendentesTest(EscolaTestCase):
+    def entregas(self):
+        return sorted(Entrega.objects.values_list('atividade_id', 'aluno__nome', 'status'))
+
+    def test_criar_de_novo_nao_duplica_nem_altera(self):
+        antes = self.entregas()
+        self.assertEqual(len(antes), 3)
+        criar_entregas_das_matriculas([(aluno.pk, self.turma.pk) for aluno in self.alunos])
+        preencher_entregas()
+        self.assertEqual(self.entregas(), antes)
+
+        Entrega.objects.filter(aluno=self.alunos[2]).delete()
+        preencher_entregas(lote_atividades=1, tamanho_lote=1)
+        self.assertEqual(self.entregas(), antes)
+
+    def test_prazo_vencido_ja_entra_atrasada(self):
+        vencida = Atividade.objects.create(titulo='Revisão', descricao='-', turma=self.turma,
+                                           data_entrega=timezone.now() - timedelta(days=1))
+        novo = Aluno.objects.create(nome='Aluno Novo', email='novo@escola.com', matricula='N001')
+        self.turma.alunos.add(novo)
+        self.assertEqual(
+            sorted(Entrega.objects.filter(aluno=novo).values_list('atividade_id', 'status')),
+            sorted([(self.atividade.pk, 'PENDENTE'), (vencida.pk, 'ATRASADO')]),
+        )
+        self.assertEqual(Entrega.objects.filter(atividade=vencida, status='ATRASADO').count(), 4)
+
+
+class InvalidacaoAposCommitTest(EscolaTestCase):
+    def versoes(self, secao):
+        return versao_professor(self.professor.pk), versoes_turma(self.turma.pk)[secao]
+
+    def test_avaliacao_em_lote(self):
+        antes = self.versoes('notas')
+        entrega, _ = Entrega.objects.get_or_create(atividade=self.atividade, aluno=self.alunos[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            salvar_notas_em_lote(self.atividade, [(entrega, Decimal(6), '')])
+            self.assertEqual(self.versoes('notas'), antes)
+        depois = self.versoes('notas')
+        self.assertNotEqual(depois[0], antes[0])
+        self.assertNotEqual(depois[1], antes[1])
+
+    def test_importacao(self):
+        antes = self.versoes('alunos')
+        arquivo = io.StringIO('nome,email,matricula\nAna,ana@escola.com,T001\n')
+        with self.captureOnCommitCallbacks(execute=True):
+            relatorio = importar_alunos(arquivo, [self.turma.pk], [self.turma.pk])
+            self.assertEqual(self.versoes('alunos'), antes)
+        self.assertEqual(relatorio.criados, 1)
+        depois = self.versoes('alunos')
+        self.assertNotEqual(depois[0], antes[0])
+        self.assertNotEqual(depois[1], antes[1])
+
+
+class ContadoresTest(EscolaTestCase):
+    def totais(self, *turmas):
+        linhas = Turma.objects.values_list('pk', 'total_alunos', 'total_atividades')
+        totais = {pk: (alunos, atividades) for pk, alunos, atividades in linhas}
+        return [totais[turma.pk] for turma in turmas]
+
+    def test_matriculas_e_atividades(self):
+        outra = Turma.objects.create(nome='8º B', ano=2025, professor=self.professor)
+        self.assertEqual(self.totais(self.turma, outra), [(3, 1), (0, 0)])
+
+        novo = Aluno.objects.create(nome='Aluno Novo', email='novo@escola.com', matricula='N001')
+        self.turma.alunos.add(novo)
+        novo.turmas.add(outra)
+        self.assertEqual(self.totais(self.turma, outra), [(4, 1), (1, 0)])
+
+        self.turma.alunos.remove(self.alunos[0])
+        novo.turmas.clear()
+        self.assertEqual(self.totais(self.turma, outra), [(2, 1), (0, 0)])
+
+        self.alunos[1].delete()
+        atividade = Atividade.objects.create(titulo='Decimais', descricao='-', turma=outra,
+                                             data_entrega=timezone.now())
+        self.assertEqual(self.totais(self.turma, outra), [(1, 1), (0, 1)])
+        atividade.delete()
+        self.atividade.delete()
+        self.assertEqual(self.totais(self.turma, outra), [(1, 0), (0, 0)])
+
+    def test_reconciliar_corrige_so_as_divergentes(self):
+        outra = Turma.objects.create(nome='8º B', ano=2025, professor=self.professor)
+        Turma.objects.filter(pk=self.turma.pk).update(total_alunos=99)
+        self.assertEqual(reconciliar_contadores(tamanho_lote=1), 1)
+        self.assertEqual(self.totais(self.turma, outra), [(3, 1), (0, 0)])
+        self.assertEqual(reconciliar_contadores(), 0)
+
+
+class BuscaTextualTest(EscolaTestCase):
+    def encontrados(self, termo, professor=None):
+        return sorted((r['tipo'], r['objeto_id']) for r in buscar(termo, professor or self.professor))
+
+    def test_prefixo_e_destaque(self):
+        self.assertTrue(busca.disponivel())
+        material, aviso = Material.objects.get(), Aviso.objects.get()
+        self.assertEqual(self.encontrados('FRAÇ'), sorted([
+            ('atividade', self.atividade.pk), ('aviso', aviso.pk), ('material', material.pk),
+        ]))
+        self.assertEqual(self.encontrados('lista fra'), [('atividade', self.atividade.pk)])
+        self.assertEqual(self.encontrados('frações', User.objects.create_user('outro')), [])
+
+        aviso.titulo = '<b>Frações</b>'
+        aviso.save()
+        resultado, = [r for r in buscar('frações', self.professor) if r['tipo'] == 'aviso']
+        self.assertEqual(resultado['titulo'], '&lt;b&gt;<mark>Frações</mark>&lt;/b&gt;')
+
+        material.delete()
+        self.assertNotIn(('material', material.pk), self.encontrados('frações'))
+
+    def test_aspas_e_operadores_sao_texto(self):
+        self.assertEqual(_consulta_fts('a"b OR  c*'), '"a""b"* "OR"* "c*"*')
+        for termo in ('"', 'frações"', 'NOT frações', 'frações OR', 'NEAR(frações', 'fra*', '^', '-', 'a:b'):
+            self.assertIsInstance(buscar(termo, self.professor), list, termo)
+        self.assertEqual(self.encontrados('"frações"'), self.encontrados('frações'))
+        self.assertEqual(buscar('   ', self.professor), [])
+        self.assertContains(self.get(reverse('escola:buscar') + '?q=%22fra%C3%A7%C3%B5es%20AND'), 'Buscar')
+
+
+class PlanoDeConsultaTest(EscolaTestCase):
+    # "SCAN tabela" sem índice; a tabela virtual FTS5 usa o próprio índice
+    VARREDURA_COMPLETA = re.compile(r'^SCAN (?!.*VIRTUAL TABLE)')
+
+    def test_consultas_das_views_usam_indices(self):
+        for url in self.urls_de_leitura():
+            with CaptureQueriesContext(connection) as consultas:
+                self.get(url)
+            for consulta in consultas.captured_queries:
+                sql = consulta['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                with connection.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plano = [linha[-1] for linha in cursor.fetchall()]
+                varreduras = [passo for passo in plano if self.VARREDURA_COMPLETA.match(passo)]
+                self.assertFalse(varreduras, f'{url}: {varreduras}\n{sql}')
+
+
+class OrcamentoConsultasTest(EscolaTestCase):
+    # Máximo de consultas por view, incluindo sessão e usuário. Uma view nova
+    # em escola/urls.py precisa de uma entrada aqui (ver o primeiro teste).
+    ORCAMENTO = {
+        'dashboard': 5,
+        'lista_turmas': 3,
+        'criar_turma': 2,
+        'detalhes_turma': 7,
+        'editar_turma': 3,
+        'lista_alunos': 4,
+        'criar_aluno': 3,
+        'importar_alunos': 3,
+        'detalhes_aluno': 6,
+        'criar_material': 3,
+        'editar_material': 4,
+        'deletar_material': 6,
+        'clonar_material': 4,
+        'baixar_material': 3,
+        'baixar_anexo_atividade': 3,
+        'baixar_entrega': 3,
+        'criar_atividade': 3,
+        'detalhes_atividade': 5,
+        'editar_atividade': 4,
+        'avaliar_entregas': 4,
+        'avaliar_entrega': 6,
+        'boletim_turma': 6,
+        'buscar': 4,
+        'exportar_boletins': 6,
+        'exportar_entregas': 3,
+        'exportar_boletim_turma': 7,
+        'exportar_entregas_turma': 4,
+        'criar_aviso': 3,
+        'detalhes_tarefa': 3,
+        'status_tarefa': 3,
+        'baixar_arquivo_tarefa': 3,
+        'api_turmas': 3,
+        'api_materiais': 4,
+        'api_atividades': 4,
+        'api_avisos': 4,
+        'api_notas_aluno': 4,
+        'turmas_arquivadas': 3,
+        'boletim_arquivado': 3,
+    }
+    REDIRECIONAM = {'deletar_material'}
+
+    def rotas(self):
+        turma, aluno, atividade = self.turma, self.alunos[0], self.atividade
+        material, descartavel = (
+            Material.objects.create(titulo='Slides', descricao='-', tipo='LINK', turma=turma)
+            for _ in range(2)
+        )
+        for objeto, campo in ((material, 'arquivo'), (atividade, 'arquivo_anexo'),
+                              (self.entrega, 'arquivo')):
+            if not getattr(objeto, campo):
+                getattr(objeto, campo).save('arquivo.pdf', ContentFile(b'%PDF-1.4'))
+        tarefa = Tarefa.objects.create(
+            tipo='exportar_boletim', professor=self.professor, status='CONCLUIDA',
+            resultado={'arquivo': 'boletins.csv'},
+        )
+        tarefa.arquivo.save('boletins.csv', ContentFile(b'Turma;Ano'))
+        antiga = Turma.objects.create(nome='6º A', ano=2020, professor=self.professor)
+        antiga.alunos.add(aluno)
+        arquivar_ano(2020)
+        arquivada = TurmaArquivada.objects.get(id_original=antiga.pk)
+        por_turma = {'turma_id': turma.pk}
+        return {
+            'dashboard': reverse('escola:dashboard'),
+            'lista_turmas': reverse('escola:lista_turmas'),
+            'criar_turma': reverse('escola:criar_turma'),
+            'detalhes_turma': reverse('escola:detalhes_turma', args=[turma.pk]),
+            'editar_turma': reverse('escola:editar_turma', args=[turma.pk]),
+            'lista_alunos': reverse('escola:lista_alunos'),
+            'criar_aluno': reverse('escola:criar_aluno'),
+            'importar_alunos': reverse('escola:importar_alunos'),
+            'detalhes_aluno': reverse('escola:detalhes_aluno', args=[aluno.pk]),
+            'criar_material': reverse('escola:criar_material', kwargs=por_turma),
+            'editar_material': reverse('escola:editar_material', args=[material.pk]),
+            'deletar_material': reverse('escola:deletar_material', args=[descartavel.pk]),
+            'clonar_material': reverse('escola:clonar_material', args=[material.pk]),
+            'baixar_material': reverse('escola:baixar_material', args=[material.pk]),
+            'baixar_anexo_atividade': reverse('escola:baixar_anexo_atividade', args=[atividade.pk]),
+            'baixar_entrega': reverse('escola:baixar_entrega', args=[self.entrega.pk]),
+            'criar_atividade': reverse('escola:criar_atividade', kwargs=por_turma),
+            'detalhes_atividade': reverse('escola:detalhes_atividade', args=[atividade.pk]),
+            'editar_atividade': reverse('escola:editar_atividade', args=[atividade.pk]),
+            'avaliar_entregas': reverse('escola:avaliar_entregas', args=[atividade.pk]),
+            'avaliar_entrega': reverse('escola:avaliar_entrega', args=[self.entrega.pk]),
+            'boletim_turma': reverse('escola:boletim_turma', kwargs=por_turma),
+            'buscar': reverse('escola:buscar') + '?q=frações',
+            'exportar_boletins': reverse('escola:exportar_boletins'),
+            'exportar_entregas': reverse('escola:exportar_entregas'),
+            'exportar_boletim_turma': reverse('escola:exportar_boletim_turma', kwargs=por_turma),
+            'exportar_entregas_turma': reverse('escola:exportar_entregas_turma', kwargs=por_turma),
+            'criar_aviso': reverse('escola:criar_aviso', kwargs=por_turma),
+            'detalhes_tarefa': reverse('escola:detalhes_tarefa', args=[tarefa.pk]),
+            'status_tarefa': reverse('escola:status_tarefa', args=[tarefa.pk]),
+            'baixar_arquivo_tarefa': reverse('escola:baixar_arquivo_tarefa', args=[tarefa.pk]),
+            'api_turmas': reverse('escola:api_turmas'),
+            'api_materiais': reverse('escola:api_materiais', kwargs=por_turma),
+            'api_atividades': reverse('escola:api_atividades', kwargs=por_turma),
+            'api_avisos': reverse('escola:api_avisos', kwargs=por_turma),
+            'api_notas_aluno': reverse('escola:api_notas_aluno', args=[aluno.pk]),
+            'turmas_arquivadas': reverse('escola:turmas_arquivadas'),
+            'boletim_arquivado': reverse('escola:boletim_arquivado', args=[arquivada.pk]),
+        }
+
+    def medir(self):
+        contagens = {}
+        for nome, url in self.rotas().items():
+            status = 302 if nome in self.REDIRECIONAM else 200
+            contagens[nome] = self.assertOrcamentoConsultas(url, self.ORCAMENTO[nome], status)
+        return contagens
+
+    def test_todas_as_views_tem_orcamento(self):
+        nomes = {padrao.name for padrao in escola_urls.urlpatterns}
+        self.assertEqual(nomes, set(self.ORCAMENTO))
+
+    def test_consultas_nao_crescem_com_os_dados(self):
+        # Mais alunos, entregas e notas não podem gerar mais consultas (N+1)
+        antes = self.medir()
+        novos = Aluno.objects.bulk_create([
+            Aluno(nome=f'Novo {i}', email=f'novo{i}@escola.com', matricula=f'N{i:03}')
+            for i in range(10)
+        ])
+        self.turma.alunos.add(*novos)
+        for entrega in Entrega.objects.filter(aluno__in=novos):
+            Nota.objects.create(entrega=entrega, valor=6)
+        Atividade.objects.create(
+            titulo='Equações', descricao='Lista', turma=self.turma,
+            data_entrega=timezone.now() + timedelta(days=3),
+        )
+        Material.objects.create(titulo='Vídeo', descricao='Frações', tipo='VIDEO', turma=self.turma)
+        Aviso.objects.create(titulo='Recuperação', conteudo='Frações', turma=self.turma)
+        cache.clear()
+        # Como no setUp: a sessão (cached_db) volta para o cache
+        self.client.force_login(self.professor)
+        depois = self.medir()
+        self.assertEqual(antes, depois)
+
+    def test_cabecalho_server_timing(self):
+        response = self.get(reverse('escola:dashboard'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ consultas"')
+
+
+class PaginacaoCursorTest(EscolaTestCase):
+    def test_avanca_e_volta_pelas_paginas(self):
+        alunos = Aluno.objects.all()
+        primeira = paginar_por_cursor(alunos, tamanho=2)
+        self.assertEqual([aluno.nome for aluno in primeira], ['Aluno 0', 'Aluno 1'])
+        segunda = paginar_por_cursor(alunos, cursor=primeira.proximo, tamanho=2)
+        self.assertEqual([aluno.nome for aluno in segunda], ['Aluno 2'])
+        self.assertIsNone(segunda.proximo)
+        volta = paginar_por_cursor(alunos, cursor=segunda.anterior, tamanho=2)
+        self.assertEqual([aluno.nome for aluno in volta], ['Aluno 0', 'Aluno 1'])
+
+    def test_cursor_adulterado_volta_a_primeira_pagina(self):
+        adulterados = [
+            'nao-e-base64!', _codificar('>', ['Aluno 0', 'abc']), _codificar('>', [{'a': 1}, [2]]),
+            _codificar('>', [None, 1]), _codificar('?', ['Aluno 0', 1]), _codificar('>', 'Aluno 0'),
+        ]
+        for cursor in adulterados:
+            for url in (reverse('escola:lista_alunos'),
+                        reverse('escola:detalhes_atividade', args=[self.atividade.pk])):
+                self.assertContains(self.get(f'{url}?cursor={cursor}'), 'Aluno 0', msg_prefix=cursor)
+
+
+@override_settings(CACHES=CACHE_DE_TESTE)
+class DadosSinteticosTest(TestCase):
+    def setUp(self):
+        usar_midia_temporaria(self)
+
+    def test_gera_escola_consistente_e_mede_todas_as_rotas(self):
+        relatorio = gerar_escola(professores=1, turmas=2, alunos=4, atividades=3, semente=1)
+        self.assertEqual(relatorio.entregas, 2 * 4 * 3)
+        self.assertEqual(Entrega.objects.count(), relatorio.entregas)
+        self.assertEqual(Nota.objects.count(), relatorio.notas)
+        for turma in Turma.objects.all():
+            self.assertEqual(turma.total_alunos, 4)
+            self.assertEqual(turma.total_atividades, 3)
+        self.assertEqual(
+            ResumoNotas.objects.count(),
+            Nota.objects.values('entrega__aluno').distinct().count(),
+        )
+
+        resultados = medir_rotas(User.objects.get(), repeticoes=1)
+        self.assertEqual(set(resultados), {padrao.name for padrao in escola_urls.urlpatterns})
+        for nome, medida in resultados.items():
+            self.assertLess(max(medida['status']), 400, nome)
+
+    def test_benchmark_nao_grava_nas_pastas_nem_no_cache_reais(self):
+        reais = settings.MEDIA_ROOT, settings.ESCOLA_ARQUIVO_DIR
+        cache.set('real', 1)
+        with ambiente_descartavel():
+            pastas = settings.MEDIA_ROOT, settings.ESCOLA_ARQUIVO_DIR, settings.CACHES['default']['LOCATION']
+            raiz = os.path.dirname(pastas[0])
+            self.assertEqual({os.path.dirname(pasta) for pasta in pastas}, {raiz})
+            self.assertTrue(raiz.startswith(tempfile.gettempdir()))
+            self.assertIsNone(cache.get('real'))
+            cache.clear()
+        self.assertEqual((settings.MEDIA_ROOT, settings.ESCOLA_ARQUIVO_DIR), reais)
+        self.assertEqual(cache.get('real'), 1)
+        self.assertFalse(os.path.exists(raiz))
+
+
+class ArmazenamentoDeduplicadoTest(EscolaTestCase):
+    def material(self, nome, conteudo, turma=None):
+        material = Material(titulo=nome, descricao='-', tipo='PDF', turma=turma or self.turma)
+        material.arquivo.save(nome, ContentFile(conteudo))
+        return material
+
+    def test_conteudo_repetido_e_gravado_uma_vez(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            primeiro = self.material('apostila.pdf', b'%PDF fracoes')
+            segundo = self.material('copia.pdf', b'%PDF fracoes')
+        self.assertEqual(ArquivoArmazenado.objects.get().referencias, 2)
+        caminho, outro = primeiro.arquivo.path, segundo.arquivo.path
+        self.assertEqual(os.path.dirname(caminho), os.path.dirname(outro))
+        self.assertTrue(os.path.samefile(caminho, outro))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            primeiro.delete()
+        self.assertEqual(ArquivoArmazenado.objects.get().referencias, 1)
+        self.assertTrue(os.path.exists(outro))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            segundo.delete()
+        self.assertFalse(ArquivoArmazenado.objects.exists())
+        self.assertFalse(os.path.exists(os.path.dirname(outro)))
+
+    def test_clonar_material_para_outra_turma_nao_copia_o_arquivo(self):
+        outra = Turma.objects.create(nome='8º B', ano=2025, professor=self.professor)
+        material = self.material('apostila.pdf', b'%PDF fracoes')
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = self.client.post(
+                reverse('escola:clonar_material', args=[material.pk]), {'turma': outra.pk},
+            )
+        self.assertRedirects(response, reverse('escola:detalhes_turma', args=[outra.pk]),
+                             fetch_redirect_response=False)
+        copia = outra.materiais.get()
+        self.assertEqual(copia.arquivo.name, material.arquivo.name)
+        self.assertEqual(ArquivoArmazenado.objects.get().referencias, 2)
+
+    def test_substituir_arquivo_libera_o_anterior(self):
+        material = self.material('v1.pdf', b'versao 1')
+        antigo = material.arquivo.path
+        with self.captureOnCommitCallbacks(execute=True):
+            material.arquivo.save('v2.pdf', ContentFile(b'versao 2'))
+        self.assertFalse(os.path.exists(antigo))
+        self.assertEqual(ArquivoArmazenado.objects.get().referencias, 1)
+
+
+class DownloadProtegidoTest(EscolaTestCase):
+    CONTEUDO = b'0123456789' * 10
+
+    def setUp(self):
+        super().setUp()
+        self.material = Material(titulo='Vídeo', descricao='-', tipo='VIDEO', turma=self.turma)
+        self.material.arquivo.save('aula.mp4', ContentFile(self.CONTEUDO))
+        self.url = reverse('escola:baixar_material', args=[self.material.pk])
+
+    def baixar(self, status=200, **cabecalhos):
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = self.client.get(self.url, headers=cabecalhos)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_arquivo_inteiro_com_validadores(self):
+        response = self.baixar()
+        self.assertEqual(b''.join(response.streaming_content), self.CONTEUDO)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+        self.assertIn(self.material.arquivo.name.split('/')[2], etag)
+
+        self.baixar(304, if_none_match=etag)
+        self.baixar(304, if_modified_since=response['Last-Modified'])
+
+    def test_range(self):
+        response = self.baixar(206, range='bytes=10-19')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTEUDO[10:20])
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/100')
+        self.assertEqual(response['Content-Length'], '10')
+
+        response = self.baixar(206, range='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTEUDO[-5:])
+
+        response = self.baixar(416, range='bytes=100-')
+        self.assertEqual(response['Content-Range'], 'bytes */100')
+
+        # If-Range com validador antigo: o arquivo vai inteiro
+        response = self.baixar(200, range='bytes=0-1', if_range='"outro"')
+        self.assertEqual(b''.join(response.streaming_content), self.CONTEUDO)
+
+    def test_so_o_professor_da_turma_baixa(self):
+        outro = User.objects.create_user('outro', password='senha')
+        self.client.force_login(outro)
+        self.baixar(404)
+
+    @override_settings(ESCOLA_DOWNLOAD_MODO='x-accel')
+    def test_repassa_para_o_nginx(self):
+        response = self.baixar()
+        self.assertEqual(response['X-Accel-Redirect'], '/protegido/' + self.material.arquivo.name)
+        self.assertEqual(response.content, b'')
+
+
+class FilaTarefasTest(EscolaTestCase):
+    # O banco de teste vive numa transação que outras threads não enxergam:
+    # reivindicar/executar rodam aqui mesmo, como faria cada trabalhador do pool
+
+    def rodar(self, agora=None):
+        ids = reivindicar('teste', limite=10, agora=agora)
+        for tarefa_id in ids:
+            executar_tarefa(tarefa_id)
+        return ids
+
+    def registrar_tipo(self, nome, funcao):
+        TIPOS[nome] = funcao
+        funcao.descricao = nome
+        self.addCleanup(TIPOS.pop, nome)
+
+    def test_importacao_roda_em_segundo_plano(self):
+        csv = ContentFile(
+            'nome,email,matricula\nAna,ana@escola.com,T001\nBia,bia@escola.com,T002\n'
+            'Caio,invalido,T003\n'.encode(),
+            name='alunos.csv',
+        )
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = self.client.post(
+                reverse('escola:importar_alunos'), {'arquivo': csv, 'turmas': [self.turma.pk]},
+            )
+        tarefa = Tarefa.objects.get()
+        self.assertRedirects(response, reverse('escola:detalhes_tarefa', args=[tarefa.pk]),
+                             fetch_redirect_response=False)
+        self.assertFalse(Aluno.objects.filter(matricula='T001').exists())
+        status = self.get(reverse('escola:status_tarefa', args=[tarefa.pk])).json()
+        self.assertEqual((status['status'], status['finalizada']), ('PENDENTE', False))
+
+        self.assertEqual(self.rodar(), [tarefa.pk])
+        self.assertEqual(reivindicar('teste'), [])
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.progresso), ('CONCLUIDA', 100))
+        self.assertEqual(tarefa.resultado['criados'], 2)
+        self.assertEqual(tarefa.resultado['total_erros'], 1)
+        self.assertEqual(self.turma.alunos.filter(matricula__in=['T001', 'T002']).count(), 2)
+        self.assertContains(self.get(reverse('escola:detalhes_tarefa', args=[tarefa.pk])),
+                            'alunos criados')
+
+    def test_exportacao_em_segundo_plano(self):
+        url = reverse('escola:exportar_boletim_turma', args=[self.turma.pk]) + '?segundo_plano=1'
+        tarefa_id = self.get(url, 302).url.rstrip('/').split('/')[-1]
+        self.rodar()
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = self.client.get(reverse('escola:baixar_arquivo_tarefa', args=[tarefa_id]))
+        self.assertEqual(response['Content-Disposition'], f'attachment; filename="boletim_turma_{self.turma.pk}.csv"')
+        conteudo = b''.join(response.streaming_content).decode('utf-8-sig')
+        self.assertTrue(conteudo.startswith('Turma;Ano;Matrícula'))
+        self.assertIn('Aluno 0', conteudo)
+
+        outro = User.objects.create_user('outro', password='senha')
+        self.client.force_login(outro)
+        self.get(reverse('escola:status_tarefa', args=[tarefa_id]), 404)
+
+    def test_falha_volta_para_a_fila_com_espera(self):
+        def instavel(tarefa):
+            raise ConnectionError('servidor fora do ar')
+
+        self.registrar_tipo('instavel', instavel)
+        tarefa = enfileirar('instavel', professor=self.professor, max_tentativas=2)
+        with self.assertLogs('escola.tarefas', 'WARNING'):
+            self.rodar()
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), ('PENDENTE', 1))
+        self.assertGreater(tarefa.disponivel_em, timezone.now())
+        self.assertIn('servidor fora do ar', tarefa.erro)
+        # Antes da espera ninguém pega; depois dela vem a última tentativa
+        self.assertEqual(reivindicar('teste'), [])
+        with self.assertLogs('escola.tarefas', 'WARNING'):
+            self.rodar(agora=tarefa.disponivel_em + timedelta(seconds=1))
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), ('FALHOU', 2))
+        self.assertIsNotNone(tarefa.concluida_em)
+
+    def test_reserva_vencida_volta_para_a_fila(self):
+        progresso = []
+
+        def lenta(tarefa):
+            reportar(tarefa, 50, 'metade')
+            progresso.append(Tarefa.objects.get(pk=tarefa.pk).progresso)
+            return {'ok': True}
+
+        self.registrar_tipo('lenta', lenta)
+        tarefa = enfileirar('lenta', professor=self.professor)
+        agora = timezone.now()
+        self.assertEqual(reivindicar('morto', agora=agora), [tarefa.pk])
+        # O trabalhador sumiu; passada a reserva, outro assume a tarefa
+        self.assertEqual(reivindicar('vivo', agora=agora + TEMPO_RESERVA), [])
+        depois = agora + TEMPO_RESERVA + timedelta(seconds=1)
+        self.assertEqual(reivindicar('vivo', agora=depois), [tarefa.pk])
+        executar_tarefa(tarefa.pk)
+        tarefa.refresh_from_db()
+        self.assertEqual(progresso, [50])
+        self.assertEqual((tarefa.status, tarefa.trabalhador, tarefa.tentativas),
+                         ('CONCLUIDA', 'vivo', 2))
+        self.assertEqual(tarefa.resultado, {'ok': True})
+
+    def test_pulso_renova_a_reserva_por_tempo(self):
+        relogio = [0]
+        tarefa = enfileirar('exportar_boletim', professor=self.professor)
+        agora = timezone.now()
+        reivindicar('teste', agora=agora)
+        tarefa.refresh_from_db()
+        pulso = Pulso(tarefa, intervalo=30, relogio=lambda: relogio[0])
+        relogio[0] = 29
+        self.assertFalse(pulso(40, 'cedo demais'))
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.progresso, 0)
+        relogio[0] = 30
+        self.assertTrue(pulso(40, 'metade'))
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.progresso, tarefa.mensagem), (40, 'metade'))
+        self.assertGreater(tarefa.expira_em, agora + TEMPO_RESERVA)
+        self.assertFalse(pulso(50))
+
+    def test_avaliacao_em_lote_grava_um_lote_por_vez(self):
+        entregas = Entrega.objects.filter(atividade=self.atividade).order_by('pk')
+        tarefa = enfileirar('avaliar_em_lote', professor=self.professor, atividade_id=self.atividade.pk,
+                            avaliacoes=[(entrega.pk, '7.5', 'ok') for entrega in entregas])
+        with unittest.mock.patch('escola.tarefas.LOTE_AVALIACAO', 2), \
+                unittest.mock.patch('escola.avaliacao.salvar_notas_em_lote',
+                                    wraps=salvar_notas_em_lote) as salvar:
+            self.rodar()
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.resultado), ('CONCLUIDA', {'avaliadas': 3}))
+        self.assertEqual([len(chamada.args[1]) for chamada in salvar.call_args_list], [2, 1])
+        self.assertEqual(set(Nota.objects.filter(entrega__in=entregas).values_list('valor', flat=True)),
+                         {Decimal('7.5')})
+
+    def test_avaliacao_em_lote_retoma_do_lote_que_faltou(self):
+        entregas = list(Entrega.objects.filter(atividade=self.atividade).order_by('pk'))
+        tarefa = enfileirar('avaliar_em_lote', professor=self.professor, atividade_id=self.atividade.pk,
+                            avaliacoes=[(entrega.pk, '6', '') for entrega in entregas])
+        lotes = []
+
+        def salvar(atividade, avaliacoes):
+            lotes.append([entrega.pk for entrega, _, _ in avaliacoes])
+            if len(lotes) == 2:
+                raise ConnectionError('banco fora do ar')
+            return salvar_notas_em_lote(atividade, avaliacoes)
+
+        with unittest.mock.patch('escola.tarefas.LOTE_AVALIACAO', 2), \
+                unittest.mock.patch('escola.avaliacao.salvar_notas_em_lote', salvar):
+            with self.assertLogs('escola.tarefas', 'WARNING'):
+                self.rodar()
+            tarefa.refresh_from_db()
+            self.assertEqual((tarefa.status, tarefa.resultado), ('PENDENTE', {'proximo': 2, 'avaliadas': 2}))
+            # O primeiro lote ficou gravado
+            self.assertEqual(Nota.objects.filter(valor=6).count(), 2)
+            self.rodar(agora=tarefa.disponivel_em + timedelta(seconds=1))
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.resultado), ('CONCLUIDA', {'avaliadas': 3}))
+        self.assertEqual(lotes, [[entregas[0].pk, entregas[1].pk], [entregas[2].pk], [entregas[2].pk]])
+
+    def test_importacao_retoma_depois_do_ultimo_lote_gravado(self):
+        csv = ContentFile(
+            'nome,email,matricula\n'
+            'Ana,ana@escola.com,T001\n'
+            'Sem Email,,T009\n'
+            'Bruno,bruno@escola.com,T002\n'
+            'Carla,carla@escola.com,T003\n'
+            'Davi,davi@escola.com,T004\n'
+            'Ana de Novo,ana@escola.com,T008\n'
+            'Elisa,elisa@escola.com,T005\n'.encode(),
+            name='alunos.csv',
+        )
+        tarefa = enfileirar('importar_alunos', professor=self.professor, arquivo=csv,
+                            turmas_permitidas=[self.turma.pk], turmas_padrao=[self.turma.pk])
+        lotes = []
+
+        def gravar(lote, turmas_padrao, relatorio):
+            lotes.append([aluno.matricula for _, aluno, _ in lote])
+            if len(lotes) == 2:
+                raise ConnectionError('banco fora do ar')
+            return _gravar_lote(lote, turmas_padrao, relatorio)
+
+        with unittest.mock.patch('escola.importacao.TAMANHO_LOTE', 2), \
+                unittest.mock.patch('escola.importacao._gravar_lote', gravar):
+            with self.assertLogs('escola.tarefas', 'WARNING'):
+                self.rodar()
+            tarefa.refresh_from_db()
+            self.assertEqual(tarefa.status, 'PENDENTE')
+            self.assertEqual(tarefa.resultado, {
+                'lidas': 3, 'criados': 2, 'matriculas': 2,
+                'erros': [[3, 'Nome, email e matrícula são obrigatórios.']],
+            })
+            self.rodar(agora=tarefa.disponivel_em + timedelta(seconds=1))
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, 'CONCLUIDA')
+        self.assertEqual(lotes, [['T001', 'T002'], ['T003', 'T004'], ['T003', 'T004'], ['T005']])
+        self.assertEqual(tarefa.resultado, {
+            'criados': 5, 'matriculas': 5, 'total_erros': 2,
+            'erros': [[3, 'Nome, email e matrícula são obrigatórios.'],
+                      [7, 'Email ou matrícula repetido no arquivo.']],
+        })
+        self.assertEqual(Aluno.objects.filter(matricula__startswith='T').count(), 5)
+
+    def test_csv_fora_do_utf8_falha_sem_nova_tentativa(self):
+        csv = ContentFile('nome,email,matricula\nJoão,joao@escola.com,T001\n'.encode('latin-1'),
+                          name='alunos.csv')
+        tarefa = enfileirar('importar_alunos', professor=self.professor, arquivo=csv,
+                            turmas_permitidas=[self.turma.pk])
+        with self.assertLogs('escola.tarefas', 'WARNING'):
+            self.rodar()
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.tentativas), ('FALHOU', 1))
+        self.assertIn('UTF-8', tarefa.erro)
+        self.assertFalse(Aluno.objects.filter(matricula='T001').exists())
+
+
+class AvaliacaoEmLoteTest(EscolaTestCase):
+    def postar(self, valores):
+        entregas = Entrega.objects.filter(atividade=self.atividade).order_by('aluno__nome')
+        dados = {'form-TOTAL_FORMS': len(valores), 'form-INITIAL_FORMS': len(valores)}
+        for i, (entrega, valor) in enumerate(zip(entregas, valores)):
+            dados.update({f'form-{i}-entrega': entrega.pk, f'form-{i}-valor': valor,
+                          f'form-{i}-comentario_professor': ''})
+        with self.assertLogs('escola.sql', 'INFO'):
+            return self.client.post(reverse('escola:avaliar_entregas', args=[self.atividade.pk]), dados)
+
+    def test_nota_lancada_nao_some_com_o_campo_em_branco(self):
+        response = self.postar(['', '7', ''])
+        self.assertContains(response, 'Esta entrega já tem nota')
+        self.assertEqual(list(Nota.objects.values_list('valor', flat=True)), [Decimal(8)])
+
+        response = self.postar(['9', '7', ''])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sorted(Nota.objects.values_list('valor', flat=True)), [Decimal(7), Decimal(9)])
+
+
+class PrazosTest(EscolaTestCase):
+    def versoes(self):
+        return versao_professor(self.professor.pk), versoes_turma(self.turma.pk)['notas']
+
+    def test_marca_as_atrasadas_e_invalida_o_cache(self):
+        antes = self.versoes()
+        agora = self.atividade.data_entrega + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(processar_prazos(agora), [(self.atividade.pk, 2)])
+            self.assertEqual(self.versoes(), antes)
+        depois = self.versoes()
+        self.assertNotEqual(depois[0], antes[0])
+        self.assertNotEqual(depois[1], antes[1])
+        self.assertEqual(
+            sorted(self.atividade.entregas.values_list('status', flat=True)),
+            ['ATRASADO', 'ATRASADO', 'ENTREGUE'],
+        )
+
+        # A segunda execução não revisita a atividade nem troca as versões
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.assertEqual(processar_prazos(agora + timedelta(hours=1)), [])
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.versoes(), depois)
+
+    def test_so_prazos_vencidos_depois_da_marca(self):
+        agora = self.atividade.data_entrega + timedelta(days=1)
+        processar_prazos(agora)
+        nova = Atividade.objects.create(titulo='Decimais', descricao='-', turma=self.turma,
+                                        data_entrega=agora + timedelta(hours=2))
+        self.assertEqual(processar_prazos(agora + timedelta(hours=1)), [])
+        self.assertEqual(processar_prazos(agora + timedelta(hours=3)), [(nova.pk, 3)])
+        self.assertEqual(MarcaProcessamento.objects.get().valor, agora + timedelta(hours=3))
+        # O modo completo revisa tudo, sem nada novo para marcar
+        self.assertEqual(sorted(processar_prazos(agora + timedelta(hours=4), completo=True)),
+                         sorted([(self.atividade.pk, 0), (nova.pk, 0)]))
+
+
+class EmailContado(locmem.EmailBackend):
+    """``mail.outbox`` que conta as conexões abertas, recusa os endereços de
+    ``recusar`` e pode cair depois de N envios."""
+    aberturas = 0
+    falhar_depois_de = None
+    recusar = ()
+
+    def open(self):
+        EmailContado.aberturas += 1
+        return True
+
+    def send_messages(self, mensagens):
+        if self.falhar_depois_de is not None and len(mail.outbox) >= self.falhar_depois_de:
+            raise ConnectionError('servidor SMTP fora do ar')
+        recusados = {email: (550, b'Mailbox unavailable') for mensagem in mensagens
+                     for email in mensagem.to if email in self.recusar}
+        if recusados:
+            raise SMTPRecipientsRefused(recusados)
+        return super().send_messages(mensagens)
+
+
+@override_settings(EMAIL_BACKEND='escola.tests.EmailContado')
+class NotificacaoAvisosTest(EscolaTestCase):
+    def setUp(self):
+        super().setUp()
+        EmailContado.aberturas = 0
+        EmailContado.falhar_depois_de = None
+        EmailContado.recusar = ()
+        # Lotes de 2 alunos (3 na turma) e sem esperar entre os envios
+        for nome, valor in (('TAMANHO_LOTE', 2), ('POR_SEGUNDO', 0)):
+            self.addCleanup(setattr, notificacoes, nome, getattr(notificacoes, nome))
+            setattr(notificacoes, nome, valor)
+
+    def rodar(self, agora=None):
+        for tarefa_id in reivindicar('teste', limite=10, agora=agora):
+            executar_tarefa(tarefa_id)
+
+    def criar_aviso(self, importante):
+        dados = {'titulo': 'Reunião', 'conteudo': 'Reunião de pais', 'importante': importante}
+        with self.assertLogs('escola.sql', 'INFO'):
+            self.client.post(reverse('escola:criar_aviso', args=[self.turma.pk]), dados)
+        return Aviso.objects.get(titulo='Reunião', importante=importante)
+
+    def test_aviso_importante_vai_para_a_fila(self):
+        self.criar_aviso(importante=False)
+        self.assertFalse(Tarefa.objects.exists())
+        aviso = self.criar_aviso(importante=True)
+        tarefa = Tarefa.objects.get()
+        self.assertEqual((tarefa.tipo, tarefa.parametros), ('notificar_aviso', {'aviso_id': aviso.pk}))
+        self.assertEqual(mail.outbox, [])
+
+        # Editar sem mudar nada não reenvia; marcar como importante, sim
+        aviso.save()
+        comum = Aviso.objects.get(importante=False)
+        comum.importante = True
+        comum.save()
+        self.assertEqual(Tarefa.objects.filter(tipo='notificar_aviso').count(), 2)
+
+    def test_envio_em_lotes_por_uma_conexao(self):
+        aviso = self.criar_aviso(importante=True)
+        self.rodar()
+        tarefa = Tarefa.objects.get()
+        self.assertEqual((tarefa.status, tarefa.resultado),
+                         ('CONCLUIDA', {'enviados': 3, 'recusados': []}))
+        self.assertEqual(sorted(mensagem.to[0] for mensagem in mail.outbox),
+                         [aluno.email for aluno in self.alunos])
+        self.assertEqual(mail.outbox[0].subject, f'[7º A] {aviso.titulo}')
+        self.assertEqual(EmailContado.aberturas, 1)
+
+    def test_nova_tentativa_continua_sem_repetir(self):
+        self.criar_aviso(importante=True)
+        EmailContado.falhar_depois_de = 2
+        with self.assertLogs('escola.tarefas', 'WARNING'):
+            self.rodar()
+        tarefa = Tarefa.objects.get()
+        self.assertEqual(tarefa.status, 'PENDENTE')
+        self.assertEqual(tarefa.resultado,
+                         {'ultimo_aluno': self.alunos[1].pk, 'enviados': 2, 'recusados': []})
+
+        EmailContado.falhar_depois_de = None
+        self.rodar(agora=tarefa.disponivel_em + timedelta(seconds=1))
+        tarefa.refresh_from_db()
+        self.assertEqual((tarefa.status, tarefa.resultado),
+                         ('CONCLUIDA', {'enviados': 3, 'recusados': []}))
+        self.assertEqual(sorted(mensagem.to[0] for mensagem in mail.outbox),
+                         [aluno.email for aluno in self.alunos])
+
+    def test_endereco_recusado_ou_malformado_e_pulado(self):
+        malformado, recusado, aluno = self.alunos
+        Aluno.objects.filter(pk=malformado.pk).update(email='sem-arroba')
+        EmailContado.recusar = {recusado.email}
+        self.criar_aviso(importante=True)
+        self.rodar()
+        tarefa = Tarefa.objects.get()
+        self.assertEqual((tarefa.status, tarefa.resultado), ('CONCLUIDA', {
+            'enviados': 1,
+            'recusados': [{'aluno': malformado.pk, 'email': 'sem-arroba'},
+                          {'aluno': recusado.pk, 'email': recusado.email}],
+        }))
+        self.assertEqual([mensagem.to[0] for mensagem in mail.outbox], [aluno.email])
+
+    def test_ritmo_limita_envios_por_segundo(self):
+        relogio, esperas = [0.0], []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            relogio[0] += segundos
+
+        ritmo = Ritmo(4, relogio=lambda: relogio[0], dormir=dormir)
+        for _ in range(3):
+            ritmo.aguardar()
+        relogio[0] += 1
+        ritmo.aguardar()
+        self.assertEqual(esperas, [0.25, 0.25])
+
+
+class EstatisticasTest(EscolaTestCase):
+    NOTAS = [2, 4, 4, 4, 5, 5, 7, 9]
+
+    def test_resumo_das_notas(self):
+        resumo = estatisticas.resumir(self.NOTAS, total_entregas=10, enviadas=8, usar_numpy=False)
+        self.assertEqual((resumo.media, resumo.mediana, resumo.desvio_padrao), (5, 4.5, 2))
+        self.assertEqual((resumo.minima, resumo.maxima, resumo.taxa_entrega), (2, 9, 80))
+        self.assertEqual([(p, round(v, 2)) for p, v in resumo.percentis], [(25, 4), (75, 5.5), (90, 7.6)])
+        self.assertEqual([quantidade for _, _, quantidade in resumo.histograma],
+                         [0, 0, 1, 0, 3, 2, 0, 1, 0, 1])
+        # A nota máxima cai na última faixa
+        self.assertEqual(estatisticas.resumir([10], usar_numpy=False).histograma[-1], (9, 10, 1))
+        self.assertIsNone(estatisticas.resumir([]).media)
+
+    @unittest.skipIf(estatisticas.numpy is None, 'NumPy não instalado')
+    def test_numpy_e_biblioteca_padrao_concordam(self):
+        com, sem = (estatisticas.resumir(self.NOTAS, usar_numpy=usar) for usar in (True, False))
+        self.assertEqual(com.histograma, sem.histograma)
+        for campo in ('media', 'mediana', 'desvio_padrao'):
+            self.assertAlmostEqual(getattr(com, campo), getattr(sem, campo))
+        for (_, a), (_, b) in zip(com.percentis, sem.percentis):
+            self.assertAlmostEqual(a, b)
+
+    def test_cache_ate_a_proxima_nota(self):
+        outra = Atividade.objects.create(
+            titulo='Decimais', descricao='-', turma=self.turma, data_entrega=timezone.now(),
+        )
+        with self.assertNumQueries(1):
+            calculadas = estatisticas.estatisticas_atividades([self.atividade, outra])
+        self.assertEqual((calculadas[self.atividade.pk].media, calculadas[outra.pk].avaliadas), (8, 0))
+        self.assertEqual(round(calculadas[self.atividade.pk].taxa_entrega), 33)
+        with self.assertNumQueries(0):
+            estatisticas.estatisticas_atividade(self.atividade)
+
+        entrega = Entrega.objects.get(atividade=self.atividade, aluno=self.alunos[1])
+        entrega.status = 'ENTREGUE'
+        entrega.save()
+        Nota.objects.create(entrega=entrega, valor=6)
+        atual = estatisticas.estatisticas_atividade(self.atividade)
+        self.assertEqual((atual.media, atual.avaliadas, round(atual.taxa_entrega)), (7, 2, 67))
+        self.assertContains(self.get(reverse('escola:detalhes_atividade', args=[self.atividade.pk])),
+                            'Desvio padrão')
+
+    def test_comando_recalcula_em_lote(self):
+        with self.assertNumQueries(2):
+            call_command('recalcular_estatisticas', turmas=[self.turma.pk], stdout=io.StringIO())
+        with self.assertNumQueries(0):
+            self.assertEqual(estatisticas.estatisticas_atividade(self.atividade).media, 8)
+
+
+class ArquivamentoTest(EscolaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.antiga = Turma.objects.create(nome='6º B', ano=2020, professor=self.professor)
+        self.antiga.alunos.add(*self.alunos[:2])
+        self.atividade_antiga = Atividade.objects.create(
+            titulo='Equações', descricao='-', turma=self.antiga, data_entrega=timezone.now(),
+        )
+        entrega = Entrega.objects.get(atividade=self.atividade_antiga, aluno=self.alunos[1])
+        self.nota = Nota.objects.create(entrega=entrega, valor=9)
+        self.material = Material(titulo='Gabarito', descricao='-', tipo='PDF', turma=self.antiga)
+        self.material.arquivo.save('gabarito.pdf', ContentFile(b'%PDF-1.4 gabarito'))
+
+    def test_arquivar_consultar_e_restaurar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('arquivar_ano', '2020', stdout=io.StringIO())
+        self.assertFalse(Turma.objects.filter(pk=self.antiga.pk).exists())
+        self.assertFalse(Entrega.objects.filter(atividade_id=self.atividade_antiga.pk).exists())
+        self.assertTrue(Turma.objects.filter(pk=self.turma.pk).exists())
+        arquivada = TurmaArquivada.objects.get()
+        self.assertEqual((arquivada.id_original, arquivada.total_alunos, arquivada.total_entregas),
+                         (self.antiga.pk, 2, 2))
+        # O anexo continua no disco: a referência agora é do arquivo
+        self.assertTrue(self.material.arquivo.storage.exists(self.material.arquivo.name))
+        self.assertEqual(reconciliar_arquivos()[0], 0)
+
+        response = self.get(reverse('escola:boletim_arquivado', args=[arquivada.pk]))
+        self.assertContains(response, 'Equações')
+        self.assertContains(response, '9,00')
+        self.assertEqual(boletim_arquivado(arquivada).linhas[1].media, 9)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('restaurar_turma', str(self.antiga.pk), stdout=io.StringIO())
+        self.assertFalse(TurmaArquivada.objects.exists())
+        turma = Turma.objects.get(pk=self.antiga.pk)
+        self.assertEqual((turma.criado_em, turma.total_alunos, turma.total_atividades),
+                         (self.antiga.criado_em, 2, 1))
+        nota = Nota.objects.get(pk=self.nota.pk)
+        self.assertEqual((nota.valor, nota.data_avaliacao), (9, self.nota.data_avaliacao))
+        material = Material.objects.get(pk=self.material.pk)
+        with material.arquivo.open('rb') as arquivo:
+            self.assertEqual(arquivo.read(), b'%PDF-1.4 gabarito')
+        self.assertEqual(ArquivoArmazenado.objects.get().referencias, 1)
+        self.assertEqual(ResumoNotas.objects.get(turma=turma).media, 9)
+
+    def test_so_anos_encerrados(self):
+        with self.assertRaises(CommandError):
+            call_command('arquivar_ano', str(timezone.localdate().year), stdout=io.StringIO())
+        self.assertFalse(TurmaArquivada.objects.exists())
+
+    def test_boletim_arquivado_so_do_professor(self):
+        arquivar_ano(2020)
+        arquivada = TurmaArquivada.objects.get()
+        self.client.force_login(User.objects.create_user('outro'))
+        self.get(reverse('escola:boletim_arquivado', args=[arquivada.pk]), 404)
+        self.assertNotContains(self.get(reverse('escola:turmas_arquivadas')), '6º B')
+
+
+class EscopoAutorizacaoTest(EscolaTestCase):
+    def test_escopo_montado_com_uma_consulta_e_reutilizado(self):
+        with self.assertNumQueries(1):
+            escopo = escopo_professor(self.professor.pk)
+        self.assertEqual(escopo.turmas, {self.turma.pk})
+        self.assertEqual(escopo.atividades, {self.atividade.pk})
+        self.assertEqual(escopo.alunos, {aluno.pk for aluno in self.alunos})
+        with self.assertNumQueries(0):
+            escopo_professor(self.professor.pk)
+
+    def test_dono_conferido_mesmo_com_escopo_desatualizado(self):
+        outro = User.objects.create_user('outro')
+        turma = Turma.objects.create(nome='8º B', ano=2025, professor=outro)
+        atividade = Atividade.objects.create(titulo='Decimais', descricao='-', turma=turma,
+                                             data_entrega=timezone.now())
+        material = Material.objects.create(titulo='Slides', descricao='-', tipo='LINK', turma=turma)
+        aluno = Aluno.objects.create(nome='Aluno Novo', email='novo@escola.com', matricula='N001')
+        turma.alunos.add(aluno)
+        entrega = Entrega.objects.get(atividade=atividade, aluno=aluno)
+        urls = [
+            reverse('escola:detalhes_turma', args=[turma.pk]),
+            reverse('escola:detalhes_atividade', args=[atividade.pk]),
+            reverse('escola:editar_material', args=[material.pk]),
+            reverse('escola:avaliar_entrega', args=[entrega.pk]),
+            reverse('escola:detalhes_aluno', args=[aluno.pk]),
+        ]
+        # Um escopo em cache que ainda lista os objetos do outro professor
+        atrasado = Escopo(turmas=frozenset({turma.pk}), atividades=frozenset({atividade.pk}),
+                          alunos=frozenset({aluno.pk}))
+        with unittest.mock.patch('escola.escopo.escopo_professor', return_value=atrasado):
+            for url in urls:
+                self.get(url, 404)
+        with unittest.mock.patch('escola.escopo.aescopo_professor', return_value=atrasado):
+            with self.assertRaises(Http404):
+                async_to_sync(aobter_ou_404)(self.professor, Turma, turma.pk)
+
+        self.client.force_login(outro)
+        for url in urls:
+            self.get(url)
+
+    def test_turma_transferida_sai_do_escopo_do_antigo_dono(self):
+        url = reverse('escola:detalhes_turma', args=[self.turma.pk])
+        self.get(url)
+        self.turma.professor = User.objects.create_user('outro')
+        self.turma.save()
+        self.get(url, 404)
+        self.get(reverse('escola:detalhes_atividade', args=[self.atividade.pk]), 404)
+
+    def test_escrita_de_outro_processo_invalida_o_escopo(self):
+        url = reverse('escola:detalhes_turma', args=[self.turma.pk])
+        self.get(url)
+        # Um trabalhador ou comando tem a sua própria instância do backend
+        outro_processo = caches.create_connection('default')
+        with unittest.mock.patch('escola.cache.cache', outro_processo):
+            nova = Turma.objects.create(nome='8º B', ano=2025, professor=self.professor)
+            self.turma.professor = User.objects.create_user('outro')
+            self.turma.save()
+        self.get(reverse('escola:detalhes_turma', args=[nova.pk]))
+        self.get(url, 404)
+
+
+class ApiTest(EscolaTestCase):
+    def api(self, nome, *args, status=200, parametros=None, **cabecalhos):
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = self.client.get(reverse(f'escola:{nome}', args=args), parametros, **cabecalhos)
+        self.assertEqual(response.status_code, status)
+        return response
+
+    def test_campos_e_ids(self):
+        segundo = Material.objects.create(titulo='Vídeo', descricao='-', tipo='VIDEO', turma=self.turma)
+        parametros = {'campos': 'id,titulo', 'ids': f'{segundo.pk},999'}
+        response = self.api('api_materiais', self.turma.pk, parametros=parametros)
+        self.assertEqual(response.json(), {'resultados': [{'id': segundo.pk, 'titulo': 'Vídeo'}]})
+
+        self.api('api_materiais', self.turma.pk, status=400, parametros={'campos': 'id,senha'})
+        self.api('api_materiais', self.turma.pk, status=400, parametros={'ids': '1,a'})
+
+        notas = self.api('api_notas_aluno', self.alunos[0].pk).json()['resultados']
+        self.assertEqual([(nota['atividade_titulo'], nota['valor']) for nota in notas], [('Frações', '8.00')])
+
+    def test_304_sem_buscar_os_objetos(self):
+        primeira = self.api('api_avisos', self.turma.pk)
+        self.assertEqual(primeira.json()['resultados'][0]['titulo'], 'Prova')
+        self.assertNotIn('Last-Modified', primeira)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.api('api_avisos', self.turma.pk, status=304, HTTP_IF_NONE_MATCH=primeira['ETag'])
+        sql = [consulta['sql'] for consulta in consultas.captured_queries if 'escola_aviso' in consulta['sql']]
+        self.assertEqual(len(sql), 1)
+        self.assertIn('COUNT(', sql[0])
+
+        # Edição sem data de atualização: a versão da seção muda o ETag
+        Aviso.objects.update(titulo='Prova adiada')
+        Aviso.objects.get().save()
+        segunda = self.api('api_avisos', self.turma.pk, HTTP_IF_NONE_MATCH=primeira['ETag'])
+        self.assertEqual(segunda.json()['resultados'][0]['titulo'], 'Prova adiada')
+        self.assertNotEqual(segunda['ETag'], primeira['ETag'])
+
+    def test_edicao_e_exclusao_mudam_a_resposta(self):
+        primeira = self.api('api_turmas')
+        self.turma.nome = '7º B'
+        self.turma.save()
+        # Sem Last-Modified, If-Modified-Since sozinho não dá 304 depois da edição
+        segunda = self.api('api_turmas', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(segunda.json()['resultados'][0]['nome'], '7º B')
+        self.api('api_turmas', HTTP_IF_NONE_MATCH=primeira['ETag'])
+
+        antes = self.api('api_materiais', self.turma.pk)
+        Material.objects.get().delete()
+        depois = self.api('api_materiais', self.turma.pk, HTTP_IF_NONE_MATCH=antes['ETag'])
+        self.assertEqual(depois.json(), {'resultados': []})
+
+    def test_so_dados_do_professor(self):
+        self.client.force_login(User.objects.create_user('outro'))
+        self.assertEqual(self.api('api_turmas').json(), {'resultados': []})
+        self.api('api_atividades', self.turma.pk, status=404)
+        self.api('api_notas_aluno', self.alunos[0].pk, status=404)
+
+
+class CacheFragmentosTest(EscolaTestCase):
+    def consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.get(url)
+        return response, ' '.join(consulta['sql'] for consulta in consultas.captured_queries)
+
+    def test_turma_sem_alteracoes_nao_consulta_os_blocos(self):
+        url = reverse('escola:detalhes_turma', args=[self.turma.pk])
+        self.get(url)
+        response, sql = self.consultas(url)
+        self.assertContains(response, 'Aluno 2')
+        self.assertContains(response, 'Apostila')
+        for tabela in ('escola_aluno', 'escola_material', 'escola_aviso'):
+            self.assertNotIn(tabela, sql)
+
+        Material.objects.create(titulo='Vídeo', descricao='Frações', tipo='VIDEO', turma=self.turma)
+        self.alunos[1].delete()
+        response, sql = self.consultas(url)
+        self.assertContains(response, 'Vídeo')
+        self.assertNotContains(response, 'Aluno 1')
+        self.assertIn('escola_material', sql)
+        self.assertNotIn('escola_aviso', sql)
+
+    def test_boletim_muda_com_as_notas(self):
+        url = reverse('escola:boletim_turma', args=[self.turma.pk])
+        self.get(url)
+        response, sql = self.consultas(url)
+        self.assertContains(response, '8,00')
+        self.assertNotIn('escola_nota', sql)
+
+        nota = Nota.objects.get(entrega=self.entrega)
+        nota.valor = 3
+        nota.save()
+        response = self.get(url)
+        self.assertContains(response, '3,00')
+        self.assertNotContains(response, '8,00')
+
+    def test_versao_descartada_nao_reaproveita_entradas(self):
+        pk = self.professor.pk
+        self.assertEqual(obter_ou_calcular(pk, 'teste', lambda: 'antigo'), 'antigo')
+        invalidar_professor(pk)
+        # O cache descarta só a chave de versão; a entrada antiga continua guardada
+        cache.delete(f'escola:professor:{pk}:versao')
+        self.assertEqual(obter_ou_calcular(pk, 'teste', lambda: 'novo'), 'novo')
+
+    def test_o_que_vai_para_o_cache_e_lido_do_principal(self):
+        roteador = RoteadorReplica()
+        bancos = []
+
+        def calcular():
+            bancos.append(roteador.db_for_read(Nota) or 'principal')
+            return 'valor'
+
+        bloco = Template('{% load cache_principal %}{% cache 60 teste %}{{ banco }}{% endcache %}')
+        url = reverse('escola:boletim_turma', args=[self.turma.pk])
+        with leituras_na_replica():
+            obter_ou_calcular(self.professor.pk, 'teste', calcular)
+            obter_ou_calcular(self.professor.pk, 'teste', calcular)
+            renderizado = bloco.render(Context({'banco': lambda: roteador.db_for_read(Nota) or 'principal'}))
+            self.get(url)
+            # Fora dos blocos guardados, a leitura continua na réplica
+            self.assertEqual(roteador.db_for_read(Nota), 'replica')
+        self.assertEqual(bancos, ['principal'])
+        self.assertEqual(renderizado, 'principal')
+        _, sql = self.consultas(url)
+        self.assertNotIn('escola_nota', sql)
+
+    def test_lista_de_alunos_muda_com_o_aluno(self):
+        url = reverse('escola:lista_alunos')
+        self.get(url)
+        _, sql = self.consultas(url)
+        self.assertNotIn('escola_aluno', sql)
+
+        aluno = self.alunos[0]
+        aluno.nome = 'Aluna Renomeada'
+        aluno.save()
+        self.assertContains(self.get(url), 'Aluna Renomeada')
+
+    def test_lista_de_alunos_com_cursor_adulterado_usa_a_mesma_entrada(self):
+        url = reverse('escola:lista_alunos')
+        self.get(url)
+        _, sql = self.consultas(f'{url}?cursor=lixo')
+        self.assertNotIn('escola_aluno', sql)
+
+    def test_lista_de_alunos_so_com_as_turmas_do_professor(self):
+        url = reverse('escola:lista_alunos')
+        self.get(url)
+        outro = User.objects.create_user('outro')
+        turma = Turma.objects.create(nome='Turma do Outro', ano=2025, professor=outro)
+        turma.alunos.add(self.alunos[0])
+        novo = Aluno.objects.create(nome='Aluno Novo', email='novo@escola.com', matricula='N001')
+        self.turma.alunos.add(novo)
+        response = self.get(url)
+        self.assertContains(response, 'Aluno Novo')
+        self.assertNotContains(response, 'Turma do Outro')
+        cache.clear()
+        self.assertNotContains(self.get(url), 'Turma do Outro')
+
+
+@override_settings(ROOT_URLCONF=UrlconfLeitura(views_async))
+class ViewsAsyncTest(EscolaTestCase):
+    async def aget(self, url, status=200):
+        with self.assertLogs('escola.sql', 'INFO'):
+            response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status, url)
+        return response
+
+    async def test_mesmo_conteudo_e_orcamento_das_views_sincronas(self):
+        await self.async_client.aforce_login(self.professor)
+        urls = {
+            'dashboard': reverse('escola:dashboard'),
+            'detalhes_turma': reverse('escola:detalhes_turma', args=[self.turma.pk]),
+            'detalhes_aluno': reverse('escola:detalhes_aluno', args=[self.alunos[0].pk]),
+            'boletim_turma': reverse('escola:boletim_turma', args=[self.turma.pk]) + '?ponderada=1',
+        }
+        esperado = {
+            'dashboard': ['7º A', 'Frações'],
+            'detalhes_turma': ['Aluno 0', 'Aluno 2', 'Apostila', 'Frações', 'Prova'],
+            'detalhes_aluno': ['Aluno 0', '7º A', 'Frações', '8'],
+            'boletim_turma': ['Aluno 0', 'M002', 'Frações', 'Média Ponderada'],
+        }
+        for nome, url in urls.items():
+            response = await self.aget(url)
+            self.assertIs(response.resolver_match.func, getattr(views_async, nome))
+            for texto in esperado[nome]:
+                self.assertContains(response, texto, msg_prefix=nome)
+            self.assertContains(response, 'Olá, professor!')
+            # O middleware conta as consultas também no caminho assíncrono
+            consultas = int(re.search(r'"(\d+) consultas"', response['Server-Timing']).group(1))
+            self.assertGreater(consultas, 0, nome)
+            self.assertLessEqual(consultas, OrcamentoConsultasTest.ORCAMENTO[nome], nome)
+
+    async def test_exige_login_e_dono(self):
+        url = reverse('escola:detalhes_turma', args=[self.turma.pk])
+        self.assertEqual((await self.aget(url, 302)).url, f'{settings.LOGIN_URL}?next={url}')
+        outro = await User.objects.acreate(username='outro')
+        await self.async_client.aforce_login(outro)
+        await self.aget(url, 404)
+        await self.aget(reverse('escola:boletim_turma', args=[self.turma.pk]), 404)
+
+    async def test_blocos_em_cache_nao_sao_consultados(self):
+        await self.async_client.aforce_login(self.professor)
+        for url in (reverse('escola:detalhes_turma', args=[self.turma.pk]),
+                    reverse('escola:boletim_turma', args=[self.turma.pk])):
+            primeira = await self.aget(url)
+            segunda = await self.aget(url)
+            self.assertEqual(primeira.content, segunda.content)
+            consultas = re.search(r'"(\d+) consultas"', segunda['Server-Timing']).group(1)
+            self.assertLess(int(consultas), int(
+                re.search(r'"(\d+) consultas"', primeira['Server-Timing']).group(1)
+            ), url)
+
+
+    async def test_bloco_que_sai_do_cache_depois_da_conferencia(self):
+        await self.async_client.aforce_login(self.professor)
+        # A conferência encontra os blocos, mas eles somem antes do render
+        with unittest.mock.patch.object(views_async.cache, 'ahas_key', return_value=True):
+            turma = await self.aget(reverse('escola:detalhes_turma', args=[self.turma.pk]))
+            boletim = await self.aget(reverse('escola:boletim_turma', args=[self.turma.pk]))
+        for texto in ('Aluno 2', 'Apostila', 'Prova'):
+            self.assertContains(turma, texto)
+        self.assertContains(boletim, '8,00')
+        # O bloco gravado no cache é o completo, não um vazio
+        self.assertContains(await self.aget(reverse('escola:boletim_turma', args=[self.turma.pk])), '8,00')
+
+@override_settings(CACHES=CACHE_DE_TESTE)
+class BancoProducaoTest(TestCase):
+    def test_pragmas_aplicados_a_cada_conexao(self):
+        def cache_size():
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA cache_size')
+                return cursor.fetchone()[0]
+
+        anterior = cache_size()
+        self.addCleanup(connection.cursor().execute, f'PRAGMA cache_size = {anterior}')
+        with override_settings(ESCOLA_SQLITE_PRAGMAS={'default': {'cache_size': -4321}}):
+            configurar_conexao(sender=None, connection=connection)
+        self.assertEqual(cache_size(), -4321)
+
+    def test_roteador_le_da_replica_ate_a_primeira_escrita(self):
+        roteador = RoteadorReplica()
+        self.assertIsNone(roteador.db_for_read(Turma))
+        with leituras_na_replica():
+            self.assertEqual(roteador.db_for_read(Turma), 'replica')
+            # Sessões e usuários ficam no principal: o login precisa ser visto na hora
+            self.assertIsNone(roteador.db_for_read(User))
+            self.assertEqual(roteador.db_for_write(Turma), 'default')
+            self.assertIsNone(roteador.db_for_read(Turma))
+        self.assertFalse(roteador.allow_migrate('replica', 'escola'))
+        self.assertIsNone(roteador.allow_migrate('default', 'escola'))
+
+    def test_middleware_le_do_principal_logo_depois_de_um_post(self):
+        roteador = RoteadorReplica()
+        middleware = ReplicaLeituraMiddleware(
+            lambda request: HttpResponse(roteador.db_for_read(Aluno) or 'default')
+        )
+        fabrica = RequestFactory()
+        self.assertEqual(middleware(fabrica.get('/')).content, b'replica')
+
+        response = middleware(fabrica.post('/'))
+        self.assertEqual(response.content, b'default')
+        cookie = response.cookies[ReplicaLeituraMiddleware.COOKIE_PRINCIPAL]
+        self.assertEqual(cookie['max-age'], settings.ESCOLA_REPLICA_JANELA)
+
+        depois = fabrica.get('/')
+        depois.COOKIES[cookie.key] = cookie.value
+        self.assertEqual(middleware(depois).content, b'default')
+
+    def test_copiar_banco_com_a_api_de_backup(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta, ignore_errors=True)
+        origem, destino = os.path.join(pasta, 'principal.db'), os.path.join(pasta, 'replica.db')
+        banco = sqlite3.connect(origem)
+        self.addCleanup(banco.close)
+        banco.execute('PRAGMA journal_mode = WAL')
+        banco.execute('CREATE TABLE turma (nome TEXT)')
+        banco.execute("INSERT INTO turma VALUES ('7º A')")
+        banco.commit()
+
+        copiar_banco(origem, destino)
+        banco.execute("INSERT INTO turma VALUES ('8º B')")
+        banco.commit()
+        replica = sqlite3.connect(destino)
+        self.addCleanup(replica.close)
+        self.assertEqual(replica.execute('SELECT nome FROM turma').fetchall(), [('7º A',)])
+
+        copiar_banco(origem, destino)
+        self.assertEqual(replica.execute('SELECT count(*) FROM turma').fetchone(), (2,))
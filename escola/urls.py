@@ -1,38 +1,71 @@
 # urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views, views_async
 
 app_name = 'escola'
 
+# Dashboard, detalhes e boletim têm versões assíncronas para rodar sob ASGI
+leitura = views_async if settings.ESCOLA_VIEWS_ASYNC else views
+
 urlpatterns = [
     # Dashboard
-    path('', views.dashboard, name='dashboard'),
+    path('', leitura.dashboard, name='dashboard'),
     
     # Turmas
     path('turmas/', views.lista_turmas, name='lista_turmas'),
     path('turmas/criar/', views.criar_turma, name='criar_turma'),
-    path('turmas/<int:pk>/', views.detalhes_turma, name='detalhes_turma'),
+    path('turmas/<int:pk>/', leitura.detalhes_turma, name='detalhes_turma'),
     path('turmas/<int:pk>/editar/', views.editar_turma, name='editar_turma'),
+    path('arquivo/', views.turmas_arquivadas, name='turmas_arquivadas'),
+    path('arquivo/<int:pk>/notas/', views.boletim_arquivado, name='boletim_arquivado'),
     
     # Alunos
     path('alunos/', views.lista_alunos, name='lista_alunos'),
     path('alunos/criar/', views.criar_aluno, name='criar_aluno'),
-    path('alunos/<int:pk>/', views.detalhes_aluno, name='detalhes_aluno'),
+    path('alunos/importar/', views.importar_alunos, name='importar_alunos'),
+    path('alunos/<int:pk>/', leitura.detalhes_aluno, name='detalhes_aluno'),
     
     # Materiais
     path('turmas/<int:turma_id>/materiais/criar/', views.criar_material, name='criar_material'),
     path('materiais/<int:pk>/editar/', views.editar_material, name='editar_material'),
     path('materiais/<int:pk>/deletar/', views.deletar_material, name='deletar_material'),
+    path('materiais/<int:pk>/clonar/', views.clonar_material, name='clonar_material'),
+    path('materiais/<int:pk>/arquivo/', views.baixar_material, name='baixar_material'),
     
     # Atividades
     path('turmas/<int:turma_id>/atividades/criar/', views.criar_atividade, name='criar_atividade'),
     path('atividades/<int:pk>/', views.detalhes_atividade, name='detalhes_atividade'),
     path('atividades/<int:pk>/editar/', views.editar_atividade, name='editar_atividade'),
+    path('atividades/<int:pk>/avaliar/', views.avaliar_entregas, name='avaliar_entregas'),
+    path('atividades/<int:pk>/anexo/', views.baixar_anexo_atividade, name='baixar_anexo_atividade'),
     
     # Notas
     path('entregas/<int:entrega_id>/avaliar/', views.avaliar_entrega, name='avaliar_entrega'),
-    path('turmas/<int:turma_id>/notas/', views.boletim_turma, name='boletim_turma'),
+    path('entregas/<int:entrega_id>/arquivo/', views.baixar_entrega, name='baixar_entrega'),
+    path('turmas/<int:turma_id>/notas/', leitura.boletim_turma, name='boletim_turma'),
+    
+    # Busca
+    path('busca/', views.buscar, name='buscar'),
+    
+    # Exportações
+    path('exportar/boletins/', views.exportar_boletim, name='exportar_boletins'),
+    path('exportar/entregas/', views.exportar_entregas, name='exportar_entregas'),
+    path('turmas/<int:turma_id>/exportar/boletim/', views.exportar_boletim, name='exportar_boletim_turma'),
+    path('turmas/<int:turma_id>/exportar/entregas/', views.exportar_entregas, name='exportar_entregas_turma'),
     
     # Avisos
     path('turmas/<int:turma_id>/avisos/criar/', views.criar_aviso, name='criar_aviso'),
+    
+    # Tarefas em segundo plano
+    path('tarefas/<int:pk>/', views.detalhes_tarefa, name='detalhes_tarefa'),
+    path('tarefas/<int:pk>/status/', views.status_tarefa, name='status_tarefa'),
+    path('tarefas/<int:pk>/arquivo/', views.baixar_arquivo_tarefa, name='baixar_arquivo_tarefa'),
+    
+    # API JSON somente leitura
+    path('api/turmas/', api.turmas, name='api_turmas'),
+    path('api/turmas/<int:turma_id>/materiais/', api.materiais, name='api_materiais'),
+    path('api/turmas/<int:turma_id>/atividades/', api.atividades, name='api_atividades'),
+    path('api/turmas/<int:turma_id>/avisos/', api.avisos, name='api_avisos'),
+    path('api/alunos/<int:aluno_id>/notas/', api.notas_aluno, name='api_notas_aluno'),
 ]
\ No newline at end of file
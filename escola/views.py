@@ -1,42 +1,63 @@
 # views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Count, Avg
-from .models import Turma, Aluno, Material, Atividade, Entrega, Nota, Aviso
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.functional import SimpleLazyObject
+from .models import Turma, Aluno, Material, Atividade, Entrega, Nota, Aviso, Tarefa, TurmaArquivada
 from .forms import (TurmaForm, AlunoForm, MaterialForm, AtividadeForm, 
-                    NotaForm, AvisoForm)
-
-@login_required
-def dashboard(request):
-    turmas = Turma.objects.filter(professor=request.user).annotate(
-        total_alunos=Count('alunos'),
-        total_atividades=Count('atividades')
-    )
+                    NotaForm, AvisoForm, ImportarAlunosForm, NotaLoteFormSet,
+                    ClonarMaterialForm)
+from . import arquivamento
+from .avaliacao import salvar_notas_em_lote
+from .boletim import montar_matriz_notas
+from .downloads import resposta_arquivo
+from .escopo import escopo_professor, obter_ou_404
+from .estatisticas import estatisticas_atividade
+from .busca import buscar as buscar_conteudo
+from .cache import obter_ou_calcular, versao_professor, versoes_turma
+from .paginacao import normalizar_cursor, paginar_por_cursor
+from . import tarefas
+from .exportacao import (FORMATOS, gerar_csv, gerar_xlsx_temporario,
+                         linhas_boletim, linhas_entregas, openpyxl)
+
+# Acima disso a avaliação em lote vai para a fila em vez de rodar na requisição;
+# lá ela é gravada e retomada por lotes (tarefas.tarefa_avaliar_em_lote)
+LIMITE_AVALIACAO_SINCRONA = 100
+
+def _contexto_dashboard(professor):
+    turmas = list(Turma.objects.filter(professor=professor))
     
-    atividades_recentes = Atividade.objects.filter(
-        turma__professor=request.user
-    ).order_by('-criado_em')[:5]
+    atividades_recentes = list(Atividade.objects.filter(
+        turma__professor=professor
+    ).select_related('turma').order_by('-criado_em')[:5])
     
     entregas_pendentes = Entrega.objects.filter(
-        atividade__turma__professor=request.user,
+        atividade__turma__professor=professor,
         status='ENTREGUE'
     ).count()
     
-    context = {
+    return {
         'turmas': turmas,
         'atividades_recentes': atividades_recentes,
         'entregas_pendentes': entregas_pendentes,
-        'total_turmas': turmas.count(),
+        'total_turmas': len(turmas),
     }
+
+
+@login_required
+def dashboard(request):
+    context = obter_ou_calcular(
+        request.user.pk, 'dashboard', lambda: _contexto_dashboard(request.user)
+    )
     return render(request, 'escola/dashboard.html', context)
 
 
 @login_required
 def lista_turmas(request):
-    turmas = Turma.objects.filter(professor=request.user).annotate(
-        total_alunos=Count('alunos')
-    )
+    turmas = Turma.objects.filter(professor=request.user)
     return render(request, 'escola/lista_turmas.html', {'turmas': turmas})
 
 
@@ -57,8 +78,10 @@ def criar_turma(request):
 
 @login_required
 def detalhes_turma(request, pk):
-    turma = get_object_or_404(Turma, pk=pk, professor=request.user)
-    alunos = turma.alunos.all()
+    turma = obter_ou_404(request.user, Turma, pk)
+    # Tudo preguiçoso: blocos servidos do cache de fragmentos não consultam o banco
+    cursor = normalizar_cursor(request.GET.get('cursor'), Aluno)
+    alunos = SimpleLazyObject(lambda: paginar_por_cursor(turma.alunos.all(), ('nome', 'pk'), cursor))
     materiais = turma.materiais.all()[:5]
     atividades = turma.atividades.all()[:5]
     avisos = turma.avisos.all()[:5]
@@ -69,13 +92,15 @@ def detalhes_turma(request, pk):
         'materiais': materiais,
         'atividades': atividades,
         'avisos': avisos,
+        'versoes': versoes_turma(turma.pk),
+        'cursor': cursor,
     }
     return render(request, 'escola/detalhes_turma.html', context)
 
 
 @login_required
 def editar_turma(request, pk):
-    turma = get_object_or_404(Turma, pk=pk, professor=request.user)
+    turma = obter_ou_404(request.user, Turma, pk)
     if request.method == 'POST':
         form = TurmaForm(request.POST, instance=turma)
         if form.is_valid():
@@ -89,8 +114,20 @@ def editar_turma(request, pk):
 
 @login_required
 def lista_alunos(request):
-    alunos = Aluno.objects.filter(turmas__professor=request.user).distinct()
-    return render(request, 'escola/lista_alunos.html', {'alunos': alunos})
+    # Só as turmas do professor: as de outros não mudam a versão dele
+    consulta = Aluno.objects.filter(
+        turmas__professor=request.user
+    ).distinct().prefetch_related(
+        Prefetch('turmas', queryset=Turma.objects.filter(professor=request.user))
+    )
+    cursor = normalizar_cursor(request.GET.get('cursor'), Aluno)
+    alunos = SimpleLazyObject(lambda: paginar_por_cursor(consulta, ('nome', 'pk'), cursor))
+    context = {
+        'alunos': alunos,
+        'versao': versao_professor(request.user.pk),
+        'cursor': cursor,
+    }
+    return render(request, 'escola/lista_alunos.html', context)
 
 
 @login_required
@@ -106,21 +143,47 @@ def criar_aluno(request):
     return render(request, 'escola/form_aluno.html', {'form': form})
 
 
+@login_required
+def importar_alunos(request):
+    if request.method == 'POST':
+        form = ImportarAlunosForm(request.POST, request.FILES, user=request.user)
+        if form.is_valid():
+            turmas_permitidas = Turma.objects.filter(
+                professor=request.user
+            ).values_list('pk', flat=True)
+            tarefa = tarefas.enfileirar(
+                'importar_alunos',
+                professor=request.user,
+                arquivo=form.cleaned_data['arquivo'],
+                turmas_permitidas=list(turmas_permitidas),
+                turmas_padrao=[turma.pk for turma in form.cleaned_data['turmas']],
+            )
+            messages.success(request, 'Importação iniciada. Acompanhe o andamento abaixo.')
+            return redirect('escola:detalhes_tarefa', pk=tarefa.pk)
+    else:
+        form = ImportarAlunosForm(user=request.user)
+    return render(request, 'escola/form_importar_alunos.html', {'form': form})
+
+
 @login_required
 def detalhes_aluno(request, pk):
-    aluno = get_object_or_404(Aluno, pk=pk, turmas__professor=request.user)
-    entregas = aluno.entregas.select_related('atividade', 'nota').all()
+    aluno = obter_ou_404(request.user, Aluno, pk)
+    entregas = aluno.entregas.select_related('atividade__turma', 'nota').all()
+    resumos = aluno.resumos.select_related('turma').filter(
+        turma_id__in=escopo_professor(request.user.pk).turmas
+    )
     
     context = {
         'aluno': aluno,
         'entregas': entregas,
+        'resumos': resumos,
     }
     return render(request, 'escola/detalhes_aluno.html', context)
 
 
 @login_required
 def criar_material(request, turma_id):
-    turma = get_object_or_404(Turma, pk=turma_id, professor=request.user)
+    turma = obter_ou_404(request.user, Turma, turma_id)
     if request.method == 'POST':
         form = MaterialForm(request.POST, request.FILES)
         if form.is_valid():
@@ -136,7 +199,7 @@ def criar_material(request, turma_id):
 
 @login_required
 def editar_material(request, pk):
-    material = get_object_or_404(Material, pk=pk, turma__professor=request.user)
+    material = obter_ou_404(request.user, Material, pk)
     if request.method == 'POST':
         form = MaterialForm(request.POST, request.FILES, instance=material)
         if form.is_valid():
@@ -145,21 +208,56 @@ def editar_material(request, pk):
             return redirect('escola:detalhes_turma', pk=material.turma.pk)
     else:
         form = MaterialForm(instance=material)
-    return render(request, 'escola/form_material.html', {'form': form, 'material': material})
+    return render(request, 'escola/form_material.html', {
+        'form': form, 'material': material, 'turma': material.turma,
+    })
 
 
 @login_required
 def deletar_material(request, pk):
-    material = get_object_or_404(Material, pk=pk, turma__professor=request.user)
+    material = obter_ou_404(request.user, Material, pk)
     turma_id = material.turma.pk
     material.delete()
     messages.success(request, 'Material deletado com sucesso!')
     return redirect('escola:detalhes_turma', pk=turma_id)
 
 
+@login_required
+def clonar_material(request, pk):
+    material = obter_ou_404(request.user, Material.objects.select_related('turma'), pk)
+    if request.method == 'POST':
+        form = ClonarMaterialForm(request.POST, user=request.user, material=material)
+        if form.is_valid():
+            destino = form.cleaned_data['turma']
+            copia = Material(
+                titulo=material.titulo,
+                descricao=material.descricao,
+                tipo=material.tipo,
+                link=material.link,
+                turma=destino,
+            )
+            if material.arquivo:
+                # Mesmo conteúdo, mais uma referência: nenhum byte é copiado
+                copia.arquivo.name = material.arquivo.storage.clonar(material.arquivo.name)
+            copia.save()
+            messages.success(request, f'Material copiado para {destino.nome}!')
+            return redirect('escola:detalhes_turma', pk=destino.pk)
+    else:
+        form = ClonarMaterialForm(user=request.user, material=material)
+    return render(request, 'escola/form_clonar_material.html', {
+        'form': form, 'material': material, 'turma': material.turma,
+    })
+
+
+@login_required
+def baixar_material(request, pk):
+    material = obter_ou_404(request.user, Material, pk)
+    return resposta_arquivo(request, material.arquivo, anexo='baixar' in request.GET)
+
+
 @login_required
 def criar_atividade(request, turma_id):
-    turma = get_object_or_404(Turma, pk=turma_id, professor=request.user)
+    turma = obter_ou_404(request.user, Turma, turma_id)
     if request.method == 'POST':
         form = AtividadeForm(request.POST, request.FILES)
         if form.is_valid():
@@ -175,19 +273,25 @@ def criar_atividade(request, turma_id):
 
 @login_required
 def detalhes_atividade(request, pk):
-    atividade = get_object_or_404(Atividade, pk=pk, turma__professor=request.user)
-    entregas = atividade.entregas.select_related('aluno', 'nota').all()
+    atividade = obter_ou_404(request.user, Atividade.objects.select_related('turma'), pk)
+    entregas = paginar_por_cursor(
+        atividade.entregas.select_related('aluno', 'nota'),
+        ('aluno__nome', 'pk'),
+        request.GET.get('cursor'),
+    )
     
     context = {
         'atividade': atividade,
         'entregas': entregas,
+        'total_entregas': atividade.entregas.count(),
+        'estatisticas': estatisticas_atividade(atividade),
     }
     return render(request, 'escola/detalhes_atividade.html', context)
 
 
 @login_required
 def editar_atividade(request, pk):
-    atividade = get_object_or_404(Atividade, pk=pk, turma__professor=request.user)
+    atividade = obter_ou_404(request.user, Atividade, pk)
     if request.method == 'POST':
         form = AtividadeForm(request.POST, request.FILES, instance=atividade)
         if form.is_valid():
@@ -196,13 +300,20 @@ def editar_atividade(request, pk):
             return redirect('escola:detalhes_atividade', pk=atividade.pk)
     else:
         form = AtividadeForm(instance=atividade)
-    return render(request, 'escola/form_atividade.html', {'form': form, 'atividade': atividade})
+    return render(request, 'escola/form_atividade.html', {
+        'form': form, 'atividade': atividade, 'turma': atividade.turma,
+    })
+
+
+@login_required
+def baixar_entrega(request, entrega_id):
+    entrega = obter_ou_404(request.user, Entrega, entrega_id)
+    return resposta_arquivo(request, entrega.arquivo, anexo='baixar' in request.GET)
 
 
 @login_required
 def avaliar_entrega(request, entrega_id):
-    entrega = get_object_or_404(Entrega, pk=entrega_id, 
-                                atividade__turma__professor=request.user)
+    entrega = obter_ou_404(request.user, Entrega, entrega_id)
     
     if request.method == 'POST':
         form = NotaForm(request.POST)
@@ -229,42 +340,222 @@ def avaliar_entrega(request, entrega_id):
 
 
 @login_required
-def boletim_turma(request, turma_id):
-    turma = get_object_or_404(Turma, pk=turma_id, professor=request.user)
-    alunos = turma.alunos.all()
+def baixar_anexo_atividade(request, pk):
+    atividade = obter_ou_404(request.user, Atividade, pk)
+    return resposta_arquivo(request, atividade.arquivo_anexo, anexo='baixar' in request.GET)
+
+
+@login_required
+def avaliar_entregas(request, pk):
+    atividade = obter_ou_404(request.user, Atividade, pk)
+    entregas = list(atividade.entregas.select_related('aluno', 'nota').order_by('aluno__nome'))
+    por_id = {entrega.pk: entrega for entrega in entregas}
     
-    boletim = []
-    for aluno in alunos:
-        notas = Nota.objects.filter(
-            entrega__aluno=aluno,
-            entrega__atividade__turma=turma
-        )
-        media = notas.aggregate(Avg('valor'))['valor__avg'] or 0
-        
-        boletim.append({
-            'aluno': aluno,
-            'notas': notas,
-            'media': round(media, 2)
-        })
+    if request.method == 'POST':
+        formset = NotaLoteFormSet(request.POST)
+        if formset.is_valid():
+            # Em branco só é "sem nota ainda"; apagar uma nota lançada não é por aqui
+            for form in formset:
+                entrega = por_id.get(form.cleaned_data.get('entrega'))
+                if form.cleaned_data.get('valor') is None and getattr(entrega, 'nota', None):
+                    form.add_error('valor', 'Esta entrega já tem nota; informe o valor.')
+        if formset.is_valid():
+            avaliacoes = [
+                (por_id[dados['entrega']], dados['valor'], dados['comentario_professor'])
+                for dados in formset.cleaned_data
+                if dados.get('valor') is not None and dados.get('entrega') in por_id
+            ]
+            if len(avaliacoes) > LIMITE_AVALIACAO_SINCRONA:
+                tarefa = tarefas.enfileirar(
+                    'avaliar_em_lote',
+                    professor=request.user,
+                    atividade_id=atividade.pk,
+                    avaliacoes=[
+                        (entrega.pk, str(valor), comentario)
+                        for entrega, valor, comentario in avaliacoes
+                    ],
+                )
+                messages.success(request, f'Avaliação de {len(avaliacoes)} entregas iniciada.')
+                return redirect('escola:detalhes_tarefa', pk=tarefa.pk)
+            total = salvar_notas_em_lote(atividade, avaliacoes)
+            messages.success(request, f'{total} entregas avaliadas com sucesso!')
+            return redirect('escola:detalhes_atividade', pk=atividade.pk)
+    else:
+        iniciais = []
+        for entrega in entregas:
+            nota = getattr(entrega, 'nota', None)
+            iniciais.append({
+                'entrega': entrega.pk,
+                'valor': nota.valor if nota else None,
+                'comentario_professor': nota.comentario_professor if nota else '',
+            })
+        formset = NotaLoteFormSet(initial=iniciais)
+    
+    por_texto = {str(entrega.pk): entrega for entrega in entregas}
+    linhas = []
+    for form in formset:
+        entrega = por_texto.get(str(form['entrega'].value()))
+        if entrega:
+            linhas.append((entrega, form))
+    
+    context = {
+        'atividade': atividade,
+        'formset': formset,
+        'linhas': linhas,
+    }
+    return render(request, 'escola/form_avaliar_entregas.html', context)
+
+
+@login_required
+def boletim_turma(request, turma_id):
+    turma = obter_ou_404(request.user, Turma, turma_id)
+    ponderada = request.GET.get('ponderada') == '1'
+    boletim = SimpleLazyObject(lambda: montar_matriz_notas(turma, ponderada=ponderada))
     
     context = {
         'turma': turma,
         'boletim': boletim,
+        'ponderada': ponderada,
+        'versoes': versoes_turma(turma.pk),
     }
     return render(request, 'escola/boletim_turma.html', context)
 
 
+@login_required
+def turmas_arquivadas(request):
+    turmas = TurmaArquivada.objects.filter(professor=request.user)
+    return render(request, 'escola/turmas_arquivadas.html', {'turmas': turmas})
+
+
+@login_required
+def boletim_arquivado(request, pk):
+    """Boletim de uma turma de ano encerrado, lido do arquivo (somente leitura)."""
+    turma = get_object_or_404(TurmaArquivada, pk=pk, professor=request.user)
+    ponderada = request.GET.get('ponderada') == '1'
+    context = {
+        'turma': turma,
+        'boletim': arquivamento.boletim(turma, ponderada=ponderada),
+        'ponderada': ponderada,
+    }
+    return render(request, 'escola/boletim_arquivado.html', context)
+
+
+@login_required
+def buscar(request):
+    termo = request.GET.get('q', '').strip()
+    resultados = buscar_conteudo(termo, request.user) if termo else []
+    return render(request, 'escola/busca.html', {'termo': termo, 'resultados': resultados})
+
+
 @login_required
 def criar_aviso(request, turma_id):
-    turma = get_object_or_404(Turma, pk=turma_id, professor=request.user)
+    turma = obter_ou_404(request.user, Turma, turma_id)
     if request.method == 'POST':
         form = AvisoForm(request.POST)
         if form.is_valid():
             aviso = form.save(commit=False)
             aviso.turma = turma
-            aviso.save()
-            messages.success(request, 'Aviso criado com sucesso!')
+            # O aviso e o envio por e-mail na fila (sinal) gravam juntos ou nada
+            with transaction.atomic():
+                aviso.save()
+            if aviso.importante:
+                messages.success(request, 'Aviso criado! Os alunos serão avisados por e-mail.')
+            else:
+                messages.success(request, 'Aviso criado com sucesso!')
             return redirect('escola:detalhes_turma', pk=turma.pk)
     else:
         form = AvisoForm()
-    return render(request, 'escola/form_aviso.html', {'form': form, 'turma': turma})
\ No newline at end of file
+    return render(request, 'escola/form_aviso.html', {'form': form, 'turma': turma})
+
+
+def _formato_exportacao(request):
+    formato = request.GET.get('formato', 'csv')
+    if formato not in FORMATOS or (formato == 'xlsx' and openpyxl is None):
+        raise Http404('Formato de exportação indisponível.')
+    return formato
+
+
+def _resposta_exportacao(linhas, formato, nome_arquivo):
+    if formato == 'xlsx':
+        return FileResponse(
+            gerar_xlsx_temporario(linhas, titulo=nome_arquivo),
+            as_attachment=True,
+            filename=f'{nome_arquivo}.xlsx',
+        )
+    response = StreamingHttpResponse(gerar_csv(linhas), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.csv"'
+    return response
+
+
+def _exportar_em_segundo_plano(request, tipo, turma_id, formato):
+    tarefa = tarefas.enfileirar(tipo, professor=request.user, turma_id=turma_id, formato=formato)
+    messages.success(request, 'Exportação iniciada. O arquivo fica disponível aqui quando terminar.')
+    return redirect('escola:detalhes_tarefa', pk=tarefa.pk)
+
+
+@login_required
+def exportar_boletim(request, turma_id=None):
+    formato = _formato_exportacao(request)
+    turmas = Turma.objects.filter(professor=request.user)
+    if turma_id is not None:
+        if turma_id not in escopo_professor(request.user.pk).turmas:
+            raise Http404('Turma não encontrada.')
+        turmas = Turma.objects.filter(pk=turma_id)
+        nome_arquivo = f'boletim_turma_{turma_id}'
+    else:
+        nome_arquivo = 'boletins'
+    if 'segundo_plano' in request.GET:
+        return _exportar_em_segundo_plano(request, 'exportar_boletim', turma_id, formato)
+    linhas = linhas_boletim(turmas, detalhar_atividades=turma_id is not None)
+    return _resposta_exportacao(linhas, formato, nome_arquivo)
+
+
+@login_required
+def exportar_entregas(request, turma_id=None):
+    formato = _formato_exportacao(request)
+    entregas = Entrega.objects.filter(atividade__turma__professor=request.user)
+    if turma_id is not None:
+        if turma_id not in escopo_professor(request.user.pk).turmas:
+            raise Http404('Turma não encontrada.')
+        entregas = Entrega.objects.filter(atividade__turma_id=turma_id)
+        nome_arquivo = f'entregas_turma_{turma_id}'
+    else:
+        nome_arquivo = 'entregas'
+    if 'segundo_plano' in request.GET:
+        return _exportar_em_segundo_plano(request, 'exportar_entregas', turma_id, formato)
+    return _resposta_exportacao(linhas_entregas(entregas), formato, nome_arquivo)
+
+
+def _status_tarefa(tarefa):
+    return {
+        'id': tarefa.pk,
+        'tipo': tarefa.tipo,
+        'status': tarefa.status,
+        'status_display': tarefa.get_status_display(),
+        'progresso': tarefa.progresso,
+        'mensagem': tarefa.mensagem,
+        'tentativas': tarefa.tentativas,
+        'finalizada': tarefa.finalizada,
+    }
+
+
+@login_required
+def detalhes_tarefa(request, pk):
+    tarefa = get_object_or_404(Tarefa, pk=pk, professor=request.user)
+    context = {
+        'tarefa': tarefa,
+        'descricao': tarefas.descricao(tarefa.tipo),
+    }
+    return render(request, 'escola/detalhes_tarefa.html', context)
+
+
+@login_required
+def status_tarefa(request, pk):
+    tarefa = get_object_or_404(Tarefa, pk=pk, professor=request.user)
+    return JsonResponse(_status_tarefa(tarefa))
+
+
+@login_required
+def baixar_arquivo_tarefa(request, pk):
+    tarefa = get_object_or_404(Tarefa, pk=pk, professor=request.user, status='CONCLUIDA')
+    return resposta_arquivo(request, tarefa.arquivo, anexo=True)
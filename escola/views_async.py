@@ -0,0 +1,153 @@
+# views_async.py
+"""Versões assíncronas das views de leitura mais acessadas.
+
+Usadas no lugar das de ``views.py`` quando ``ESCOLA_VIEWS_ASYNC`` está
+ligado (o padrão em ``asgi.py``). As consultas independentes de cada página
+são disparadas juntas com ``asyncio.gather``; o ``request.user`` é trocado
+pelo usuário já carregado por ``request.auser()``. Blocos que o template
+serviria do cache de fragmentos são conferidos antes, e as consultas deles
+nem saem: no lugar dos dados vai a consulta preguiçosa das views síncronas.
+Se o bloco sair do cache entre a conferência e o ``render`` (expirou ou foi
+descartado), o template a avalia em vez de gravar um bloco vazio; por isso o
+``render`` roda em ``sync_to_async``.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.shortcuts import render
+from django.utils.functional import SimpleLazyObject
+
+from .boletim import amontar_matriz_notas, montar_matriz_notas
+from .cache import aobter_ou_calcular, aversoes_turma
+from .escopo import aescopo_professor, aobter_ou_404
+from .models import Aluno, Atividade, Entrega, Turma
+from .paginacao import apaginar_por_cursor, normalizar_cursor, paginar_por_cursor
+
+arender = sync_to_async(render)
+
+
+async def _listar(consulta):
+    return [item async for item in consulta]
+
+
+async def _usuario(request):
+    request.user = await request.auser()
+    return request.user
+
+
+async def _consultar_se_fora_do_cache(fragmento, consulta, preguicosa):
+    """Roda ``consulta`` só se o bloco ``{% cache %}`` descrito por
+    ``fragmento`` (nome e variações, como no template) não estiver em cache.
+
+    Se estiver, devolve ``preguicosa``: os mesmos dados, buscados só se o
+    template precisar deles.
+    """
+    nome, *variacoes = fragmento
+    if await cache.ahas_key(make_template_fragment_key(nome, variacoes)):
+        consulta.close()
+        return preguicosa
+    return await consulta
+
+
+async def _contexto_dashboard(professor):
+    turmas, atividades_recentes, entregas_pendentes = await asyncio.gather(
+        _listar(Turma.objects.filter(professor=professor)),
+        _listar(Atividade.objects.filter(
+            turma__professor=professor
+        ).select_related('turma').order_by('-criado_em')[:5]),
+        Entrega.objects.filter(atividade__turma__professor=professor, status='ENTREGUE').acount(),
+    )
+    return {
+        'turmas': turmas,
+        'atividades_recentes': atividades_recentes,
+        'entregas_pendentes': entregas_pendentes,
+        'total_turmas': len(turmas),
+    }
+
+
+@login_required
+async def dashboard(request):
+    professor = await _usuario(request)
+    context = await aobter_ou_calcular(
+        professor.pk, 'dashboard', lambda: _contexto_dashboard(professor)
+    )
+    return await arender(request, 'escola/dashboard.html', context)
+
+
+@login_required
+async def detalhes_turma(request, pk):
+    professor = await _usuario(request)
+    turma = await aobter_ou_404(professor, Turma, pk)
+    versoes = await aversoes_turma(turma.pk)
+    cursor = normalizar_cursor(request.GET.get('cursor'), Aluno)
+    alunos, materiais, atividades, avisos = await asyncio.gather(
+        _consultar_se_fora_do_cache(
+            ('turma_alunos', turma.pk, versoes['alunos'], cursor),
+            apaginar_por_cursor(turma.alunos.all(), ('nome', 'pk'), cursor),
+            SimpleLazyObject(lambda: paginar_por_cursor(turma.alunos.all(), ('nome', 'pk'), cursor)),
+        ),
+        _consultar_se_fora_do_cache(
+            ('turma_materiais', turma.pk, versoes['materiais']),
+            _listar(turma.materiais.all()[:5]),
+            turma.materiais.all()[:5],
+        ),
+        _listar(turma.atividades.all()[:5]),
+        _consultar_se_fora_do_cache(
+            ('turma_avisos', turma.pk, versoes['avisos']),
+            _listar(turma.avisos.all()[:5]),
+            turma.avisos.all()[:5],
+        ),
+    )
+
+    context = {
+        'turma': turma,
+        'alunos': alunos,
+        'materiais': materiais,
+        'atividades': atividades,
+        'avisos': avisos,
+        'versoes': versoes,
+        'cursor': cursor,
+    }
+    return await arender(request, 'escola/detalhes_turma.html', context)
+
+
+@login_required
+async def detalhes_aluno(request, pk):
+    professor = await _usuario(request)
+    aluno = await aobter_ou_404(professor, Aluno.objects.prefetch_related('turmas'), pk)
+    escopo = await aescopo_professor(professor.pk)
+    entregas, resumos = await asyncio.gather(
+        _listar(aluno.entregas.select_related('atividade__turma', 'nota')),
+        _listar(aluno.resumos.select_related('turma').filter(turma_id__in=escopo.turmas)),
+    )
+
+    context = {
+        'aluno': aluno,
+        'entregas': entregas,
+        'resumos': resumos,
+    }
+    return await arender(request, 'escola/detalhes_aluno.html', context)
+
+
+@login_required
+async def boletim_turma(request, turma_id):
+    professor = await _usuario(request)
+    turma = await aobter_ou_404(professor, Turma, turma_id)
+    ponderada = request.GET.get('ponderada') == '1'
+    versoes = await aversoes_turma(turma.pk)
+    boletim = await _consultar_se_fora_do_cache(
+        ('boletim', turma.pk, versoes['alunos'], versoes['atividades'], versoes['notas'], ponderada),
+        amontar_matriz_notas(turma, ponderada=ponderada),
+        SimpleLazyObject(lambda: montar_matriz_notas(turma, ponderada=ponderada)),
+    )
+
+    context = {
+        'turma': turma,
+        'boletim': boletim,
+        'ponderada': ponderada,
+        'versoes': versoes,
+    }
+    return await arender(request, 'escola/boletim_turma.html', context)
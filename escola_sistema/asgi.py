@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'escola_sistema.settings')
+# Sob ASGI as views de leitura usam as versões assíncronas (escola/views_async.py)
+os.environ.setdefault('ESCOLA_VIEWS_ASYNC', '1')
 
 application = get_asgi_application()
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'escola.middleware.InstrumentacaoSQLMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -64,6 +65,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'escola.context_processors.cache_fragmentos',
             ],
         },
     },
@@ -82,6 +84,75 @@ DATABASES = {
     }
 }
 
+# Perfil de produção do SQLite (ESCOLA_BANCO_PRODUCAO=1): conexões mantidas
+# entre requisições, transações que já começam com a trava de escrita
+# (IMMEDIATE: esperam o busy_timeout em vez de falhar com "database is
+# locked" no meio) e os PRAGMAs abaixo, aplicados a cada conexão nova por
+# escola.banco.configurar_conexao. WAL deixa leituras e escritas andarem
+# juntas; synchronous=NORMAL em WAL só arrisca a última transação numa
+# queda de energia, não a integridade do arquivo.
+#
+# Com ESCOLA_REPLICA_LEITURA=1, GET/HEAD leem os modelos do app de uma cópia
+# local ('replica'), atualizada pelo comando sincronizar_replica.
+
+ESCOLA_BANCO_PRODUCAO = os.environ.get('ESCOLA_BANCO_PRODUCAO') == '1'
+ESCOLA_REPLICA_LEITURA = ESCOLA_BANCO_PRODUCAO and os.environ.get('ESCOLA_REPLICA_LEITURA') == '1'
+ESCOLA_BANCO_REPLICA = 'replica'
+# Segundos em que o navegador lê do principal depois de um POST; deve passar
+# do intervalo de sincronização da réplica
+ESCOLA_REPLICA_JANELA = 30
+ESCOLA_SQLITE_PRAGMAS = {}
+
+if ESCOLA_BANCO_PRODUCAO:
+    _PRAGMAS_PRODUCAO = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+    }
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    })
+    ESCOLA_SQLITE_PRAGMAS['default'] = _PRAGMAS_PRODUCAO
+
+    if ESCOLA_REPLICA_LEITURA:
+        DATABASES[ESCOLA_BANCO_REPLICA] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db-replica.sqlite3',
+            'CONN_MAX_AGE': 600,
+            'CONN_HEALTH_CHECKS': True,
+            'TEST': {'MIRROR': 'default'},
+        }
+        ESCOLA_SQLITE_PRAGMAS[ESCOLA_BANCO_REPLICA] = dict(_PRAGMAS_PRODUCAO, query_only='ON')
+        DATABASE_ROUTERS = ['escola.banco.RoteadorReplica']
+        MIDDLEWARE.insert(1, 'escola.middleware.ReplicaLeituraMiddleware')
+
+
+# Cache
+# Compartilhado por todos os processos (servidor web, processar_tarefas e os
+# comandos): as versões de escola/cache.py, renovadas por quem grava, valem
+# para todos. Um cache local por processo deixaria os demais com o escopo de
+# autorização, os fragmentos e as estatísticas antigos até expirarem. Com
+# vários servidores, troque por Redis ou Memcached, também compartilhados.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('ESCOLA_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# Tempo máximo (segundos) das entradas de cache por professor
+ESCOLA_CACHE_TIMEOUT = 60 * 60
+
+# Sessões lidas do cache, gravadas também no banco: sobrevivem a um cache
+# esvaziado ou a outro processo com cache local próprio
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -124,11 +195,74 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Arquivos enviados são deduplicados (escola/armazenamento.py). Um mesmo
+# conteúdo com outro nome vira 'hardlink', 'reflink' ou 'copia'; se o
+# sistema de arquivos recusar, tenta o modo seguinte.
+ESCOLA_ARMAZENAMENTO_COPIA = 'hardlink'
+
+# Turmas de anos encerrados (escola/arquivamento.py): um JSON compactado por
+# turma. Fora de MEDIA_ROOT, que o servidor pode expor.
+ESCOLA_ARQUIVO_DIR = os.path.join(BASE_DIR, 'arquivo')
+
+# Downloads protegidos (escola/downloads.py): 'python' envia pelo Django;
+# 'x-accel' (nginx) e 'x-sendfile' (Apache) repassam o envio ao servidor da
+# frente. Com nginx, ESCOLA_DOWNLOAD_PREFIXO_INTERNO deve ser uma location
+# 'internal' apontando para MEDIA_ROOT.
+ESCOLA_DOWNLOAD_MODO = os.environ.get('ESCOLA_DOWNLOAD_MODO', 'python')
+ESCOLA_DOWNLOAD_PREFIXO_INTERNO = '/protegido/'
+
+# Views de leitura assíncronas (escola/views_async.py) no lugar das síncronas.
+# asgi.py liga por padrão; sob WSGI elas rodariam via async_to_sync, mais lentas.
+ESCOLA_VIEWS_ASYNC = os.environ.get('ESCOLA_VIEWS_ASYNC') == '1'
+
+# E-mail
+# Em desenvolvimento as mensagens saem no console; em produção defina
+# ESCOLA_EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend e os EMAIL_*.
+
+EMAIL_BACKEND = os.environ.get('ESCOLA_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.environ.get('ESCOLA_EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.environ.get('ESCOLA_EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.environ.get('ESCOLA_EMAIL_USUARIO', '')
+EMAIL_HOST_PASSWORD = os.environ.get('ESCOLA_EMAIL_SENHA', '')
+EMAIL_USE_TLS = os.environ.get('ESCOLA_EMAIL_TLS') == '1'
+DEFAULT_FROM_EMAIL = os.environ.get('ESCOLA_EMAIL_REMETENTE', 'escola@localhost')
+
+# Avisos importantes por e-mail (escola/notificacoes.py): alunos buscados por
+# lote e limite de envios por segundo do servidor SMTP (0 = sem limite)
+ESCOLA_AVISOS_LOTE = 200
+ESCOLA_AVISOS_POR_SEGUNDO = 10
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Logging
+# Uma linha por requisição em 'escola.sql' (consultas, duplicadas, tempo);
+# WARNING quando há consultas repetidas. Ajuste com ESCOLA_SQL_LOG_LEVEL.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'escola.sql': {
+            'handlers': ['console'],
+            'level': os.environ.get('ESCOLA_SQL_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'escola.tarefas': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Login settings
 LOGIN_URL = '/admin/login/'
 LOGIN_REDIRECT_URL = '/'